@@ -0,0 +1,43 @@
+﻿"""Notify API listeners on job_events insert."""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "20250920_0002"
+down_revision: Union[str, None] = "20250919_0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """新增 job_events 寫入時觸發 pg_notify 的 trigger。"""
+
+    op.execute(
+        sa.text(
+            "CREATE OR REPLACE FUNCTION notify_job_event() RETURNS TRIGGER AS $$\n"
+            "BEGIN\n"
+            "  PERFORM pg_notify(\n"
+            "    'job_events',\n"
+            "    json_build_object('job_id', NEW.job_id, 'event_id', NEW.id)::text\n"
+            "  );\n"
+            "  RETURN NEW;\n"
+            "END;\n"
+            "$$ LANGUAGE plpgsql;"
+        )
+    )
+    op.execute(
+        sa.text(
+            "CREATE TRIGGER job_events_notify AFTER INSERT ON job_events"
+            " FOR EACH ROW EXECUTE PROCEDURE notify_job_event();"
+        )
+    )
+
+
+def downgrade() -> None:
+    """移除 job_events 通知 trigger。"""
+
+    op.execute(sa.text("DROP TRIGGER IF EXISTS job_events_notify ON job_events"))
+    op.execute(sa.text("DROP FUNCTION IF EXISTS notify_job_event"))
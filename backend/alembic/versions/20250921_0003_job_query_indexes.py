@@ -0,0 +1,93 @@
+﻿"""Composite and partial indexes for job list and asset queries."""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "20250921_0003"
+down_revision: Union[str, None] = "20250920_0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ACTIVE_STATUS_PREDICATE = "status IN ('pending', 'processing', 'rendering')"
+
+
+def upgrade() -> None:
+    """以 CONCURRENTLY 建立複合與部分索引，建立完成後移除被取代的單欄索引。
+
+    CREATE INDEX CONCURRENTLY 不能在交易內執行，因此放在 autocommit_block；
+    建立中斷時會留下 INVALID 索引，需手動 DROP 後重跑。
+    """
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transcription_jobs_user_id_created_at",
+            "transcription_jobs",
+            ["user_id", sa.text("created_at DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_transcription_jobs_user_id_status",
+            "transcription_jobs",
+            ["user_id", "status", sa.text("created_at DESC"), sa.text("id DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_transcription_jobs_user_id_active",
+            "transcription_jobs",
+            ["user_id", "status"],
+            postgresql_where=sa.text(ACTIVE_STATUS_PREDICATE),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_score_assets_job_id_created_at",
+            "score_assets",
+            ["job_id", "created_at"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        # user_id 與 job_id 已是新索引的前綴欄位，外鍵串聯刪除仍可使用
+        op.drop_index(
+            "ix_transcription_jobs_user_id",
+            table_name="transcription_jobs",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_score_assets_job_id",
+            table_name="score_assets",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """還原單欄索引並移除複合與部分索引。"""
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_score_assets_job_id",
+            "score_assets",
+            ["job_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_transcription_jobs_user_id",
+            "transcription_jobs",
+            ["user_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        for index_name, table_name in (
+            ("ix_score_assets_job_id_created_at", "score_assets"),
+            ("ix_transcription_jobs_user_id_active", "transcription_jobs"),
+            ("ix_transcription_jobs_user_id_status", "transcription_jobs"),
+            ("ix_transcription_jobs_user_id_created_at", "transcription_jobs"),
+        ):
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True, if_exists=True)
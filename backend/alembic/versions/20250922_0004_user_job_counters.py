@@ -0,0 +1,70 @@
+﻿"""Per-user active job counters maintained by trigger."""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "20250922_0004"
+down_revision: Union[str, None] = "20250921_0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LIMITED_STATUSES = "('pending', 'processing')"
+
+
+def upgrade() -> None:
+    """建立使用者作業計數表、回填現有作業數，並於作業離開高負載狀態時由 trigger 歸還名額。"""
+
+    op.create_table(
+        "user_job_counters",
+        sa.Column("user_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("auth.users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("active_jobs", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("timezone('utc', now())"), nullable=False),
+        sa.CheckConstraint("active_jobs >= 0", name="ck_user_job_counters_active_jobs"),
+    )
+    op.execute(
+        sa.text(
+            "INSERT INTO user_job_counters (user_id, active_jobs)"
+            " SELECT user_id, count(*) FROM transcription_jobs"
+            f" WHERE status IN {LIMITED_STATUSES} GROUP BY user_id"
+        )
+    )
+    # 名額由 API 送出時遞增；狀態轉換與刪除在同一交易內由 trigger 調整
+    op.execute(
+        sa.text(
+            "CREATE OR REPLACE FUNCTION adjust_user_job_counter() RETURNS TRIGGER AS $$\n"
+            "BEGIN\n"
+            "  IF TG_OP = 'DELETE' THEN\n"
+            f"    IF OLD.status IN {LIMITED_STATUSES} THEN\n"
+            "      UPDATE user_job_counters SET active_jobs = GREATEST(active_jobs - 1, 0), updated_at = timezone('utc', now())\n"
+            "      WHERE user_id = OLD.user_id;\n"
+            "    END IF;\n"
+            f"  ELSIF OLD.status IN {LIMITED_STATUSES} AND NEW.status NOT IN {LIMITED_STATUSES} THEN\n"
+            "    UPDATE user_job_counters SET active_jobs = GREATEST(active_jobs - 1, 0), updated_at = timezone('utc', now())\n"
+            "    WHERE user_id = NEW.user_id;\n"
+            f"  ELSIF OLD.status NOT IN {LIMITED_STATUSES} AND NEW.status IN {LIMITED_STATUSES} THEN\n"
+            "    UPDATE user_job_counters SET active_jobs = active_jobs + 1, updated_at = timezone('utc', now())\n"
+            "    WHERE user_id = NEW.user_id;\n"
+            "  END IF;\n"
+            "  RETURN NULL;\n"
+            "END;\n"
+            "$$ LANGUAGE plpgsql;"
+        )
+    )
+    op.execute(
+        sa.text(
+            "CREATE TRIGGER transcription_jobs_adjust_counter AFTER UPDATE OF status OR DELETE ON transcription_jobs"
+            " FOR EACH ROW EXECUTE PROCEDURE adjust_user_job_counter();"
+        )
+    )
+
+
+def downgrade() -> None:
+    """移除計數 trigger 與計數表。"""
+
+    op.execute(sa.text("DROP TRIGGER IF EXISTS transcription_jobs_adjust_counter ON transcription_jobs"))
+    op.execute(sa.text("DROP FUNCTION IF EXISTS adjust_user_job_counter"))
+    op.drop_table("user_job_counters")
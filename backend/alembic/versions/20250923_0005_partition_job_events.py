@@ -0,0 +1,130 @@
+﻿"""Monthly range partitioning for job_events and the event archive index."""
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "20250923_0005"
+down_revision: Union[str, None] = "20250922_0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS_AHEAD = 2
+
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _month_start(value: datetime) -> datetime:
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def _event_columns() -> list[sa.Column]:
+    return [
+        sa.Column("id", postgresql.UUID(as_uuid=True), nullable=False, server_default=sa.text("gen_random_uuid()")),
+        sa.Column("job_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("transcription_jobs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("stage", sa.Text(), nullable=False),
+        sa.Column("message", sa.Text(), nullable=True),
+        sa.Column("payload", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("timezone('utc', now())"), nullable=False),
+    ]
+
+
+def _create_notify_trigger() -> None:
+    op.execute(
+        sa.text(
+            "CREATE TRIGGER job_events_notify AFTER INSERT ON job_events"
+            " FOR EACH ROW EXECUTE PROCEDURE notify_job_event();"
+        )
+    )
+
+
+def upgrade() -> None:
+    """將 job_events 改為依 created_at 按月分區，並建立封存紀錄表。
+
+    舊表改名後建立分區表，依既有資料的月份與未來 PARTITIONS_AHEAD 個月建立分區並搬移資料。
+    主鍵需包含分區鍵，因此改為 (id, created_at)。搬移期間舊表被鎖定，大量資料時需安排停機時段。
+    列層級 trigger 需 Postgres 13 以上才能建立在分區表上。
+    """
+
+    op.execute(sa.text("DROP TRIGGER IF EXISTS job_events_notify ON job_events"))
+    op.rename_table("job_events", "job_events_unpartitioned")
+    op.execute(sa.text("ALTER TABLE job_events_unpartitioned RENAME CONSTRAINT job_events_pkey TO job_events_unpartitioned_pkey"))
+    op.execute(sa.text("ALTER INDEX ix_job_events_job_id_created_at RENAME TO ix_job_events_unpartitioned_job_id_created_at"))
+
+    op.create_table(
+        "job_events",
+        *_event_columns(),
+        sa.PrimaryKeyConstraint("id", "created_at", name="job_events_pkey"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.create_index("ix_job_events_job_id_created_at", "job_events", ["job_id", "created_at"], unique=False)
+
+    bind = op.get_bind()
+    now = datetime.now(timezone.utc)
+    oldest = bind.scalar(sa.text("SELECT min(created_at) FROM job_events_unpartitioned")) or now
+    month = _month_start(oldest)
+    last = _add_months(_month_start(now), PARTITIONS_AHEAD)
+    while month <= last:
+        end = _add_months(month, 1)
+        op.execute(
+            sa.text(
+                f"CREATE TABLE job_events_p{month:%Y%m} PARTITION OF job_events"
+                f" FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        )
+        month = end
+
+    op.execute(
+        sa.text(
+            "INSERT INTO job_events (id, job_id, stage, message, payload, created_at)"
+            " SELECT id, job_id, stage, message, payload, created_at FROM job_events_unpartitioned"
+        )
+    )
+    op.drop_table("job_events_unpartitioned")
+    _create_notify_trigger()
+
+    op.create_table(
+        "job_event_archives",
+        sa.Column("job_id", postgresql.UUID(as_uuid=True), sa.ForeignKey("transcription_jobs.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("period_start", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("period_end", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("storage_object_path", sa.Text(), nullable=False),
+        sa.Column("event_count", sa.Integer(), nullable=False),
+        sa.Column("last_created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.text("timezone('utc', now())"), nullable=False),
+        sa.PrimaryKeyConstraint("job_id", "period_start"),
+    )
+
+
+def downgrade() -> None:
+    """還原為未分區的 job_events 並移除封存紀錄表；已封存至 Storage 的事件不會搬回。"""
+
+    op.drop_table("job_event_archives")
+    op.execute(sa.text("DROP TRIGGER IF EXISTS job_events_notify ON job_events"))
+    op.rename_table("job_events", "job_events_partitioned")
+    op.execute(sa.text("ALTER TABLE job_events_partitioned RENAME CONSTRAINT job_events_pkey TO job_events_partitioned_pkey"))
+    op.execute(sa.text("ALTER INDEX ix_job_events_job_id_created_at RENAME TO ix_job_events_partitioned_job_id_created_at"))
+
+    op.create_table(
+        "job_events",
+        *_event_columns(),
+        sa.PrimaryKeyConstraint("id", name="job_events_pkey"),
+    )
+    op.create_index("ix_job_events_job_id_created_at", "job_events", ["job_id", "created_at"], unique=False)
+    op.execute(
+        sa.text(
+            "INSERT INTO job_events (id, job_id, stage, message, payload, created_at)"
+            " SELECT id, job_id, stage, message, payload, created_at FROM job_events_partitioned"
+        )
+    )
+    # 刪除父表時一併刪除所有分區
+    op.drop_table("job_events_partitioned")
+    _create_notify_trigger()
@@ -0,0 +1,37 @@
+﻿"""Index the per-user latest updated_at probe for conditional job list requests."""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "20250924_0006"
+down_revision: Union[str, None] = "20250923_0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """以 CONCURRENTLY 建立 (user_id, updated_at DESC) 索引，max(updated_at) 只需讀取一個索引項目。"""
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_transcription_jobs_user_id_updated_at",
+            "transcription_jobs",
+            ["user_id", sa.text("updated_at DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """移除 updated_at 索引。"""
+
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_transcription_jobs_user_id_updated_at",
+            table_name="transcription_jobs",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
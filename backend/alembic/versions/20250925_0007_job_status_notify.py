@@ -0,0 +1,44 @@
+﻿"""Notify API listeners when a job's status changes."""
+from collections.abc import Sequence
+from typing import Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "20250925_0007"
+down_revision: Union[str, None] = "20250924_0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """transcription_jobs 狀態改變時送出與 job_events 相同頻道的 pg_notify，串流不必等下次輪詢才結束。"""
+
+    op.execute(
+        sa.text(
+            "CREATE OR REPLACE FUNCTION notify_job_status() RETURNS TRIGGER AS $$\n"
+            "BEGIN\n"
+            "  PERFORM pg_notify(\n"
+            "    'job_events',\n"
+            "    json_build_object('job_id', NEW.id, 'status', NEW.status)::text\n"
+            "  );\n"
+            "  RETURN NEW;\n"
+            "END;\n"
+            "$$ LANGUAGE plpgsql;"
+        )
+    )
+    op.execute(
+        sa.text(
+            "CREATE TRIGGER transcription_jobs_status_notify AFTER UPDATE OF status ON transcription_jobs"
+            " FOR EACH ROW WHEN (OLD.status IS DISTINCT FROM NEW.status)"
+            " EXECUTE PROCEDURE notify_job_status();"
+        )
+    )
+
+
+def downgrade() -> None:
+    """移除作業狀態通知 trigger。"""
+
+    op.execute(sa.text("DROP TRIGGER IF EXISTS transcription_jobs_status_notify ON transcription_jobs"))
+    op.execute(sa.text("DROP FUNCTION IF EXISTS notify_job_status"))
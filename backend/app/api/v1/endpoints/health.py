@@ -2,9 +2,10 @@
 from datetime import datetime, timezone
 from typing import Any
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
 from app.core.config import settings
+from app.core.metrics import MetricsRegistry, metrics
 
 # router 專責提供系統層資訊路由
 router = APIRouter(prefix="/system", tags=["system"])
@@ -21,3 +22,16 @@ async def read_health() -> dict[str, Any]:
         "timestamp": datetime.now(timezone.utc).isoformat(),
     }
     return payload
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """提供 FastAPI 依賴注入的指標登錄。"""
+
+    return metrics
+
+
+@router.get("/metrics", summary="查詢行程內指標")
+async def read_metrics(registry: MetricsRegistry = Depends(get_metrics_registry)) -> dict[str, Any]:
+    """回傳本行程的串流連線數、中斷次數與各元件統計，供監控抓取。"""
+
+    return registry.snapshot()
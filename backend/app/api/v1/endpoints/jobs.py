@@ -2,32 +2,289 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 from datetime import datetime
-import json
 import time
-from typing import AsyncGenerator
+from typing import Any, AsyncContextManager, AsyncGenerator, AsyncIterator, Callable, Dict, List, Literal, Set
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
 from fastapi.responses import StreamingResponse, JSONResponse
-
-from app.core.database import get_session
-from app.core.security import require_current_user_id
-from app.repositories.jobs import JobRepository
-from app.models.tables import JobEvent
+from pydantic import ValidationError
+from loguru import logger
+
+from app.core.conditional import (
+    cache_headers,
+    etag_matches,
+    make_etag,
+    not_modified_response,
+    not_modified_since,
+)
+from app.core.config import settings
+from app.core.database import (
+    async_session_factory,
+    get_async_session,
+    get_replica_router,
+    get_replica_session,
+    replica_router,
+    replica_session_factory,
+)
+from app.core.db_routing import ReplicaRouter
+from app.core.pagination import KeysetCursor, decode_cursor, encode_cursor
+from app.core.security import require_current_user_id, require_websocket_user_id
+from app.repositories.jobs import TOTAL_ESTIMATE, TOTAL_EXACT, AsyncJobRepository, JobVersion
+from app.models.tables import TERMINAL_JOB_STATUSES, JobEvent
 from app.schemas.asset import ScoreAssetListResponse, ScoreAssetResource
 from app.schemas.event import JobEventListResponse, JobEventResource
-from app.schemas.job import JobCreateRequest, JobListResponse, JobResource
-from app.services.job_service import JobService, JobSubmissionLockedError
+from app.schemas.job import (
+    JobBatchCreateRequest,
+    JobBatchItemResult,
+    JobBatchResponse,
+    JobCreateRequest,
+    JobDetailResource,
+    JobListResponse,
+    JobResource,
+)
+from app.services.event_buffer import EventReplay, JobEventBuffer, get_event_buffer
+from app.services.event_hub import (
+    EventFetcher,
+    EventPoll,
+    HubEvent,
+    JobEventHub,
+    JobStreamEnd,
+    drain_queue,
+    get_event_hub,
+)
+from app.services.job_cache import CachedBody, FinishedJobCache, get_finished_job_cache
+from app.services.job_service import AsyncJobService, JobSubmissionLockedError
+from app.services.job_stream import JobStream
+from app.services.stream_limits import (
+    GuardedStreamingResponse,
+    StreamLimiter,
+    StreamLimitExceededError,
+    get_stream_limiter,
+)
+from app.services.sse import (
+    HEARTBEAT_FRAME,
+    SSEFrameCache,
+    decode_composite_event_id,
+    encode_composite_event_id,
+    encode_end_frame,
+    encode_tagged_end_frame,
+    encode_tagged_event_frame,
+    get_sse_frame_cache,
+)
+from app.services.ws_protocol import (
+    MAX_SUBSCRIPTIONS,
+    OP_PING,
+    OP_UNSUBSCRIBE,
+    PONG_FRAME,
+    ProtocolError,
+    decode_command,
+    encode_end,
+    encode_error,
+    encode_event,
+    encode_subscribed,
+)
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
+DISCONNECT_CHECK_INTERVAL = 1.0  # 每 1 秒檢查一次連線狀態，不再逐連線查詢
+HEARTBEAT_INTERVAL = 30.0  # 每 30 秒送出一次 keep-alive
+MAX_MULTIPLEX_RESUME_JOBS = 50  # 複合 Last-Event-ID 最多可續傳的作業數
+JOB_DETAIL_INCLUDES = frozenset({"assets", "events"})  # 作業詳情可內嵌的子資源
+EMBEDDED_EVENTS_LIMIT = 100  # 作業詳情內嵌的事件筆數，其餘以 eventsNextCursor 向 /events 續取
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def get_job_service(
+    session=Depends(get_async_session),
+    replica_session=Depends(get_replica_session),
+    router: ReplicaRouter | None = Depends(get_replica_router),
+) -> AsyncJobService:
+    """提供 FastAPI 相依性所需的 AsyncJobService 實例；設定讀取副本時唯讀查詢改走副本。"""
+
+    replica = AsyncJobRepository(replica_session) if replica_session is not None else None
+    return AsyncJobService(AsyncJobRepository(session), replica=replica, router=router)
+
+
+JobServiceOpener = Callable[[], AsyncContextManager[AsyncJobService]]
+
+
+@contextlib.asynccontextmanager
+async def open_job_service() -> AsyncIterator[AsyncJobService]:
+    """以自有的短期 Session 建立 AsyncJobService，離開時關閉 Session。
+
+    事件中心的輪詢器會同時為多個作業查詢，且生命週期不隸屬任何請求；AsyncSession 不可並行使用，
+    因此每次輪詢各自開啟 Session，而非共用請求的 Session。
+    """
+
+    async with async_session_factory() as session:
+        if replica_session_factory is None:
+            yield AsyncJobService(AsyncJobRepository(session))
+            return
+        async with replica_session_factory() as replica_session:
+            yield AsyncJobService(
+                AsyncJobRepository(session),
+                replica=AsyncJobRepository(replica_session),
+                router=replica_router,
+            )
+
+
+def get_job_service_opener() -> JobServiceOpener:
+    """提供 FastAPI 相依性所需的 open_job_service。"""
+
+    return open_job_service
+
+
+def _job_event_fetcher(
+    open_service: JobServiceOpener,
+    buffer: JobEventBuffer,
+    *,
+    user_id: UUID,
+    job_id: UUID,
+) -> EventFetcher:
+    """建立單一作業的分頁查詢函式；多查一筆以判斷是否還有下一頁，結果同時寫入事件緩衝。
+
+    每次查詢以 open_service 開啟自己的 Session，輪詢器在任何請求結束後仍可安全呼叫。
+    """
+
+    page_size = settings.event_page_size
+
+    async def fetch(created_after: datetime | None, last_id: UUID | None) -> EventPoll:
+        async with open_service() as service:
+            job_status, events = await service.poll_job_events(
+                user_id=user_id,
+                job_id=job_id,
+                created_after=created_after,
+                last_event_id=last_id,
+                limit=page_size + 1,
+            )
+        poll = EventPoll(job_status, events)
+        if len(events) > page_size:
+            poll = EventPoll(job_status, events[:page_size], has_more=True)
+        if created_after is None or last_id is not None:
+            buffer.record(
+                job_id,
+                user_id=user_id,
+                after=KeysetCursor(created_after, last_id) if created_after is not None else None,
+                events=poll.events,
+                status=job_status,
+                has_more=poll.has_more,
+            )
+        return poll
+
+    return fetch
+
+
+async def _cacheable_reads(
+    service: AsyncJobService,
+    *,
+    user_id: UUID,
+    job_id: UUID,
+) -> tuple[AsyncJobService, JobVersion | None]:
+    """選定讀取來源並取得作業版本；已結束的作業改由主庫重讀版本與內容。
+
+    已結束作業的回應本文會放入快取，若讀自延遲的副本，失效通知之後仍可能把舊內容重新放回快取。
+    """
+
+    reads = await service.consistent_reads(user_id=user_id)  # 版本與內容需讀自同一來源
+    version = await reads.get_job_version(user_id=user_id, job_id=job_id)
+    if version is not None and version.status in TERMINAL_JOB_STATUSES and not reads.from_primary:
+        reads = await service.consistent_reads(user_id=user_id, primary=True)
+        version = await reads.get_job_version(user_id=user_id, job_id=job_id)
+    return reads, version
+
+
+def _invalid_cursor_response() -> JSONResponse:
+    """分頁游標無法解析時的 400 回應。"""
+
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"error": {"code": "INVALID_CURSOR", "message": "after 游標格式錯誤"}},
+    )
+
 
-def get_job_service(session=Depends(get_session)) -> JobService:
-    """提供 FastAPI 相依性所需的 JobService 實例。"""
+def _job_not_found_response() -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_404_NOT_FOUND,
+        content={"error": {"code": "JOB_NOT_FOUND", "message": "Job not found"}},
+    )
 
-    repository = JobRepository(session)
-    return JobService(repository)
+
+def _assets_etag(job_id: UUID, version: JobVersion) -> str:
+    return make_etag("assets", job_id, version.updated_at, version.asset_count, version.last_asset_created_at)
+
+
+def _events_etag(job_id: UUID, version: JobVersion, *params: Any) -> str:
+    # 事件只會新增，最新一筆事件不變時任一頁的內容都不變
+    return make_etag("events", job_id, version.last_event_created_at, version.last_event_id, *params)
+
+
+def _cached_body_response(cached: CachedBody, if_none_match: str | None) -> Response:
+    """以快取的回應本文回覆，不再經過資料庫與序列化。"""
+
+    if etag_matches(if_none_match, cached.etag):
+        return not_modified_response(etag=cached.etag)
+    return Response(content=cached.body, media_type="application/json", headers=cache_headers(etag=cached.etag))
+
+
+def _stream_limit_response(exc: StreamLimitExceededError) -> JSONResponse:
+    """串流名額已滿時回傳 503 與 Retry-After，請客戶端稍後重連。"""
+
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(settings.stream_retry_after_seconds)},
+        content={
+            "error": {
+                "code": "STREAM_LIMIT_REACHED",
+                "message": f"同時串流連線數已達上限 {exc.limit}（{exc.scope}）",
+            }
+        },
+    )
+
+
+def _event_queue() -> asyncio.Queue[Any]:
+    """建立有上限的事件佇列，滿載時事件中心會停止投遞並由串流端中斷連線。"""
+
+    return asyncio.Queue(maxsize=settings.stream_queue_max_events)
+
+
+async def _resolve_resume_point(
+    service: AsyncJobService,
+    buffer: JobEventBuffer,
+    *,
+    user_id: UUID,
+    job_id: UUID,
+    event_id: UUID,
+) -> EventReplay | None:
+    """解析 Last-Event-ID 錨點，優先由事件緩衝補齊；錨點已離開緩衝才查詢資料庫。
+
+    錨點不存在或不屬於該使用者時回傳 None。
+    """
+
+    replay = buffer.replay_after(job_id, event_id, user_id=user_id)
+    if replay is not None:
+        return replay
+    anchor = await service.get_job_event(user_id=user_id, job_id=job_id, event_id=event_id)
+    if anchor is None:
+        return None
+    return EventReplay(KeysetCursor(anchor.created_at, anchor.id), [], None, False)
 
 
 @router.post(
@@ -38,50 +295,462 @@ def get_job_service(session=Depends(get_session)) -> JobService:
 )
 async def create_job(
     payload: JobCreateRequest,
-    service: JobService = Depends(get_job_service),
+    service: AsyncJobService = Depends(get_job_service),
     user_id: UUID = Depends(require_current_user_id),
+    hub: JobEventHub = Depends(get_event_hub),
 ) -> JobResource:
     """建立新的轉譯作業。"""
 
     try:
-        job = service.create_job(payload=payload, user_id=user_id)
+        job = await service.create_job(payload=payload, user_id=user_id)
     except JobSubmissionLockedError as exc:
         detail = {"error": {"code": "JOB_SUBMISSION_LOCKED", "message": f"使用中作業數量 {exc.active} 已達上限"}}
         raise HTTPException(status_code=status.HTTP_423_LOCKED, detail=detail) from exc
+    # 讓本行程的多工串流立即納入新作業
+    hub.notify_user(user_id)
     return JobResource.model_validate(job)
 
 
+@router.post(":batch", response_model=JobBatchResponse, summary="批次建立轉譯作業")
+async def create_jobs(
+    payload: JobBatchCreateRequest,
+    service: AsyncJobService = Depends(get_job_service),
+    user_id: UUID = Depends(require_current_user_id),
+    hub: JobEventHub = Depends(get_event_hub),
+) -> JobBatchResponse | JSONResponse:
+    """批次建立轉譯作業，逐筆回報結果。
+
+    所有項目先行驗證，通過者一次檢查名額並在同一交易寫入；名額不足時依順序建立可容納的作業，
+    其餘標記為 rejected。
+    """
+
+    if len(payload.jobs) > settings.job_batch_max_items:
+        return JSONResponse(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={
+                "error": {
+                    "code": "BATCH_TOO_LARGE",
+                    "message": f"單次最多建立 {settings.job_batch_max_items} 筆作業",
+                }
+            },
+        )
+
+    results: List[JobBatchItemResult | None] = [None] * len(payload.jobs)
+    valid: List[tuple[int, JobCreateRequest]] = []
+    for index, item in enumerate(payload.jobs):
+        try:
+            valid.append((index, JobCreateRequest.model_validate(item)))
+        except ValidationError as exc:
+            message = "; ".join(error["msg"] for error in exc.errors())
+            results[index] = JobBatchItemResult(
+                index=index, status="invalid", error={"code": "INVALID_JOB", "message": message}
+            )
+
+    created: List[Any] = []
+    active = 0
+    if valid:
+        created, active = await service.create_jobs(payloads=[item for _, item in valid], user_id=user_id)
+    for position, (index, _) in enumerate(valid):
+        if position < len(created):
+            results[index] = JobBatchItemResult(
+                index=index, status="created", job=JobResource.model_validate(created[position])
+            )
+        else:
+            results[index] = JobBatchItemResult(
+                index=index,
+                status="rejected",
+                error={"code": "JOB_SUBMISSION_LOCKED", "message": f"使用中作業數量 {active} 已達上限"},
+            )
+
+    if created:
+        hub.notify_user(user_id)
+    return JobBatchResponse(data=[result for result in results if result is not None])
+
+
 @router.get("", response_model=JobListResponse, summary="查詢轉譯作業列表")
 async def list_jobs(
+    response: Response,
     status: str | None = Query(default=None, description="依狀態篩選作業"),
     limit: int = Query(default=20, ge=1, le=100, description="回傳筆數上限"),
-    offset: int = Query(default=0, ge=0, description="查詢位移"),
-    service: JobService = Depends(get_job_service),
+    offset: int = Query(default=0, ge=0, description="查詢位移；帶入 after 時忽略"),
+    after: str | None = Query(default=None, description="上一頁回傳的 nextCursor，以 keyset 取得下一頁"),
+    total: Literal["exact", "estimate", "none"] = Query(default=TOTAL_EXACT, description="總筆數模式"),
+    if_none_match: str | None = Header(default=None),
+    if_modified_since: str | None = Header(default=None),
+    service: AsyncJobService = Depends(get_job_service),
     user_id: UUID = Depends(require_current_user_id),
-) -> JobListResponse:
-    """依條件查詢使用者的轉譯作業。"""
+) -> JobListResponse | JSONResponse | Response:
+    """依條件查詢使用者的轉譯作業，支援 offset 與 keyset 兩種分頁。
+
+    先以使用者作業的最晚 updated_at 判斷列表是否變動，未變動時直接回傳 304。
+    帶 If-None-Match 時依 RFC 9110 忽略 If-Modified-Since。
+    """
 
-    jobs, total = service.list_jobs(user_id=user_id, status=status, limit=limit, offset=offset)
+    cursor: KeysetCursor | None = None
+    if after:
+        try:
+            cursor = decode_cursor(after)
+        except ValueError:
+            return _invalid_cursor_response()
+
+    last_modified = await service.get_jobs_last_modified(user_id=user_id)
+    etag = make_etag("jobs", user_id, last_modified, status, limit, offset, after, total)
+    if if_none_match is not None:
+        if etag_matches(if_none_match, etag):
+            return not_modified_response(etag=etag, last_modified=last_modified)
+    elif not_modified_since(if_modified_since, last_modified):
+        return not_modified_response(etag=etag, last_modified=last_modified)
+
+    jobs, count, has_more = await service.list_jobs(
+        user_id=user_id,
+        status=status,
+        limit=limit,
+        offset=offset,
+        after=cursor,
+        total=total,
+    )
     items = [JobResource.model_validate(job) for job in jobs]
-    return JobListResponse(data=items, total=total)
+    next_cursor = encode_cursor(jobs[-1].created_at, jobs[-1].id) if has_more else None
+    estimated = total == TOTAL_ESTIMATE and count is not None and count >= settings.job_list_estimate_cap
+    response.headers.update(cache_headers(etag=etag, last_modified=last_modified))
+    return JobListResponse(data=items, total=count, total_estimated=estimated, next_cursor=next_cursor)
 
 
-@router.get("/{job_id}", response_model=JobResource, summary="取得轉譯作業詳情")
+@router.get("/stream", summary="以單一 SSE 連線串流使用者所有進行中作業的事件")
+async def stream_active_jobs(
+    request: Request,
+    service: AsyncJobService = Depends(get_job_service),
+    open_service: JobServiceOpener = Depends(get_job_service_opener),
+    user_id: UUID = Depends(require_current_user_id),
+    hub: JobEventHub = Depends(get_event_hub),
+    buffer: JobEventBuffer = Depends(get_event_buffer),
+    limiter: StreamLimiter = Depends(get_stream_limiter),
+    last_event_id: str | None = Header(default=None, alias="Last-Event-ID"),
+) -> StreamingResponse:
+    """多工串流使用者所有未結束作業的事件，連線期間新建立的作業也會自動加入。
+
+    每個訊框的 data 帶有 jobId；id 為複合 Last-Event-ID（各作業最後送出的事件），斷線重連時據此逐一續傳。
+    """
+
+    resume: Dict[UUID, EventReplay] = {}
+    if last_event_id:
+        try:
+            cursors = decode_composite_event_id(last_event_id)
+        except ValueError:
+            cursors = None
+        if cursors is None or len(cursors) > MAX_MULTIPLEX_RESUME_JOBS:
+            return JSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"error": {"code": "INVALID_LAST_EVENT_ID", "message": "Last-Event-ID 必須為 jobId:eventId 以分號串接"}},
+            )
+        for resume_job_id, resume_event_id in cursors.items():
+            replay = await _resolve_resume_point(
+                service, buffer, user_id=user_id, job_id=resume_job_id, event_id=resume_event_id
+            )
+            if replay is None:
+                return JSONResponse(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    content={"error": {"code": "INVALID_LAST_EVENT_ID", "message": "Last-Event-ID 不存在或不屬於該使用者"}},
+                )
+            resume[resume_job_id] = replay
+
+    try:
+        slot = limiter.acquire(user_id)
+    except StreamLimitExceededError as exc:
+        return _stream_limit_response(exc)
+
+    discovery_interval = settings.event_multiplex_discovery_interval  # 定期查詢新作業，涵蓋其他行程建立的作業
+    queue: asyncio.Queue[HubEvent] = _event_queue()  # 所有作業訂閱共用的事件佇列
+    streams: Dict[UUID, JobStream] = {}
+    finished: Set[UUID] = set()  # 本連線已送出 end 的作業，不再重新加入
+
+    def frame_id() -> str | None:
+        """組合各作業目前的游標，尚無任何已落地事件時不輸出 id。"""
+
+        cursors = {
+            stream_job_id: stream.last_event_id
+            for stream_job_id, stream in streams.items()
+            if stream.last_event_id is not None
+        }
+        return encode_composite_event_id(cursors) if cursors else None
+
+    def open_stream(stream_job_id: UUID) -> JobStream:
+        """建立作業串流，若在續傳清單中則從該事件之後開始。"""
+
+        stream = JobStream(
+            hub,
+            stream_job_id,
+            fetch=_job_event_fetcher(open_service, buffer, user_id=user_id, job_id=stream_job_id),
+            queue=queue,
+            replay=resume.pop(stream_job_id, None),
+        )
+        streams[stream_job_id] = stream
+        return stream
+
+    def finish(stream_job_id: UUID, job_status: str | None) -> bytes | None:
+        """移除已結束的作業；作業已不存在時不送出 end。"""
+
+        stream = streams.pop(stream_job_id, None)
+        if stream is not None:
+            stream.close()
+        finished.add(stream_job_id)
+        return encode_tagged_end_frame(stream_job_id, job_status) if job_status is not None else None
+
+    async def event_source() -> AsyncGenerator[bytes, None]:
+        """產生多工 SSE 串流資料。"""
+
+        changed = hub.watch_user(user_id)
+        last_sent_monotonic = time.monotonic()
+        next_discovery = 0.0
+        try:
+            while True:
+                if await request.is_disconnected():
+                    break
+                if any(stream.overflowed for stream in streams.values()):
+                    slot.drop("queue_overflow")
+                    break
+
+                now = time.monotonic()
+                if changed.is_set() or now >= next_discovery:
+                    changed.clear()
+                    next_discovery = now + discovery_interval
+                    # 續傳的作業即使已結束也要補齊，確保客戶端收到斷線期間的事件與 end
+                    job_ids = list(resume) + await service.list_active_job_ids(user_id=user_id)
+                    for new_job_id in job_ids:
+                        if new_job_id in streams or new_job_id in finished:
+                            continue
+                        stream = open_stream(new_job_id)
+                        async for event in stream.catch_up():
+                            last_sent_monotonic = time.monotonic()
+                            yield encode_tagged_event_frame(event, frame_id())
+                        if stream.ended:
+                            end_frame = finish(new_job_id, stream.end_status)
+                            if end_frame is not None:
+                                yield end_frame
+
+                sent = False
+                for item in await drain_queue(queue, DISCONNECT_CHECK_INTERVAL):
+                    stream = streams.get(item.job_id)
+                    if stream is None:
+                        continue
+                    if isinstance(item, JobStreamEnd):
+                        end_frame = finish(item.job_id, item.status)
+                        if end_frame is None:
+                            continue
+                        frame = end_frame
+                    elif isinstance(item, JobEvent):
+                        if not stream.accept(item):
+                            continue
+                        frame = encode_tagged_event_frame(item, frame_id())
+                    else:
+                        frame = encode_tagged_event_frame(item, None)
+                    last_sent_monotonic = time.monotonic()
+                    sent = True
+                    yield frame
+                if not sent:
+                    now = time.monotonic()
+                    if now - last_sent_monotonic >= HEARTBEAT_INTERVAL:
+                        last_sent_monotonic = now
+                        yield HEARTBEAT_FRAME
+        finally:
+            hub.unwatch_user(user_id, changed)
+            for stream in streams.values():
+                stream.close()
+            logger.info("Multiplexed SSE stream closed user={} jobs={}", user_id, len(streams) + len(finished))
+
+    return GuardedStreamingResponse(
+        event_source(),
+        slot=slot,
+        send_timeout=settings.stream_send_timeout,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
+
+
+@router.websocket("/ws")
+async def job_events_websocket(
+    websocket: WebSocket,
+    open_service: JobServiceOpener = Depends(get_job_service_opener),
+    user_id: UUID = Depends(require_websocket_user_id),
+    hub: JobEventHub = Depends(get_event_hub),
+    buffer: JobEventBuffer = Depends(get_event_buffer),
+    limiter: StreamLimiter = Depends(get_stream_limiter),
+) -> None:
+    """以 WebSocket 與 msgpack 訊框推送作業事件，連線期間可隨時訂閱或退訂作業。
+
+    訊框格式見 app.services.ws_protocol；permessage-deflate 由 ASGI 伺服器（uvicorn 預設開啟）與客戶端協商。
+    連線可能持續數小時且同時訂閱多個作業，所有查詢皆以 open_service 開啟短期 Session，不持有連線層級的 Session。
+    """
+
+    await websocket.accept()
+    try:
+        slot = limiter.acquire(user_id)
+    except StreamLimitExceededError:
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+    # 客戶端訊框與事件中心的事件共用同一佇列，由單一迴圈依序處理，避免多處同時寫入連線
+    queue: asyncio.Queue[Any] = _event_queue()
+    streams: Dict[UUID, JobStream] = {}
+
+    async def send(frame: bytes) -> None:
+        # 傳送緩衝滿載時 send 會等待客戶端讀取，逾時視為消費過慢
+        await asyncio.wait_for(websocket.send_bytes(frame), timeout=settings.stream_send_timeout)
+
+    async def receive() -> None:
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                raw = message.get("bytes")
+                await queue.put(raw if raw is not None else b"")
+        finally:
+            with contextlib.suppress(asyncio.QueueFull):
+                queue.put_nowait(None)
+
+    async def subscribe(job_id: UUID, after: UUID | None) -> None:
+        if job_id in streams:
+            return
+        if len(streams) >= MAX_SUBSCRIPTIONS:
+            await send(encode_error("TOO_MANY_SUBSCRIPTIONS", job_id))
+            return
+        replay: EventReplay | None = None
+        async with open_service() as service:
+            if await service.get_job(user_id=user_id, job_id=job_id) is None:
+                await send(encode_error("JOB_NOT_FOUND", job_id))
+                return
+            if after is not None:
+                replay = await _resolve_resume_point(service, buffer, user_id=user_id, job_id=job_id, event_id=after)
+                if replay is None:
+                    await send(encode_error("INVALID_LAST_EVENT_ID", job_id))
+                    return
+
+        stream = JobStream(
+            hub,
+            job_id,
+            fetch=_job_event_fetcher(open_service, buffer, user_id=user_id, job_id=job_id),
+            queue=queue,
+            replay=replay,
+        )
+        streams[job_id] = stream
+        await send(encode_subscribed(job_id))
+        async for event in stream.catch_up():
+            await send(encode_event(event))
+        if stream.ended:
+            streams.pop(job_id, None)
+            await send(encode_end(job_id, stream.end_status))
+
+    async def handle(raw: bytes) -> None:
+        try:
+            command = decode_command(raw)
+        except ProtocolError:
+            await send(encode_error("INVALID_MESSAGE"))
+            return
+        if command.op == OP_PING:
+            await send(PONG_FRAME)
+        elif command.op == OP_UNSUBSCRIBE:
+            for job_id in command.job_ids:
+                stream = streams.pop(job_id, None)
+                if stream is not None:
+                    stream.close()
+        else:
+            for job_id in command.job_ids:
+                await subscribe(job_id, command.after.get(job_id))
+
+    reader = asyncio.create_task(receive())
+    try:
+        while True:
+            if reader.done() and queue.empty():
+                return
+            if any(stream.overflowed for stream in streams.values()):
+                slot.drop("queue_overflow")
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                return
+            for item in await drain_queue(queue, HEARTBEAT_INTERVAL):
+                if item is None:
+                    return
+                if isinstance(item, bytes):
+                    await handle(item)
+                    continue
+                stream = streams.get(item.job_id)
+                if stream is None:
+                    continue
+                if isinstance(item, JobStreamEnd):
+                    streams.pop(item.job_id).close()
+                    await send(encode_end(item.job_id, item.status))
+                elif isinstance(item, JobEvent):
+                    if stream.accept(item):
+                        await send(encode_event(item))
+                else:
+                    await send(encode_event(item))
+    except WebSocketDisconnect:
+        pass
+    except asyncio.TimeoutError:
+        slot.drop("send_timeout")
+    finally:
+        slot.release()
+        reader.cancel()
+        for stream in streams.values():
+            stream.close()
+        logger.info("Job events WebSocket closed user={} jobs={}", user_id, len(streams))
+
+
+@router.get(
+    "/{job_id}",
+    response_model=JobDetailResource,
+    response_model_exclude_unset=True,
+    summary="取得轉譯作業詳情",
+)
 async def retrieve_job(
     job_id: UUID,
-    service: JobService = Depends(get_job_service),
+    response: Response,
+    include: str | None = Query(default=None, description="以逗號分隔的內嵌資源：assets、events"),
+    if_none_match: str | None = Header(default=None),
+    service: AsyncJobService = Depends(get_job_service),
     user_id: UUID = Depends(require_current_user_id),
-) -> JobResource:
-    """取得指定轉譯作業的詳細資訊。"""
+) -> JobDetailResource | JSONResponse | Response:
+    """取得指定轉譯作業的詳細資訊，可一次內嵌資產與前 100 筆事件，詳情頁只需一個請求。
 
-    job = service.get_job(user_id=user_id, job_id=job_id)
-    if job is None:
+    先以版本查詢產生 ETag，符合 If-None-Match 時不執行完整查詢直接回傳 304。
+    """
+
+    includes = {item.strip() for item in include.split(",") if item.strip()} if include else set()
+    unknown = includes - JOB_DETAIL_INCLUDES
+    if unknown:
         return JSONResponse(
-            status_code=status.HTTP_404_NOT_FOUND,
-            content={"error": {"code": "JOB_NOT_FOUND", "message": "Job not found"}},
+            status_code=status.HTTP_400_BAD_REQUEST,
+            content={"error": {"code": "INVALID_INCLUDE", "message": f"不支援的 include：{', '.join(sorted(unknown))}"}},
         )
 
-    return JobResource.model_validate(job)
+    reads = await service.consistent_reads(user_id=user_id)  # 版本與內容需讀自同一來源
+    version = await reads.get_job_version(user_id=user_id, job_id=job_id)
+    if version is None:
+        return _job_not_found_response()
+    etag = make_etag("job", job_id, *version, *sorted(includes))
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag=etag)
+
+    detail = await reads.get_job_detail(
+        user_id=user_id,
+        job_id=job_id,
+        include_assets="assets" in includes,
+        include_events="events" in includes,
+        events_limit=EMBEDDED_EVENTS_LIMIT,
+    )
+    if detail is None:
+        return _job_not_found_response()
+
+    job, assets, events_page = detail
+    resource = JobDetailResource.model_validate(job)
+    # 只設定要求的欄位，搭配 response_model_exclude_unset 讓未內嵌的欄位不出現在回應中
+    if assets is not None:
+        resource.assets = [ScoreAssetResource.model_validate(asset) for asset in assets]
+    if events_page is not None:
+        events, has_more = events_page
+        resource.events = [JobEventResource.model_validate(event) for event in events]
+        resource.events_next_cursor = encode_cursor(events[-1].created_at, events[-1].id) if has_more else None
+    response.headers.update(cache_headers(etag=etag))
+    return resource
 
 
 @router.get(
@@ -91,16 +760,39 @@ async def retrieve_job(
 )
 async def list_job_assets(
     job_id: UUID,
-    service: JobService = Depends(get_job_service),
+    response: Response,
+    if_none_match: str | None = Header(default=None),
+    service: AsyncJobService = Depends(get_job_service),
+    cache: FinishedJobCache = Depends(get_finished_job_cache),
     user_id: UUID = Depends(require_current_user_id),
-) -> ScoreAssetListResponse:
-    """取得作業產出的譜面資產列表。"""
+) -> ScoreAssetListResponse | Response:
+    """取得作業產出的譜面資產列表；資產未變動且符合 If-None-Match 時回傳 304。
+
+    已結束作業的回應本文會放入快取，之後的請求不查詢資料庫。
+    """
+
+    cached = cache.get(user_id, job_id, "assets")
+    if cached is not None:
+        return _cached_body_response(cached, if_none_match)
 
-    assets = service.list_job_assets(user_id=user_id, job_id=job_id)
+    token = cache.token()
+    reads, version = await _cacheable_reads(service, user_id=user_id, job_id=job_id)
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    etag = _assets_etag(job_id, version)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag=etag)
+
+    assets = await reads.list_job_assets(user_id=user_id, job_id=job_id)
     if assets is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
     items = [ScoreAssetResource.model_validate(asset) for asset in assets]
-    return ScoreAssetListResponse(data=items)
+    body = ScoreAssetListResponse(data=items)
+    if version.status in TERMINAL_JOB_STATUSES:
+        encoded = body.model_dump_json(by_alias=True).encode("utf-8")
+        return _cached_body_response(cache.put(user_id, job_id, "assets", body=encoded, etag=etag, token=token), None)
+    response.headers.update(cache_headers(etag=etag))
+    return body
 
 
 @router.get(
@@ -110,16 +802,53 @@ async def list_job_assets(
 )
 async def list_job_events(
     job_id: UUID,
-    service: JobService = Depends(get_job_service),
+    response: Response,
+    limit: int | None = Query(default=None, ge=1, le=500, description="回傳筆數上限；省略時回傳完整時間軸"),
+    after: str | None = Query(default=None, description="上一頁回傳的 nextCursor"),
+    if_none_match: str | None = Header(default=None),
+    service: AsyncJobService = Depends(get_job_service),
+    cache: FinishedJobCache = Depends(get_finished_job_cache),
     user_id: UUID = Depends(require_current_user_id),
-) -> JobEventListResponse:
-    """取得作業事件時間軸。"""
+) -> JobEventListResponse | JSONResponse | Response:
+    """以 (createdAt, id) 游標分頁取得作業事件時間軸；沒有新事件且符合 If-None-Match 時回傳 304。
+
+    未帶 limit 時維持舊版行為回傳游標之後的所有事件，不會截斷既有客戶端的時間軸。
+
+    已結束作業的每一頁依 (limit, after) 放入快取，之後的請求不查詢資料庫。
+    """
+
+    cursor: KeysetCursor | None = None
+    if after:
+        try:
+            cursor = decode_cursor(after)
+        except ValueError:
+            return _invalid_cursor_response()
+
+    variant = ("events", limit, after)
+    cached = cache.get(user_id, job_id, variant)
+    if cached is not None:
+        return _cached_body_response(cached, if_none_match)
 
-    events = service.list_job_events(user_id=user_id, job_id=job_id)
-    if events is None:
+    token = cache.token()
+    reads, version = await _cacheable_reads(service, user_id=user_id, job_id=job_id)
+    if version is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    etag = _events_etag(job_id, version, limit, after)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag=etag)
+
+    page = await reads.list_job_events(user_id=user_id, job_id=job_id, limit=limit, after=cursor)
+    if page is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    events, has_more = page
     items = [JobEventResource.model_validate(event) for event in events]
-    return JobEventListResponse(data=items)
+    next_cursor = encode_cursor(events[-1].created_at, events[-1].id) if has_more else None
+    body = JobEventListResponse(data=items, next_cursor=next_cursor)
+    if version.status in TERMINAL_JOB_STATUSES:
+        encoded = body.model_dump_json(by_alias=True).encode("utf-8")
+        return _cached_body_response(cache.put(user_id, job_id, variant, body=encoded, etag=etag, token=token), None)
+    response.headers.update(cache_headers(etag=etag))
+    return body
 
 
 @router.get(
@@ -129,21 +858,25 @@ async def list_job_events(
 async def stream_job_events(
     job_id: UUID,
     request: Request,
-    service: JobService = Depends(get_job_service),
+    service: AsyncJobService = Depends(get_job_service),
+    open_service: JobServiceOpener = Depends(get_job_service_opener),
     user_id: UUID = Depends(require_current_user_id),
+    hub: JobEventHub = Depends(get_event_hub),
+    frames: SSEFrameCache = Depends(get_sse_frame_cache),
+    buffer: JobEventBuffer = Depends(get_event_buffer),
+    limiter: StreamLimiter = Depends(get_stream_limiter),
     last_event_id: str | None = Header(default=None, alias="Last-Event-ID"),
 ) -> StreamingResponse:
     """以 SSE 持續串流指定作業的事件。"""
 
-    job = service.get_job(user_id=user_id, job_id=job_id)
+    job = await service.get_job(user_id=user_id, job_id=job_id)
     if job is None:
         return JSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
             content={"error": {"code": "JOB_NOT_FOUND", "message": "Job not found"}},
         )
 
-    last_event_uuid: UUID | None = None  # 最後一次送出的事件 ID，用於去重補齊
-    last_created_at: datetime | None = None  # 最後一次送出的事件時間戳
+    replay: EventReplay | None = None  # 續傳錨點與緩衝中可直接補齊的事件
     if last_event_id:
         try:
             last_event_uuid = UUID(last_event_id)
@@ -153,71 +886,84 @@ async def stream_job_events(
                 content={"error": {"code": "INVALID_LAST_EVENT_ID", "message": "Last-Event-ID 必須為 UUID"}},
             )
 
-        matched_event = service.get_job_event(user_id=user_id, job_id=job_id, event_id=last_event_uuid)
-        if matched_event is None:
+        replay = await _resolve_resume_point(service, buffer, user_id=user_id, job_id=job_id, event_id=last_event_uuid)
+        if replay is None:
             return JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={"error": {"code": "INVALID_LAST_EVENT_ID", "message": "Last-Event-ID 不存在或不屬於該任務"}},
             )
-        last_created_at = matched_event.created_at
 
-    poll_interval = 1.0  # 每 1 秒輪詢一次事件表
-    heartbeat_interval = 30.0  # 每 30 秒送出一次 keep-alive
-    heartbeat_payload = b":keep-alive\n\n"  # SSE 心跳訊號，保持連線
+    try:
+        slot = limiter.acquire(user_id)
+    except StreamLimitExceededError as exc:
+        return _stream_limit_response(exc)
+
+    baseline_poll_interval = 1.0  # 舊版每條連線每秒查詢一次，用於估算節省的查詢數
     last_sent_monotonic = time.monotonic()  # 紀錄最近一次輸出的時間戳
+    opened_monotonic = time.monotonic()  # 連線開始時間
 
-    def serialize_event(event: JobEvent) -> bytes:
-        """將事件轉換為 SSE 格式的位元組資料。"""
+    def queries_saved(shared_polls: int) -> int:
+        """相較每秒輪詢，本連線節省的查詢次數。"""
 
-        resource = JobEventResource.model_validate(event)
-        payload = json.dumps(resource.model_dump(by_alias=True, mode="json"), ensure_ascii=False)
-        lines = [f"id:{event.id}", f"event:{resource.stage}", f"data:{payload}", ""]
-        return "\n".join(lines).encode("utf-8")
+        baseline = int((time.monotonic() - opened_monotonic) / baseline_poll_interval)
+        return max(0, baseline - shared_polls)
+
+    stream = JobStream(
+        hub,
+        job_id,
+        fetch=_job_event_fetcher(open_service, buffer, user_id=user_id, job_id=job_id),
+        queue=_event_queue(),
+        replay=replay,
+    )
 
     async def event_source() -> AsyncGenerator[bytes, None]:
         """產生 SSE 串流資料。"""
 
-        nonlocal last_event_uuid, last_created_at, last_sent_monotonic
-
-        initial_events = service.list_job_events_after(
-            user_id=user_id,
-            job_id=job_id,
-            created_after=last_created_at,
-            last_event_id=last_event_uuid,
-        )
-        for event in initial_events:
-            last_event_uuid = event.id
-            last_created_at = event.created_at
-            last_sent_monotonic = time.monotonic()
-            yield serialize_event(event)
-
-        while True:
-            if await request.is_disconnected():
-                break
+        nonlocal last_sent_monotonic
 
-            new_events = service.list_job_events_after(
-                user_id=user_id,
-                job_id=job_id,
-                created_after=last_created_at,
-                last_event_id=last_event_uuid,
-            )
-            if new_events:
+        try:
+            async for event in stream.catch_up():
+                last_sent_monotonic = time.monotonic()
+                yield frames.encode(event)
+            if stream.ended:
+                yield encode_end_frame(stream.end_status, queries_saved(stream.shared_polls))
+                return
+
+            while True:
+                if await request.is_disconnected():
+                    break
+                if stream.overflowed:
+                    slot.drop("queue_overflow")
+                    break
+
+                new_events = await stream.subscription.next_batch(timeout=DISCONNECT_CHECK_INTERVAL)
+                sent = False
                 for event in new_events:
-                    last_event_uuid = event.id
-                    last_created_at = event.created_at
+                    if isinstance(event, JobStreamEnd):
+                        yield encode_end_frame(event.status, queries_saved(stream.shared_polls))
+                        return
+                    if isinstance(event, JobEvent) and not stream.accept(event):
+                        continue
                     last_sent_monotonic = time.monotonic()
-                    yield serialize_event(event)
-            else:
-                now = time.monotonic()
-                if now - last_sent_monotonic >= heartbeat_interval:
-                    last_sent_monotonic = now
-                    yield heartbeat_payload
-
-            await asyncio.sleep(poll_interval)
-
-    headers = {
-        "Cache-Control": "no-cache",
-        "Connection": "keep-alive",
-        "X-Accel-Buffering": "no",
-    }
-    return StreamingResponse(event_source(), media_type="text/event-stream", headers=headers)
+                    sent = True
+                    yield frames.encode(event)
+                if not sent:
+                    now = time.monotonic()
+                    if now - last_sent_monotonic >= HEARTBEAT_INTERVAL:
+                        last_sent_monotonic = now
+                        yield HEARTBEAT_FRAME
+        finally:
+            stream.close()
+            logger.info(
+                "SSE stream closed job={} queries_saved={}",
+                job_id,
+                queries_saved(stream.shared_polls),
+            )
+
+    return GuardedStreamingResponse(
+        event_source(),
+        slot=slot,
+        send_timeout=settings.stream_send_timeout,
+        media_type="text/event-stream",
+        headers=SSE_HEADERS,
+    )
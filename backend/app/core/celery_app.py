@@ -3,6 +3,7 @@ from __future__ import annotations
 
 from celery import Celery
 
+from app.core.celery_beat import build_beat_schedule
 from app.core.config import settings
 from app.tasks.utils import register_tasks
 
@@ -21,6 +22,7 @@ def create_celery_app() -> Celery:
         task_acks_late=True,
         task_track_started=True,
         worker_max_tasks_per_child=100,
+        beat_schedule=build_beat_schedule(),
     )
 
     register_tasks(celery)
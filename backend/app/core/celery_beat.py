@@ -0,0 +1,25 @@
+﻿"""Celery beat 定期排程。"""
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from app.core.config import settings
+
+
+def build_beat_schedule() -> Dict[str, Dict[str, Any]]:
+    """回傳 beat 排程設定，由 celery-beat 容器執行。"""
+
+    return {
+        "reconcile-job-counters": {
+            "task": "app.tasks.maintenance.reconcile_job_counters",
+            "schedule": settings.job_counter_reconcile_interval,
+        },
+        "ensure-job-event-partitions": {
+            "task": "app.tasks.maintenance.ensure_job_event_partitions",
+            "schedule": settings.job_event_maintenance_interval,
+        },
+        "archive-job-event-partitions": {
+            "task": "app.tasks.maintenance.archive_job_event_partitions",
+            "schedule": settings.job_event_maintenance_interval,
+        },
+    }
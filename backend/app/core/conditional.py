@@ -0,0 +1,89 @@
+﻿"""條件式 GET 工具：ETag / If-None-Match 與 Last-Modified / If-Modified-Since。"""
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict
+
+from fastapi import Response, status
+
+# 回應可由瀏覽器保存，但每次使用前都需向伺服器驗證
+CACHE_CONTROL = "private, no-cache"
+# HTTP 日期只到秒，修改時間距今不足一秒時同一秒內仍可能再修改
+LAST_MODIFIED_SETTLE = timedelta(seconds=1)
+
+
+def make_etag(*parts: Any) -> str:
+    """由版本欄位與查詢參數產生強 ETag；任一欄位改變時 ETag 隨之改變。"""
+
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match 是否包含目前的 ETag；依 RFC 9110 以弱比較判斷，並支援 *。"""
+
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def format_http_date(value: datetime) -> str:
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _settled(last_modified: datetime) -> bool:
+    """修改時間所在的秒是否已結束；未結束時以秒為單位的日期無法區分之後同一秒內的修改。"""
+
+    return last_modified <= datetime.now(timezone.utc) - LAST_MODIFIED_SETTLE
+
+
+def not_modified_since(if_modified_since: str | None, last_modified: datetime | None) -> bool:
+    """資源自 If-Modified-Since 之後是否未再修改；HTTP 日期只到秒，比較前捨去毫秒。
+
+    修改時間距今不足一秒時一律視為已修改，避免同一秒內的後續修改被誤判為未變動。
+    """
+
+    if not if_modified_since or last_modified is None or not _settled(last_modified):
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return last_modified.replace(microsecond=0) <= since
+
+
+def cache_headers(*, etag: str, last_modified: datetime | None = None) -> Dict[str, str]:
+    """200 與 304 回應共用的驗證標頭；修改時間距今不足一秒時不送出 Last-Modified。"""
+
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None and _settled(last_modified):
+        headers["Last-Modified"] = format_http_date(last_modified)
+    return headers
+
+
+def not_modified_response(*, etag: str, last_modified: datetime | None = None) -> Response:
+    """304 回應不帶本文，只回傳驗證標頭。"""
+
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=cache_headers(etag=etag, last_modified=last_modified),
+    )
+
+
+__all__ = [
+    "CACHE_CONTROL",
+    "cache_headers",
+    "etag_matches",
+    "format_http_date",
+    "make_etag",
+    "not_modified_response",
+    "not_modified_since",
+]
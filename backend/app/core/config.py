@@ -1,5 +1,7 @@
 ﻿"""核心設定模組。"""
 from functools import lru_cache
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -9,18 +11,65 @@ class Settings(BaseSettings):
     api_v1_prefix: str = "/v1"
     project_name: str = "MusicTab API"
     supabase_url: str | None = None
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: Literal["always", "idle", "never"] = "idle"
+    db_pool_ping_idle_seconds: float = 30.0
+    db_transaction_pooler: bool = False
+    supabase_direct_url: str | None = None
+    supabase_replica_url: str | None = None
+    replica_read_your_writes_seconds: float = 5.0
+    replica_max_lag_seconds: float = 2.0
+    replica_lag_check_interval: float = 5.0
     supabase_api_key: str | None = None
     supabase_service_role_key: str | None = None
     supabase_jwks_url: str | None = None
     supabase_jwt_audience: str = "authenticated"
     supabase_jwt_issuer: str | None = None
+    auth_token_cache_size: int = 10000
+    jwks_cache_seconds: int = 300
+    jwks_refresh_ahead_seconds: float = 60.0
+    jwks_max_stale_seconds: float = 3600.0
+    jwks_min_refresh_interval: float = 10.0
+    jwks_unknown_kid_ttl: float = 300.0
     supabase_storage_bucket: str = "transcriptions"
     upload_signed_url_expires: int = 900
     upload_max_bytes: int = 50 * 1024 * 1024
     job_submission_active_limit: int = 3
+    job_list_estimate_cap: int = 1000
+    job_batch_max_items: int = 50
+    job_counter_reconcile_interval: float = 300.0
+    job_event_partitions_ahead: int = 2
+    job_event_retention_months: int = 3
+    job_event_maintenance_interval: float = 3600.0
     redis_url: str = "redis://localhost:6379/0"
     celery_broker_url: str | None = None
     celery_result_url: str | None = None
+    event_hub_poll_interval: float = 1.0
+    event_hub_push_poll_interval: float = 15.0
+    event_hub_idle_seconds: float = 10.0
+    event_hub_pending_backoff: str = "1,2,5"
+    event_listener_enabled: bool = True
+    event_bus_enabled: bool = True
+    event_milestone_batch_size: int = 20
+    event_flush_interval: float = 1.0
+    event_copy_threshold: int = 500
+    event_progress_window: float = 0.5
+    sse_frame_cache_size: int = 2048
+    event_page_size: int = 500
+    event_multiplex_discovery_interval: float = 5.0
+    event_buffer_size: int = 200
+    event_buffer_idle_seconds: float = 300.0
+    event_buffer_max_bytes: int = 32 * 1024 * 1024
+    finished_job_cache_max_bytes: int = 64 * 1024 * 1024
+    finished_job_cache_max_entry_bytes: int = 1024 * 1024
+    stream_max_per_user: int = 5
+    stream_max_total: int = 1000
+    stream_retry_after_seconds: int = 5
+    stream_queue_max_events: int = 1000
+    stream_send_timeout: float = 10.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -1,18 +1,84 @@
 ﻿"""資料庫連線與 Session 工具。"""
 from __future__ import annotations
 
-from collections.abc import Iterator
+from collections.abc import AsyncIterator, Iterator
 
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from app.core.config import settings
+from app.core.db_pool import PRE_PING_IDLE, PoolTelemetry, engine_options, install_idle_ping
+from app.core.db_routing import REPLICA_LAG_SQL, ReplicaRouter
+from app.core.metrics import metrics
 
-# 建立 SQLModel 專用 engine，使用 Supabase 連線字串。
-engine = create_engine(
+pool_telemetry = PoolTelemetry("db_pool")
+async_pool_telemetry = PoolTelemetry("db_async_pool")
+replica_pool_telemetry = PoolTelemetry("db_replica_pool")
+
+# 建立 SQLModel 專用 engine，使用 Supabase 連線字串；供 Celery worker 與 Alembic 等同步流程使用。
+engine = create_engine(settings.supabase_url, **engine_options(settings, telemetry=pool_telemetry))
+
+# API 事件迴圈使用的非同步 engine；postgresql+psycopg 會自動選用 psycopg 的 async 驅動。
+async_engine = create_async_engine(
     settings.supabase_url,
-    echo=False,
-    pool_pre_ping=True,
+    **engine_options(settings, telemetry=async_pool_telemetry, asynchronous=True),
+)
+
+# 選用的讀取副本，只承接 API 的唯讀查詢；未設定時所有查詢都走主庫。
+replica_engine = (
+    create_async_engine(
+        settings.supabase_replica_url,
+        **engine_options(settings, telemetry=replica_pool_telemetry, asynchronous=True),
+    )
+    if settings.supabase_replica_url
+    else None
+)
+
+if settings.db_pool_pre_ping == PRE_PING_IDLE:
+    install_idle_ping(engine, idle_seconds=settings.db_pool_ping_idle_seconds)
+    install_idle_ping(async_engine.sync_engine, idle_seconds=settings.db_pool_ping_idle_seconds)
+    if replica_engine is not None:
+        install_idle_ping(replica_engine.sync_engine, idle_seconds=settings.db_pool_ping_idle_seconds)
+
+metrics.register_collector("db_pool", pool_telemetry.stats)
+metrics.register_collector("db_async_pool", async_pool_telemetry.stats)
+
+# expire_on_commit=False 讓提交後的物件仍可序列化，避免在事件迴圈外觸發延遲載入
+async_session_factory = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+)
+replica_session_factory = (
+    async_sessionmaker(replica_engine, class_=AsyncSession, expire_on_commit=False)
+    if replica_engine is not None
+    else None
+)
+
+
+async def _replica_lag() -> float:
+    """量測讀取副本落後主庫的秒數。"""
+
+    assert replica_engine is not None
+    async with replica_engine.connect() as connection:
+        return float((await connection.execute(REPLICA_LAG_SQL)).scalar_one())
+
+
+# replica_router 為行程內共用的讀寫分流狀態；未設定副本時為 None
+replica_router = (
+    ReplicaRouter(
+        probe=_replica_lag,
+        pin_seconds=settings.replica_read_your_writes_seconds,
+        max_lag=settings.replica_max_lag_seconds,
+        check_interval=settings.replica_lag_check_interval,
+    )
+    if replica_engine is not None
+    else None
 )
+if replica_router is not None:
+    metrics.register_collector("db_replica_pool", replica_pool_telemetry.stats)
+    metrics.register_collector("db_replica", replica_router.stats)
 
 
 def get_session() -> Iterator[Session]:
@@ -22,4 +88,43 @@ def get_session() -> Iterator[Session]:
         yield session
 
 
-__all__ = ["engine", "get_session", "SQLModel", "Session"]
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    """提供非同步資料庫 Session，查詢不會阻塞事件迴圈。"""
+
+    async with async_session_factory() as session:
+        yield session
+
+
+async def get_replica_session() -> AsyncIterator[AsyncSession | None]:
+    """提供讀取副本的非同步 Session；未設定副本時提供 None。Session 在第一次查詢時才取得連線。"""
+
+    if replica_session_factory is None:
+        yield None
+        return
+    async with replica_session_factory() as session:
+        yield session
+
+
+def get_replica_router() -> ReplicaRouter | None:
+    """提供 FastAPI 依賴注入的 ReplicaRouter；未設定副本時為 None。"""
+
+    return replica_router
+
+
+__all__ = [
+    "async_engine",
+    "async_pool_telemetry",
+    "async_session_factory",
+    "engine",
+    "get_async_session",
+    "get_replica_router",
+    "get_replica_session",
+    "get_session",
+    "pool_telemetry",
+    "replica_engine",
+    "replica_router",
+    "replica_session_factory",
+    "AsyncSession",
+    "SQLModel",
+    "Session",
+]
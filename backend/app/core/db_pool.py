@@ -0,0 +1,133 @@
+﻿"""資料庫連線池設定與遙測：依設定調整池大小與存活檢查，並記錄取得連線的等待時間。"""
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.config import Settings
+from app.core.metrics import MetricsRegistry, metrics
+
+PRE_PING_ALWAYS = "always"  # 每次取出連線都先 ping
+PRE_PING_IDLE = "idle"  # 閒置超過 db_pool_ping_idle_seconds 的連線才 ping
+PRE_PING_NEVER = "never"
+
+_CHECKIN_AT = "checkin_at"  # 記錄於 ConnectionRecord.info 的歸還時間
+
+
+class PoolTelemetry:
+    """單一連線池的統計：取得連線的等待時間、使用中連線數、溢出與逾時次數。"""
+
+    def __init__(self, name: str, *, registry: MetricsRegistry = metrics) -> None:
+        self.name = name
+        self._pool: QueuePool | None = None
+        self._checkouts = registry.counter(f"{name}_checkouts_total", "自連線池取得連線的次數")
+        self._overflows = registry.counter(f"{name}_overflow_total", "超出 pool_size 額外建立連線的次數")
+        self._timeouts = registry.counter(f"{name}_timeouts_total", "等待連線逾時的次數")
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.last_wait_ms = 0.0
+
+    def timed_checkout(self, pool: QueuePool, checkout: Callable[[], Any]) -> Any:
+        """執行連線池的取得流程並記錄等待時間；建立溢出連線或逾時時累計次數。"""
+
+        self._pool = pool
+        overflow = pool.overflow()
+        start = time.perf_counter()
+        try:
+            connection = checkout()
+        except exc.TimeoutError:
+            self._timeouts.inc()
+            raise
+        finally:
+            waited = (time.perf_counter() - start) * 1000
+            self.last_wait_ms = waited
+            self.wait_ms_total += waited
+            self.wait_ms_max = max(self.wait_ms_max, waited)
+        self._checkouts.inc()
+        if pool.overflow() > max(0, overflow):
+            self._overflows.inc()
+        return connection
+
+    def stats(self) -> dict[str, int]:
+        """回傳池大小、使用中與閒置連線數、溢出數與等待時間統計（毫秒）。"""
+
+        pool = self._pool
+        return {
+            "size": pool.size() if pool is not None else 0,
+            "in_use": pool.checkedout() if pool is not None else 0,
+            "idle": pool.checkedin() if pool is not None else 0,
+            "overflow": max(0, pool.overflow()) if pool is not None else 0,
+            "checkouts": self._checkouts.value,
+            "wait_ms_total": int(self.wait_ms_total),
+            "wait_ms_max": int(self.wait_ms_max),
+            "last_wait_ms": int(self.last_wait_ms),
+        }
+
+
+def instrumented_pool_class(base: type[QueuePool], telemetry: PoolTelemetry) -> type[QueuePool]:
+    """建立會回報遙測的連線池類別；engine.dispose() 重建連線池時仍沿用同一份統計。"""
+
+    class InstrumentedPool(base):  # type: ignore[valid-type, misc]
+        def _do_get(self) -> Any:
+            return telemetry.timed_checkout(self, super()._do_get)
+
+    InstrumentedPool.__name__ = InstrumentedPool.__qualname__ = f"Instrumented{base.__name__}"
+    return InstrumentedPool
+
+
+def engine_options(config: Settings, *, telemetry: PoolTelemetry, asynchronous: bool = False) -> Dict[str, Any]:
+    """依設定組出 create_engine / create_async_engine 的連線池參數。
+
+    交易模式的連線池（例如 Supabase 6543 埠的 PgBouncer）不保證同一 session 落在同一後端連線，
+    因此關閉 psycopg 的伺服器端 prepared statement。
+    """
+
+    base = AsyncAdaptedQueuePool if asynchronous else QueuePool
+    options: Dict[str, Any] = {
+        "echo": False,
+        "poolclass": instrumented_pool_class(base, telemetry),
+        "pool_size": config.db_pool_size,
+        "max_overflow": config.db_max_overflow,
+        "pool_timeout": config.db_pool_timeout,
+        "pool_recycle": config.db_pool_recycle,
+        "pool_pre_ping": config.db_pool_pre_ping == PRE_PING_ALWAYS,
+    }
+    if config.db_transaction_pooler:
+        options["connect_args"] = {"prepare_threshold": None}
+    return options
+
+
+def install_idle_ping(engine: Engine, *, idle_seconds: float) -> None:
+    """只對閒置超過 idle_seconds 的連線做存活檢查，省去熱連線每次取出的來回。
+
+    檢查失敗時拋出 DisconnectionError，連線池會丟棄該連線並重新取得。
+    """
+
+    @event.listens_for(engine, "checkin")
+    def _record_checkin(dbapi_connection: Any, record: Any) -> None:
+        record.info[_CHECKIN_AT] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _ping_if_idle(dbapi_connection: Any, record: Any, proxy: Any) -> None:
+        checkin_at = record.info.get(_CHECKIN_AT)
+        if checkin_at is None or time.monotonic() - checkin_at < idle_seconds:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as error:  # noqa: BLE001 - 任何錯誤都視為連線失效
+            raise exc.DisconnectionError() from error
+
+
+__all__ = [
+    "PRE_PING_ALWAYS",
+    "PRE_PING_IDLE",
+    "PRE_PING_NEVER",
+    "PoolTelemetry",
+    "engine_options",
+    "install_idle_ping",
+    "instrumented_pool_class",
+]
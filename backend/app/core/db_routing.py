@@ -0,0 +1,122 @@
+﻿"""讀寫分流：唯讀查詢改送讀取副本，寫入後的使用者短暫固定讀主庫，副本落後過多時退回主庫。"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from loguru import logger
+from sqlalchemy import text
+
+from app.core.metrics import MetricsRegistry, metrics
+
+# 副本已重播完收到的 WAL 時視為沒有落後，避免主庫閒置時 pg_last_xact_replay_timestamp 誤判延遲
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+LagProbe = Callable[[], Awaitable[float]]
+
+
+class ReplicaRouter:
+    """決定唯讀查詢是否可以改送讀取副本。
+
+    寫入後 pin_seconds 內同一使用者的讀取固定走主庫（read-your-writes）；副本延遲每 check_interval 秒
+    量測一次，超過 max_lag 或量測失敗時所有讀取退回主庫，直到下次量測恢復。固定狀態只存在本行程內。
+    """
+
+    def __init__(
+        self,
+        *,
+        probe: LagProbe,
+        pin_seconds: float,
+        max_lag: float,
+        check_interval: float,
+        clock: Callable[[], float] = time.monotonic,
+        registry: MetricsRegistry = metrics,
+    ) -> None:
+        self._probe = probe
+        self._pin_seconds = pin_seconds
+        self._max_lag = max_lag
+        self._check_interval = check_interval
+        self._clock = clock
+        self._pins: OrderedDict[UUID, float] = OrderedDict()  # 依到期時間排序
+        self._healthy = False
+        self._lag: float | None = None
+        self._next_check = 0.0
+        self._checking = False
+        self._replica_reads = registry.counter("db_replica_reads_total", "改送讀取副本的唯讀查詢數")
+        self._pinned_reads = registry.counter("db_replica_pinned_reads_total", "因剛寫入而固定走主庫的讀取數")
+        self._fallbacks = registry.counter("db_replica_fallbacks_total", "因副本延遲或無法連線而退回主庫的讀取數")
+
+    def record_write(self, user_id: UUID) -> None:
+        """記錄使用者剛完成寫入，pin_seconds 內的讀取固定走主庫。"""
+
+        now = self._clock()
+        self._pins.pop(user_id, None)
+        self._pins[user_id] = now + self._pin_seconds
+        while self._pins:
+            oldest, deadline = next(iter(self._pins.items()))
+            if deadline > now:
+                break
+            del self._pins[oldest]
+
+    def pinned(self, user_id: UUID) -> bool:
+        deadline = self._pins.get(user_id)
+        if deadline is None:
+            return False
+        if deadline <= self._clock():
+            del self._pins[user_id]
+            return False
+        return True
+
+    async def use_replica(self, user_id: UUID) -> bool:
+        """回傳此次唯讀查詢是否應送往讀取副本。"""
+
+        if self.pinned(user_id):
+            self._pinned_reads.inc()
+            return False
+        if not await self._replica_healthy():
+            self._fallbacks.inc()
+            return False
+        self._replica_reads.inc()
+        return True
+
+    async def _replica_healthy(self) -> bool:
+        """依快取的量測結果判斷副本是否可用；到期時由一個呼叫端重新量測，其餘沿用上次結果。"""
+
+        now = self._clock()
+        if now < self._next_check or self._checking:
+            return self._healthy
+        self._checking = True
+        try:
+            self._lag = await asyncio.wait_for(self._probe(), timeout=self._check_interval)
+            self._healthy = self._lag <= self._max_lag
+            if not self._healthy:
+                logger.warning("Replica lag {:.2f}s exceeds {:.2f}s; reading from primary", self._lag, self._max_lag)
+        except Exception as exc:  # noqa: BLE001 - 副本無法使用時退回主庫
+            logger.warning("Replica lag check failed: {}", exc)
+            self._lag = None
+            self._healthy = False
+        finally:
+            self._checking = False
+            self._next_check = self._clock() + self._check_interval
+        return self._healthy
+
+    def stats(self) -> dict[str, int]:
+        """回傳副本狀態、最近量測的延遲（毫秒，-1 代表量測失敗）、固定走主庫的使用者數與讀取統計。"""
+
+        return {
+            "healthy": int(self._healthy),
+            "lag_ms": -1 if self._lag is None else int(self._lag * 1000),
+            "pinned_users": len(self._pins),
+            "replica_reads": self._replica_reads.value,
+            "pinned_reads": self._pinned_reads.value,
+            "fallbacks": self._fallbacks.value,
+        }
+
+
+__all__ = ["REPLICA_LAG_SQL", "LagProbe", "ReplicaRouter"]
@@ -0,0 +1,77 @@
+﻿"""行程內的輕量指標登錄，供 /v1/system/metrics 輸出。"""
+from __future__ import annotations
+
+from typing import Callable, Dict, Mapping
+
+
+class Gauge:
+    """可增減的即時數值，例如目前的串流連線數。"""
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: int = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: int) -> None:
+        self.value = value
+
+
+class Counter:
+    """只增不減的累計數值，例如被拒絕或中斷的連線數。"""
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class MetricsRegistry:
+    """以名稱登錄指標；同名重複登錄時回傳既有的指標。
+
+    元件可另外登錄 collector，於輸出時呼叫其 stats() 取得當下統計。
+    """
+
+    def __init__(self) -> None:
+        self._gauges: Dict[str, Gauge] = {}
+        self._counters: Dict[str, Counter] = {}
+        self._collectors: Dict[str, Callable[[], Mapping[str, int]]] = {}
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        if name not in self._gauges:
+            self._gauges[name] = Gauge(name, description)
+        return self._gauges[name]
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        if name not in self._counters:
+            self._counters[name] = Counter(name, description)
+        return self._counters[name]
+
+    def register_collector(self, name: str, collect: Callable[[], Mapping[str, int]]) -> None:
+        """登錄元件統計函式，同名時覆寫。"""
+
+        self._collectors[name] = collect
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """回傳所有指標與元件統計的當下數值。"""
+
+        return {
+            "gauges": {name: gauge.value for name, gauge in self._gauges.items()},
+            "counters": {name: counter.value for name, counter in self._counters.items()},
+            "components": {name: dict(collect()) for name, collect in self._collectors.items()},
+        }
+
+
+# metrics 為行程內共用的指標登錄
+metrics = MetricsRegistry()
+
+
+__all__ = ["Counter", "Gauge", "MetricsRegistry", "metrics"]
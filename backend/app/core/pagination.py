@@ -0,0 +1,46 @@
+﻿"""Keyset 分頁游標工具。"""
+from __future__ import annotations
+
+import base64
+import binascii
+from datetime import datetime
+from typing import NamedTuple
+from uuid import UUID
+
+
+class KeysetCursor(NamedTuple):
+    """以 (created_at, id) 表示的分頁位置，查詢時取嚴格大於（或小於）此位置的資料。"""
+
+    created_at: datetime
+    id: UUID
+
+
+def encode_cursor(created_at: datetime, item_id: UUID) -> str:
+    """將分頁位置編碼為不透明的 URL 安全字串。"""
+
+    raw = f"{created_at.isoformat()}|{item_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(value: str) -> KeysetCursor:
+    """解析 encode_cursor 產生的字串；格式錯誤或時間未帶時區時拋出 ValueError。
+
+    資料庫的 created_at 皆帶時區，不帶時區的時間無法與之比較，視為偽造的游標。
+    """
+
+    padded = value + "=" * (-len(value) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    except (binascii.Error, UnicodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+    created_at_raw, separator, item_id_raw = raw.partition("|")
+    if not separator:
+        raise ValueError("Invalid cursor")
+    created_at = datetime.fromisoformat(created_at_raw)
+    if created_at.tzinfo is None or created_at.utcoffset() is None:
+        raise ValueError("Invalid cursor")
+    return KeysetCursor(created_at, UUID(item_id_raw))
+
+
+__all__ = ["KeysetCursor", "decode_cursor", "encode_cursor"]
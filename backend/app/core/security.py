@@ -1,15 +1,21 @@
 ﻿"""使用者驗證相關工具。"""
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import time
-from typing import Dict
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Callable, Dict, Tuple
 from uuid import UUID
 
 import httpx
-from fastapi import Depends, HTTPException, Request, status
+from fastapi import Depends, HTTPException, Request, WebSocket, WebSocketException, status
 from jose import JWTError, jwt
+from loguru import logger
 
 from app.core.config import settings
+from app.core.metrics import metrics
 
 WWW_AUTH_HEADER = {"WWW-Authenticate": "Bearer"}
 TOKEN_ERROR = HTTPException(
@@ -19,49 +25,200 @@ TOKEN_ERROR = HTTPException(
 )
 
 
-class JWKSProvider:
-    """簡易 JWKS 客戶端，提供快取以減少遠端請求。"""
+class VerifiedTokenCache:
+    """已驗證 token 的 LRU 快取，以 token 的 SHA-256 為鍵對應使用者 ID，到 exp 時失效。
+
+    同一個 token 重複請求（SSE 重連、列表輪詢）時不必再做 RSA 簽章驗證；
+    只保存雜湊而非 token 本身，JWKS 輪替時由 JWKSProvider 清空。
+    """
+
+    def __init__(self, max_entries: int, clock: Callable[[], float] = time.time) -> None:
+        self._max_entries = max(0, max_entries)
+        self._clock = clock
+        self._entries: OrderedDict[bytes, Tuple[UUID, float]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> UUID | None:
+        """取得 token 的使用者 ID；未快取或已過期時回傳 None。"""
+
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        user_id, expires_at = entry
+        if self._clock() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return user_id
+
+    def put(self, token: str, user_id: UUID, expires_at: float) -> None:
+        """保存驗證結果直到 expires_at（token 的 exp），超過上限時移除最久未使用的項目。"""
+
+        if self._max_entries == 0 or expires_at <= self._clock():
+            return
+        key = self._key(token)
+        self._entries[key] = (user_id, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空所有已驗證的 token。"""
+
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """回傳快取筆數與命中統計。"""
+
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
 
-    def __init__(self, url: str, cache_seconds: int = 300) -> None:
+class JWKSProvider:
+    """JWKS 客戶端：共用一個連線池，並以單一請求（single-flight）更新金鑰。
+
+    - 沒有金鑰時，同時進來的請求排隊等同一次下載，下載失敗也只嘗試一次。
+    - 金鑰即將過期時在背景更新，更新完成前繼續使用舊金鑰（stale-while-revalidate），
+      超過 max_stale_seconds 仍未更新成功才改為阻塞更新。
+    - 未知 kid 最多每 min_refresh_interval 秒觸發一次更新；在 kid 出現後才開始的更新仍找不到時，
+      kid 放入負向快取 unknown_kid_ttl 秒，偽造 kid 的 token 無法造成大量 JWKS 請求。
+      間隔內未能更新而被拒絕的 kid 不放入負向快取，間隔過後即可再觸發更新。
+    - 重新取得的金鑰與先前不同時視為金鑰輪替，呼叫 on_rotate 讓依賴舊金鑰的快取失效。
+    """
+
+    def __init__(
+        self,
+        url: str,
+        cache_seconds: int = 300,
+        on_rotate: Callable[[], None] | None = None,
+        *,
+        refresh_ahead_seconds: float = 60.0,
+        max_stale_seconds: float = 3600.0,
+        min_refresh_interval: float = 10.0,
+        unknown_kid_ttl: float = 300.0,
+        max_unknown_kids: int = 1024,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
         if not url:
             raise ValueError("SUPABASE_JWKS_URL 未設定")
         self._url = url
         self._cache_seconds = cache_seconds
+        self._on_rotate = on_rotate
+        self._refresh_ahead_seconds = min(refresh_ahead_seconds, cache_seconds)
+        self._max_stale_seconds = max_stale_seconds
+        self._min_refresh_interval = min_refresh_interval
+        self._unknown_kid_ttl = unknown_kid_ttl
+        self._max_unknown_kids = max_unknown_kids
+        self._client = client
+        self._lock = asyncio.Lock()
+        self._refresh_task: asyncio.Task[None] | None = None
         self._keys: Dict[str, dict] = {}
+        self._unknown_kids: OrderedDict[str, float] = OrderedDict()
         self._expires_at: float = 0.0
+        self._last_attempt: float = 0.0
+        self._fetched_from: float = 0.0  # 最近一次成功更新的開始時間
+        self.refreshes = 0
+        self.failures = 0
+        self.unknown_kid_rejections = 0
 
     async def get_signing_key(self, kid: str) -> dict:
         """根據 kid 取得對應的 JWK。"""
 
-        await self._ensure_keys()
+        now = time.time()
+        if not self._keys or now >= self._expires_at + self._max_stale_seconds:
+            # JWKS 無法連線時不讓每個請求都排隊重試，間隔內直接拒絕
+            if not self._refreshing() and now - self._last_attempt < self._min_refresh_interval:
+                raise TOKEN_ERROR
+            await self._refresh()
+        elif now >= self._expires_at - self._refresh_ahead_seconds:
+            self._schedule_refresh()
+
         key = self._keys.get(kid)
         if key is not None:
             return key
-        self._keys.clear()
-        self._expires_at = 0.0
-        await self._ensure_keys()
-        key = self._keys.get(kid)
-        if key is None:
+
+        seen_at = time.time()
+        rejected_until = self._unknown_kids.get(kid)
+        if rejected_until is not None and seen_at < rejected_until:
+            self.unknown_kid_rejections += 1
             raise TOKEN_ERROR
-        return key
+        # 金鑰輪替時新的 kid 會先出現在 token 上；更新進行中就等待結果，否則間隔夠久才重新取得
+        if self._refreshing() or seen_at - self._last_attempt >= self._min_refresh_interval:
+            await self._refresh()
+            key = self._keys.get(kid)
+            if key is not None:
+                return key
+            # 等到的更新可能早於 kid 出現，只有之後才開始的更新仍找不到才確定 kid 不存在
+            if self._fetched_from >= seen_at:
+                self._remember_unknown_kid(kid)
+        self.unknown_kid_rejections += 1
+        raise TOKEN_ERROR
+
+    def _remember_unknown_kid(self, kid: str) -> None:
+        self._unknown_kids[kid] = time.time() + self._unknown_kid_ttl
+        self._unknown_kids.move_to_end(kid)
+        while len(self._unknown_kids) > self._max_unknown_kids:
+            self._unknown_kids.popitem(last=False)
 
-    async def _ensure_keys(self) -> None:
-        if self._keys and time.time() < self._expires_at:
+    def _refreshing(self) -> bool:
+        return self._refresh_task is not None and not self._refresh_task.done()
+
+    def _start_refresh(self) -> asyncio.Task[None]:
+        """建立共用的更新工作；所有等待者共享同一次下載的結果。"""
+
+        if not self._refreshing():
+            self._refresh_task = asyncio.create_task(self._fetch_and_record())
+            self._refresh_task.add_done_callback(_log_refresh_failure)
+        assert self._refresh_task is not None
+        return self._refresh_task
+
+    async def _refresh(self) -> None:
+        """等待進行中的更新，沒有則發起一次；單一請求被取消不會中斷共用的下載。"""
+
+        async with self._lock:
+            task = self._start_refresh()
+        await asyncio.shield(task)
+
+    def _schedule_refresh(self) -> None:
+        """在背景更新金鑰，期間繼續使用舊金鑰；已有更新進行中或距上次嘗試太近時略過。"""
+
+        if self._refreshing() or time.time() - self._last_attempt < self._min_refresh_interval:
             return
+        self._start_refresh()
+
+    async def _fetch_and_record(self) -> None:
+        started = self._last_attempt = time.time()
+        try:
+            keys = await self._fetch_keys()
+        except HTTPException:
+            self.failures += 1
+            raise
+        self.refreshes += 1
+        self._record_keys(keys)
+        self._fetched_from = started
+
+    async def _fetch_keys(self) -> Dict[str, dict]:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=5.0, limits=httpx.Limits(max_connections=2, max_keepalive_connections=1)
+            )
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(self._url)
-                response.raise_for_status()
+            response = await self._client.get(self._url)
+            response.raise_for_status()
             payload = response.json()
         except (httpx.HTTPError, ValueError) as exc:
-            self._keys.clear()
-            self._expires_at = 0.0
             raise TOKEN_ERROR from exc
 
-        jwks = payload.get("keys", [])
+        jwks = payload.get("keys", []) if isinstance(payload, dict) else None
         if not isinstance(jwks, list):
-            self._keys.clear()
-            self._expires_at = 0.0
             raise TOKEN_ERROR
 
         keys = {
@@ -70,15 +227,68 @@ class JWKSProvider:
             if isinstance(item, dict) and "kid" in item
         }
         if not keys:
-            self._keys.clear()
-            self._expires_at = 0.0
             raise TOKEN_ERROR
+        return keys
+
+    def _record_keys(self, keys: Dict[str, dict]) -> None:
+        """保存新取得的金鑰；與上一次不同時通知 on_rotate。"""
 
+        if self._keys and keys != self._keys and self._on_rotate is not None:
+            self._on_rotate()
         self._keys = keys
         self._expires_at = time.time() + self._cache_seconds
+        for kid in keys:
+            self._unknown_kids.pop(kid, None)
+
+    async def aclose(self) -> None:
+        """停止背景更新並關閉共用的 HTTP 連線池。"""
+
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._refresh_task
+        self._refresh_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict[str, int]:
+        """回傳金鑰數量與更新統計。"""
+
+        return {
+            "keys": len(self._keys),
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "unknown_kids": len(self._unknown_kids),
+            "unknown_kid_rejections": self.unknown_kid_rejections,
+        }
+
 
+def _log_refresh_failure(task: asyncio.Task[None]) -> None:
+    """取出更新工作的例外；背景更新失敗時沒有等待者，只記錄並繼續使用舊金鑰。"""
 
-_jwks_provider = JWKSProvider(settings.supabase_jwks_url or "")
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("JWKS refresh failed")
+
+
+_token_cache = VerifiedTokenCache(settings.auth_token_cache_size)
+metrics.register_collector("auth_token_cache", _token_cache.stats)
+_jwks_provider = JWKSProvider(
+    settings.supabase_jwks_url or "",
+    cache_seconds=settings.jwks_cache_seconds,
+    on_rotate=_token_cache.clear,
+    refresh_ahead_seconds=settings.jwks_refresh_ahead_seconds,
+    max_stale_seconds=settings.jwks_max_stale_seconds,
+    min_refresh_interval=settings.jwks_min_refresh_interval,
+    unknown_kid_ttl=settings.jwks_unknown_kid_ttl,
+)
+metrics.register_collector("jwks", _jwks_provider.stats)
+
+
+async def close_jwks_provider() -> None:
+    """應用關閉時釋放 JWKS 連線池。"""
+
+    await _jwks_provider.aclose()
 
 
 def get_supabase_issuer() -> str:
@@ -102,14 +312,24 @@ def get_supabase_audience() -> str | list[str]:
     return values if len(values) > 1 else values[0]
 
 
-async def get_current_user_id(request: Request) -> UUID:
-    """解析 JWT 並回傳當前使用者 ID。"""
+def _bearer_token(authorization: str | None) -> str | None:
+    """從 Authorization Header 取出 Bearer token。"""
 
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.lower().startswith("bearer "):
-        raise TOKEN_ERROR
+    if not authorization or not authorization.lower().startswith("bearer "):
+        return None
+    return authorization.split(" ", 1)[1].strip() or None
+
+
+async def verify_token(token: str) -> UUID:
+    """驗證 Supabase JWT 並回傳使用者 ID；HTTP 與 WebSocket 共用。
+
+    同一個 token 驗證成功後快取到 exp，重複請求直接回傳快取的使用者 ID。
+    """
+
+    cached = _token_cache.get(token)
+    if cached is not None:
+        return cached
 
-    token = auth_header.split(" ", 1)[1].strip()
     try:
         unverified = jwt.get_unverified_header(token)
     except JWTError as exc:  # pragma: no cover - jose 已涵蓋
@@ -138,12 +358,42 @@ async def get_current_user_id(request: Request) -> UUID:
         raise TOKEN_ERROR
 
     try:
-        return UUID(subject)
+        user_id = UUID(subject)
     except ValueError as exc:
         raise TOKEN_ERROR from exc
 
+    # 沒有 exp 的 token 無法判斷何時失效，不放入快取
+    expires_at = claims.get("exp")
+    if isinstance(expires_at, (int, float)):
+        _token_cache.put(token, user_id, float(expires_at))
+    return user_id
+
+
+async def get_current_user_id(request: Request) -> UUID:
+    """解析 JWT 並回傳當前使用者 ID。"""
+
+    token = _bearer_token(request.headers.get("Authorization"))
+    if token is None:
+        raise TOKEN_ERROR
+    return await verify_token(token)
+
 
 async def require_current_user_id(request: Request) -> UUID:
     """FastAPI 依賴別名，供路由使用。"""
 
     return await get_current_user_id(request)
+
+
+async def require_websocket_user_id(websocket: WebSocket) -> UUID:
+    """WebSocket 連線的驗證依賴。
+
+    瀏覽器無法自訂 WebSocket 標頭，因此除 Authorization Header 外也接受 access_token 查詢參數；驗證失敗時以 1008 關閉連線。
+    """
+
+    token = _bearer_token(websocket.headers.get("Authorization")) or websocket.query_params.get("access_token")
+    if not token:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Missing authorization token")
+    try:
+        return await verify_token(token)
+    except HTTPException as exc:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid authorization token") from exc
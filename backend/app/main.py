@@ -1,15 +1,43 @@
 ﻿"""應用進入點。"""
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.router import api_router
 from app.core.config import settings
+from app.core.security import close_jwks_provider
+from app.services.event_bus import build_event_relay
+from app.services.event_hub import event_hub
+from app.services.event_notifier import build_event_notifier
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """管理應用啟動與關閉時的背景資源。"""
+
+    notifier = build_event_notifier(event_hub)
+    if notifier is not None:
+        await notifier.start()
+    relay = build_event_relay()
+    if relay is not None:
+        await relay.start(event_hub)
+    try:
+        yield
+    finally:
+        await event_hub.shutdown()
+        if relay is not None:
+            await relay.stop()
+        if notifier is not None:
+            await notifier.stop()
+        await close_jwks_provider()
 
 
 def create_app() -> FastAPI:
     """建立 FastAPI 主應用並綁定路由與中介層。"""
 
-    app = FastAPI(title=settings.project_name)
+    app = FastAPI(title=settings.project_name, lifespan=lifespan)
 
     # 設定 CORS 允許前端應用存取 API
     app.add_middleware(
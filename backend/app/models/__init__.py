@@ -1,6 +1,10 @@
 ﻿"""資料庫模型模組。"""
 from .tables import (
+    ACTIVE_JOB_STATUSES,
+    LIMITED_JOB_STATUSES,
+    TERMINAL_JOB_STATUSES,
     JobEvent,
+    JobEventArchive,
     JobStatus,
     Preset,
     PresetVisibility,
@@ -10,10 +14,15 @@ from .tables import (
     ScoreFormat,
     SourceType,
     TranscriptionJob,
+    UserJobCounter,
 )
 
 __all__ = [
+    "ACTIVE_JOB_STATUSES",
+    "LIMITED_JOB_STATUSES",
+    "TERMINAL_JOB_STATUSES",
     "JobEvent",
+    "JobEventArchive",
     "JobStatus",
     "Preset",
     "PresetVisibility",
@@ -23,4 +32,5 @@ __all__ = [
     "ScoreFormat",
     "SourceType",
     "TranscriptionJob",
+    "UserJobCounter",
 ]
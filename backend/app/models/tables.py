@@ -6,7 +6,7 @@ from enum import Enum
 from typing import Any, Optional
 from uuid import UUID, uuid4
 
-from sqlalchemy import Column, DateTime, Enum as SAEnum, Index, UniqueConstraint, func, text
+from sqlalchemy import CheckConstraint, Column, DateTime, Enum as SAEnum, Index, UniqueConstraint, desc, func, text
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, SQLModel
 
@@ -34,6 +34,15 @@ class JobStatus(str, Enum):
     FAILED = "failed"
 
 
+# TERMINAL_JOB_STATUSES 為不會再產生事件的終止狀態
+TERMINAL_JOB_STATUSES = frozenset({JobStatus.COMPLETED.value, JobStatus.FAILED.value})
+# ACTIVE_JOB_STATUSES 為仍在處理中的狀態，與終止狀態互補；部分索引的條件以此產生
+ACTIVE_JOB_STATUSES = frozenset(status.value for status in JobStatus) - TERMINAL_JOB_STATUSES
+_ACTIVE_STATUS_LIST = ", ".join(f"'{status}'" for status in sorted(ACTIVE_JOB_STATUSES))
+# LIMITED_JOB_STATUSES 為計入同時作業上限的高負載狀態，rendering 不計入
+LIMITED_JOB_STATUSES = frozenset({JobStatus.PENDING.value, JobStatus.PROCESSING.value})
+
+
 class ScoreFormat(str, Enum):
     """譜面資產輸出格式。"""
 
@@ -72,7 +81,7 @@ class TranscriptionJob(SQLModel, table=True):
     __tablename__ = "transcription_jobs"
 
     id: UUID = Field(default_factory=uuid4, primary_key=True, description="作業主鍵")
-    user_id: UUID = Field(foreign_key="auth.users.id", index=True, description="建立作業的使用者")
+    user_id: UUID = Field(foreign_key="auth.users.id", description="建立作業的使用者")
     source_type: SourceType = Field(
         sa_column=Column(SAEnum(SourceType, name="source_type_enum", native_enum=False), nullable=False),
         description="來源類型",
@@ -106,11 +115,46 @@ class TranscriptionJob(SQLModel, table=True):
     __table_args__ = (
         Index("ix_transcription_jobs_status", "status"),
         Index("ix_transcription_jobs_created_at", "created_at"),
+        # 作業列表依使用者篩選並以 (created_at, id) 遞減排序，keyset 分頁直接沿索引讀取
+        Index("ix_transcription_jobs_user_id_created_at", "user_id", desc("created_at"), desc("id")),
+        Index("ix_transcription_jobs_user_id_status", "user_id", "status", desc("created_at"), desc("id")),
+        # 條件式列表請求以使用者作業的最晚 updated_at 判斷是否變動
+        Index("ix_transcription_jobs_user_id_updated_at", "user_id", desc("updated_at")),
+        # 進行中作業只佔少數，送出作業時的併發檢查與多工串流只需掃描這個部分索引
+        Index(
+            "ix_transcription_jobs_user_id_active",
+            "user_id",
+            "status",
+            postgresql_where=text(f"status IN ({_ACTIVE_STATUS_LIST})"),
+        ),
+    )
+
+
+class UserJobCounter(SQLModel, table=True):
+    """每位使用者計入同時作業上限的作業數。
+
+    送出作業時以單列條件更新原子地佔用名額；作業離開高負載狀態時由資料庫 trigger 歸還，
+    並由定期排程依實際作業數校正。
+    """
+
+    __tablename__ = "user_job_counters"
+
+    user_id: UUID = Field(foreign_key="auth.users.id", primary_key=True, description="使用者 ID")
+    active_jobs: int = Field(default=0, ge=0, description="計入上限的作業數")
+    updated_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+        default_factory=_utc_now,
+        description="更新時間",
     )
 
+    __table_args__ = (CheckConstraint("active_jobs >= 0", name="ck_user_job_counters_active_jobs"),)
+
 
 class JobEvent(SQLModel, table=True):
-    """作業事件時間軸。"""
+    """作業事件時間軸。
+
+    資料表依 created_at 按月分區，主鍵需包含分區鍵；已結束作業的舊分區會匯出為 JobEventArchive 後刪除。
+    """
 
     __tablename__ = "job_events"
 
@@ -124,12 +168,39 @@ class JobEvent(SQLModel, table=True):
         description="附加資料",
     )
     created_at: datetime = Field(
-        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+        sa_column=Column(DateTime(timezone=True), primary_key=True, server_default=func.now(), nullable=False),
         default_factory=_utc_now,
-        description="記錄時間",
+        description="記錄時間（分區鍵）",
+    )
+
+    __table_args__ = (
+        Index("ix_job_events_job_id_created_at", "job_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
     )
 
-    __table_args__ = (Index("ix_job_events_job_id_created_at", "job_id", "created_at"),)
+
+class JobEventArchive(SQLModel, table=True):
+    """已匯出至 Storage 的作業事件，每筆對應一個作業在一個月分區內的事件。"""
+
+    __tablename__ = "job_event_archives"
+
+    job_id: UUID = Field(foreign_key="transcription_jobs.id", primary_key=True, description="所屬作業")
+    period_start: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), primary_key=True),
+        description="分區起始時間（含）",
+    )
+    period_end: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False), description="分區結束時間（不含）")
+    storage_object_path: str = Field(description="壓縮 JSON Lines 檔的 Storage 物件路徑")
+    event_count: int = Field(ge=0, description="匯出的事件數")
+    last_created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False),
+        description="檔案內最後一筆事件的時間，分頁時用來略過游標之前的檔案",
+    )
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+        default_factory=_utc_now,
+        description="匯出時間",
+    )
 
 
 class ScoreAsset(SQLModel, table=True):
@@ -138,7 +209,7 @@ class ScoreAsset(SQLModel, table=True):
     __tablename__ = "score_assets"
 
     id: UUID = Field(default_factory=uuid4, primary_key=True, description="資產主鍵")
-    job_id: UUID = Field(foreign_key="transcription_jobs.id", index=True, description="所屬作業")
+    job_id: UUID = Field(foreign_key="transcription_jobs.id", description="所屬作業")
     instrument: str = Field(description="樂器分類")
     format: ScoreFormat = Field(
         sa_column=Column(SAEnum(ScoreFormat, name="score_format_enum", native_enum=False), nullable=False),
@@ -155,6 +226,7 @@ class ScoreAsset(SQLModel, table=True):
 
     __table_args__ = (
         UniqueConstraint("job_id", "instrument", "format", name="uq_score_assets_job_instrument_format"),
+        Index("ix_score_assets_job_id_created_at", "job_id", "created_at"),
     )
 
 
@@ -0,0 +1,79 @@
+﻿"""job_events 月分區的命名與 DDL；分區邊界一律以 UTC 月初計算。"""
+from __future__ import annotations
+
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import TextClause, text
+
+PARTITION_PREFIX = "job_events_p"
+_PARTITION_NAME = re.compile(rf"^{PARTITION_PREFIX}(\d{{4}})(\d{{2}})$")
+
+LIST_PARTITIONS_SQL = text(
+    "SELECT child.relname FROM pg_inherits"
+    " JOIN pg_class child ON child.oid = pg_inherits.inhrelid"
+    " WHERE pg_inherits.inhparent = 'job_events'::regclass"
+)
+
+
+def month_start(value: datetime) -> datetime:
+    """取得所在月份的 UTC 月初。"""
+
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """月初加上指定月數，可為負數。"""
+
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def parse_partition_name(name: str) -> datetime | None:
+    """由分區名稱取得月初；不是月分區時回傳 None。"""
+
+    match = _PARTITION_NAME.match(name)
+    if match is None:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+
+def create_partition_statement(month: datetime) -> TextClause:
+    end = add_months(month, 1)
+    return text(
+        f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF job_events"
+        f" FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def lock_partition_statement(month: datetime) -> TextClause:
+    """鎖定分區禁止寫入但允許讀取，匯出期間不會有新事件寫入。"""
+
+    return text(f"LOCK TABLE {partition_name(month)} IN EXCLUSIVE MODE")
+
+
+def detach_partition_statement(month: datetime) -> TextClause:
+    return text(f"ALTER TABLE job_events DETACH PARTITION {partition_name(month)}")
+
+
+def drop_partition_statement(month: datetime) -> TextClause:
+    return text(f"DROP TABLE IF EXISTS {partition_name(month)}")
+
+
+__all__ = [
+    "LIST_PARTITIONS_SQL",
+    "PARTITION_PREFIX",
+    "add_months",
+    "create_partition_statement",
+    "detach_partition_statement",
+    "drop_partition_statement",
+    "lock_partition_statement",
+    "month_start",
+    "parse_partition_name",
+    "partition_name",
+]
@@ -1,14 +1,611 @@
 ﻿"""轉譯工作資料存取層。"""
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Any, Dict, Iterable, List, Optional
-from uuid import UUID
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+from uuid import UUID, uuid4
 
-from sqlalchemy import and_, func, or_, select
+from psycopg.types.json import Jsonb
+
+from sqlalchemy import ColumnElement, Select, and_, func, literal_column, null, or_, select, true, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.pagination import KeysetCursor
+from app.models.tables import (
+    ACTIVE_JOB_STATUSES,
+    LIMITED_JOB_STATUSES,
+    TERMINAL_JOB_STATUSES,
+    JobEvent,
+    JobEventArchive,
+    ScoreAsset,
+    TranscriptionJob,
+    UserJobCounter,
+)
+from app.repositories.event_partitions import (
+    LIST_PARTITIONS_SQL,
+    add_months,
+    create_partition_statement,
+    detach_partition_statement,
+    drop_partition_statement,
+    lock_partition_statement,
+    parse_partition_name,
+)
+
+# 作業列表的總筆數模式：exact 精確計數、estimate 計數到上限為止、none 不計數
+TOTAL_EXACT = "exact"
+TOTAL_ESTIMATE = "estimate"
+TOTAL_NONE = "none"
+
+
+class JobVersion(NamedTuple):
+    """判斷作業、資產與事件是否變動的版本欄位，供條件式 GET 產生 ETag。"""
+
+    updated_at: datetime
+    last_event_created_at: datetime | None
+    last_event_id: UUID | None
+    asset_count: int
+    last_asset_created_at: datetime | None
+    status: str
+
+
+# 事件時間不會早於所屬作業的建立時間，保留一段誤差容納 API 與 worker 的時鐘差
+_EVENT_CLOCK_SKEW = timedelta(hours=1)
+
+
+def _utc_now() -> datetime:
+    """產生帶有 UTC 時區資訊的當前時間。"""
+
+    return datetime.now(timezone.utc)
+
+
+def _events_after(created_after: datetime | None, last_event_id: UUID | None) -> ColumnElement[bool]:
+    """組合 (created_at, id) 游標條件；未提供游標時不限制。"""
+
+    if created_after is None:
+        return true()
+    if last_event_id is None:
+        return JobEvent.created_at > created_after
+    return or_(
+        JobEvent.created_at > created_after,
+        and_(
+            JobEvent.created_at == created_after,
+            JobEvent.id > last_event_id,
+        ),
+    )
+
+
+def _events_since_job() -> ColumnElement[bool]:
+    """以作業建立時間限制事件時間下限，Postgres 執行時可依作業列略過更早的月分區。"""
+
+    return JobEvent.created_at >= TranscriptionJob.created_at - _EVENT_CLOCK_SKEW
+
+
+def _partition_range(month: datetime) -> ColumnElement[bool]:
+    return and_(JobEvent.created_at >= month, JobEvent.created_at < add_months(month, 1))
+
+
+def _jobs_before(before: KeysetCursor | None) -> ColumnElement[bool]:
+    """組合 (created_at, id) 遞減分頁條件；未提供游標時不限制。"""
+
+    if before is None:
+        return true()
+    return or_(
+        TranscriptionJob.created_at < before.created_at,
+        and_(
+            TranscriptionJob.created_at == before.created_at,
+            TranscriptionJob.id < before.id,
+        ),
+    )
+
+
+def _jobs_filter(*, user_id: UUID, status: Optional[str]) -> List[ColumnElement[bool]]:
+    conditions: List[ColumnElement[bool]] = [TranscriptionJob.user_id == user_id]
+    if status:
+        conditions.append(TranscriptionJob.status == status)
+    return conditions
+
+
+# 以下查詢建構函式由同步與非同步儲存庫共用，確保兩條路徑的 SQL 一致
+
+
+def _get_job_statement(*, job_id: UUID, user_id: UUID) -> Select:
+    return select(TranscriptionJob).where(
+        TranscriptionJob.id == job_id,
+        TranscriptionJob.user_id == user_id,
+    )
+
+
+def _list_jobs_statement(*, user_id: UUID, status: Optional[str], limit: int, offset: int) -> Select:
+    return (
+        select(TranscriptionJob)
+        .where(*_jobs_filter(user_id=user_id, status=status))
+        .order_by(TranscriptionJob.created_at.desc(), TranscriptionJob.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )
+
+
+def _count_jobs_statement(*, user_id: UUID, status: Optional[str]) -> Select:
+    return (
+        select(func.count())
+        .select_from(TranscriptionJob)
+        .where(*_jobs_filter(user_id=user_id, status=status))
+        .correlate(None)
+    )
+
+
+def _total_jobs_column(*, user_id: UUID, status: Optional[str], total: str, estimate_cap: int) -> ColumnElement[Any]:
+    """總筆數欄位，以純量子查詢併入列表查詢，Postgres 只計算一次。"""
+
+    if total == TOTAL_EXACT:
+        return _count_jobs_statement(user_id=user_id, status=status).scalar_subquery()
+    if total == TOTAL_ESTIMATE:
+        # 只計數到上限，成本與使用者作業總數無關
+        capped = (
+            select(TranscriptionJob.id)
+            .where(*_jobs_filter(user_id=user_id, status=status))
+            .limit(estimate_cap)
+            .subquery()
+        )
+        return select(func.count()).select_from(capped).correlate(None).scalar_subquery()
+    return null()
+
+
+def _list_jobs_page_statement(
+    *,
+    user_id: UUID,
+    status: Optional[str],
+    limit: int,
+    offset: int,
+    before: KeysetCursor | None,
+    total: str,
+    estimate_cap: int,
+) -> Select:
+    # 每列都帶有總筆數，列表與計數在同一次往返完成；有游標時以 keyset 取代 OFFSET
+    statement = (
+        select(
+            TranscriptionJob,
+            _total_jobs_column(user_id=user_id, status=status, total=total, estimate_cap=estimate_cap).label("total"),
+        )
+        .where(*_jobs_filter(user_id=user_id, status=status), _jobs_before(before))
+        .order_by(TranscriptionJob.created_at.desc(), TranscriptionJob.id.desc())
+        .limit(limit)
+    )
+    return statement if before is not None else statement.offset(offset)
+
+
+def _total_jobs_statement(*, user_id: UUID, status: Optional[str], total: str, estimate_cap: int) -> Select:
+    return select(_total_jobs_column(user_id=user_id, status=status, total=total, estimate_cap=estimate_cap))
+
+
+def _split_page_rows(rows: List[Any]) -> Tuple[List[TranscriptionJob], int | None]:
+    """將 (TranscriptionJob, total) 列拆為作業與總筆數；沒有資料列時總筆數為 None。"""
+
+    if not rows:
+        return [], None
+    total = rows[0][1]
+    return [row[0] for row in rows], None if total is None else int(total)
+
+
+def _list_assets_statement(*, job_id: UUID, user_id: UUID) -> Select:
+    return (
+        select(ScoreAsset)
+        .join(TranscriptionJob, ScoreAsset.job_id == TranscriptionJob.id)
+        .where(
+            ScoreAsset.job_id == job_id,
+            TranscriptionJob.user_id == user_id,
+        )
+        .order_by(ScoreAsset.created_at.asc())
+    )
+
+
+def _json_rows_column(rows: Any, *order_by: Any) -> ColumnElement[Any]:
+    """將子查詢的每一列依指定順序聚合為 JSON 陣列，沒有資料時為空陣列。"""
+
+    aggregated = func.json_agg(aggregate_order_by(literal_column(rows.name), *order_by))
+    return select(func.coalesce(aggregated, literal_column("'[]'::json"))).select_from(rows).scalar_subquery()
+
+
+def _archives_exist(created_after: datetime | None) -> ColumnElement[bool]:
+    """作業在游標之後是否有已封存的事件；與封存清單使用相同條件，沒有封存的作業不必再查詢清單。"""
+
+    statement = (
+        select(JobEventArchive.job_id)
+        .where(JobEventArchive.job_id == TranscriptionJob.id)
+        .correlate(TranscriptionJob)
+    )
+    if created_after is not None:
+        statement = statement.where(JobEventArchive.last_created_at >= created_after)
+    return statement.exists()
+
+
+def _job_detail_statement(
+    *,
+    job_id: UUID,
+    user_id: UUID,
+    include_assets: bool,
+    include_events: bool,
+    events_limit: int | None,
+) -> Select:
+    # 子資源以 JSON 聚合成作業列上的欄位，作業與內嵌資源在同一次往返取得
+    assets_column: ColumnElement[Any] = null()
+    if include_assets:
+        assets = (
+            select(ScoreAsset)
+            .where(ScoreAsset.job_id == TranscriptionJob.id)
+            .correlate(TranscriptionJob)
+            .subquery("assets")
+        )
+        assets_column = _json_rows_column(assets, assets.c.created_at, assets.c.id)
+
+    events_column: ColumnElement[Any] = null()
+    archived_column: ColumnElement[Any] = null()
+    if include_events:
+        archived_column = _archives_exist(None)
+        events_rows = (
+            select(JobEvent)
+            .where(JobEvent.job_id == TranscriptionJob.id, _events_since_job())
+            .correlate(TranscriptionJob)
+            .order_by(JobEvent.created_at.asc(), JobEvent.id.asc())
+        )
+        if events_limit is not None:
+            events_rows = events_rows.limit(events_limit)
+        events = events_rows.subquery("events")
+        events_column = _json_rows_column(events, events.c.created_at, events.c.id)
+
+    return select(
+        TranscriptionJob,
+        assets_column.label("assets"),
+        events_column.label("events"),
+        archived_column.label("archived"),
+    ).where(
+        TranscriptionJob.id == job_id,
+        TranscriptionJob.user_id == user_id,
+    )
+
+
+def _job_version_statement(*, job_id: UUID, user_id: UUID) -> Select:
+    # 最新事件與資產統計各以 LATERAL 子查詢沿 job_id 索引取得，整體只需一次往返
+    latest_event = (
+        select(JobEvent.created_at, JobEvent.id)
+        .where(JobEvent.job_id == TranscriptionJob.id, _events_since_job())
+        .correlate(TranscriptionJob)
+        .order_by(JobEvent.created_at.desc(), JobEvent.id.desc())
+        .limit(1)
+        .lateral("latest_event")
+    )
+    assets = (
+        select(
+            func.count().label("asset_count"),
+            func.max(ScoreAsset.created_at).label("last_asset_created_at"),
+        )
+        .where(ScoreAsset.job_id == TranscriptionJob.id)
+        .correlate(TranscriptionJob)
+        .lateral("assets")
+    )
+    return (
+        select(
+            TranscriptionJob.updated_at,
+            latest_event.c.created_at,
+            latest_event.c.id,
+            assets.c.asset_count,
+            assets.c.last_asset_created_at,
+            TranscriptionJob.status,
+        )
+        .select_from(TranscriptionJob)
+        .outerjoin(latest_event, true())
+        .join(assets, true())
+        .where(
+            TranscriptionJob.id == job_id,
+            TranscriptionJob.user_id == user_id,
+        )
+    )
+
+
+def _split_version_row(row: Any) -> JobVersion | None:
+    if row is None:
+        return None
+    return JobVersion(row[0], row[1], row[2], int(row[3] or 0), row[4], getattr(row[5], "value", row[5]))
+
+
+def _jobs_last_modified_statement(*, user_id: UUID) -> Select:
+    # 不依狀態篩選：作業離開篩選條件時也會更新 updated_at，各篩選條件共用同一個版本
+    return select(func.max(TranscriptionJob.updated_at)).where(TranscriptionJob.user_id == user_id)
+
+
+def _update_job_status_statement(
+    *, job_id: UUID, status: str, progress: float | None, error_message: str | None
+) -> Any:
+    values: Dict[str, Any] = {"status": status, "error_message": error_message}
+    if progress is not None:
+        values["progress"] = progress
+    return update(TranscriptionJob).where(TranscriptionJob.id == job_id).values(**values)
+
+
+def _split_detail_row(
+    row: Any,
+) -> Tuple[TranscriptionJob, List[ScoreAsset] | None, List[JobEvent] | None, bool] | None:
+    """將作業列與 JSON 陣列欄位還原為模型，並附上是否有已封存的事件；作業不存在時回傳 None。"""
+
+    if row is None:
+        return None
+    job, assets, events, archived = row
+    return (
+        job,
+        None if assets is None else [ScoreAsset.model_validate(item) for item in assets],
+        None if events is None else [JobEvent.model_validate(item) for item in events],
+        bool(archived),
+    )
+
+
+def _list_events_statement(*, job_id: UUID, user_id: UUID, limit: int | None) -> Select:
+    statement = (
+        select(JobEvent)
+        .join(TranscriptionJob, JobEvent.job_id == TranscriptionJob.id)
+        .where(
+            JobEvent.job_id == job_id,
+            TranscriptionJob.user_id == user_id,
+            _events_since_job(),
+        )
+        .order_by(JobEvent.created_at.asc(), JobEvent.id.asc())
+    )
+    return statement if limit is None else statement.limit(limit)
+
+
+def _list_event_archives_statement(*, job_id: UUID, user_id: UUID, created_after: datetime | None) -> Select:
+    statement = (
+        select(JobEventArchive)
+        .join(TranscriptionJob, JobEventArchive.job_id == TranscriptionJob.id)
+        .where(
+            JobEventArchive.job_id == job_id,
+            TranscriptionJob.user_id == user_id,
+        )
+        .order_by(JobEventArchive.period_start.asc())
+    )
+    if created_after is None:
+        return statement
+    # 最後一筆事件早於游標的檔案不必下載；同時間的事件仍需比對 id，因此含等號
+    return statement.where(JobEventArchive.last_created_at >= created_after)
+
+
+def _partition_unfinished_job_statement(month: datetime) -> Select:
+    return (
+        select(JobEvent.job_id)
+        .join(TranscriptionJob, JobEvent.job_id == TranscriptionJob.id)
+        .where(
+            _partition_range(month),
+            TranscriptionJob.status.not_in(sorted(TERMINAL_JOB_STATUSES)),
+        )
+        .limit(1)
+    )
+
+
+def _partition_jobs_statement(month: datetime) -> Select:
+    return (
+        select(TranscriptionJob.id, TranscriptionJob.user_id)
+        .where(TranscriptionJob.id.in_(select(JobEvent.job_id).where(_partition_range(month))))
+        .order_by(TranscriptionJob.id)
+    )
+
+
+def _partition_job_events_statement(month: datetime, job_id: UUID) -> Select:
+    return (
+        select(JobEvent)
+        .where(JobEvent.job_id == job_id, _partition_range(month))
+        .order_by(JobEvent.created_at.asc(), JobEvent.id.asc())
+    )
+
 
-from app.models.tables import JobEvent, ScoreAsset, TranscriptionJob
+def _count_by_statuses_statement(*, user_id: UUID, statuses: List[str]) -> Select:
+    return select(func.count()).select_from(TranscriptionJob).where(
+        TranscriptionJob.user_id == user_id,
+        TranscriptionJob.status.in_(statuses),
+    )
+
+
+def _admit_job_statement(*, user_id: UUID, limit: int) -> Any:
+    # 名額未滿時才遞增；衝突列會被鎖定，同一使用者的並行送出依序通過條件檢查
+    statement = insert(UserJobCounter).values(user_id=user_id, active_jobs=1, updated_at=func.now())
+    return statement.on_conflict_do_update(
+        index_elements=[UserJobCounter.user_id],
+        set_={"active_jobs": UserJobCounter.active_jobs + 1, "updated_at": func.now()},
+        where=UserJobCounter.active_jobs < limit,
+    ).returning(UserJobCounter.active_jobs)
+
+
+def _ensure_counter_statement(*, user_id: UUID) -> Any:
+    return insert(UserJobCounter).values(user_id=user_id, active_jobs=0).on_conflict_do_nothing()
+
+
+def _increment_counter_statement(*, user_id: UUID, amount: int) -> Any:
+    return (
+        update(UserJobCounter)
+        .where(UserJobCounter.user_id == user_id)
+        .values(active_jobs=UserJobCounter.active_jobs + amount, updated_at=func.now())
+    )
+
+
+def _job_counter_statement(*, user_id: UUID) -> Select:
+    return select(UserJobCounter.active_jobs).where(UserJobCounter.user_id == user_id)
+
+
+def _counter_drift_statement() -> Select:
+    """找出計數列與實際作業數不一致的使用者，包含缺少計數列的使用者。"""
+
+    actual = (
+        select(TranscriptionJob.user_id, func.count().label("active_jobs"))
+        .where(TranscriptionJob.status.in_(sorted(LIMITED_JOB_STATUSES)))
+        .group_by(TranscriptionJob.user_id)
+        .subquery("actual")
+    )
+    return (
+        select(func.coalesce(UserJobCounter.user_id, actual.c.user_id))
+        .select_from(UserJobCounter)
+        .join(actual, UserJobCounter.user_id == actual.c.user_id, full=True)
+        .where(func.coalesce(UserJobCounter.active_jobs, 0) != func.coalesce(actual.c.active_jobs, 0))
+    )
+
+
+def _active_job_ids_statement(*, user_id: UUID) -> Select:
+    return (
+        select(TranscriptionJob.id)
+        .where(
+            TranscriptionJob.user_id == user_id,
+            # 以 IN 列出進行中狀態，條件才會與部分索引 ix_transcription_jobs_user_id_active 相符
+            TranscriptionJob.status.in_(sorted(ACTIVE_JOB_STATUSES)),
+        )
+        .order_by(TranscriptionJob.created_at.asc())
+    )
+
+
+def _get_event_statement(*, job_id: UUID, user_id: UUID, event_id: UUID) -> Select:
+    return (
+        select(JobEvent)
+        .join(TranscriptionJob, JobEvent.job_id == TranscriptionJob.id)
+        .where(
+            JobEvent.id == event_id,
+            JobEvent.job_id == job_id,
+            TranscriptionJob.user_id == user_id,
+            _events_since_job(),
+        )
+    )
+
+
+def _list_events_after_statement(
+    *,
+    job_id: UUID,
+    user_id: UUID,
+    created_after: datetime | None,
+    last_event_id: UUID | None,
+    limit: int | None,
+) -> Select:
+    statement = (
+        select(JobEvent)
+        .join(TranscriptionJob, JobEvent.job_id == TranscriptionJob.id)
+        .where(
+            JobEvent.job_id == job_id,
+            TranscriptionJob.user_id == user_id,
+            _events_since_job(),
+            _events_after(created_after, last_event_id),
+        )
+        .order_by(JobEvent.created_at.asc(), JobEvent.id.asc())
+    )
+    return statement if limit is None else statement.limit(limit)
+
+
+def _poll_events_statement(
+    *,
+    job_id: UUID,
+    user_id: UUID,
+    created_after: datetime | None,
+    last_event_id: UUID | None,
+    limit: int | None,
+    with_archives: bool = False,
+) -> Select:
+    # 每列都帶有工作狀態，因此 LIMIT 只截斷事件，作業存在時至少回傳一列
+    columns: List[Any] = [TranscriptionJob.status]
+    if with_archives:
+        columns.append(_archives_exist(created_after).label("archived"))
+    statement = (
+        select(*columns, JobEvent)
+        .select_from(TranscriptionJob)
+        .outerjoin(
+            JobEvent,
+            and_(
+                JobEvent.job_id == TranscriptionJob.id,
+                _events_since_job(),
+                _events_after(created_after, last_event_id),
+            ),
+        )
+        .where(
+            TranscriptionJob.id == job_id,
+            TranscriptionJob.user_id == user_id,
+        )
+        .order_by(JobEvent.created_at.asc(), JobEvent.id.asc())
+    )
+    return statement if limit is None else statement.limit(limit)
+
+
+def _split_poll_rows(rows: List[Any]) -> Tuple[str | None, List[JobEvent]]:
+    """將 (status, JobEvent) 列拆為工作狀態與事件清單；工作不存在時狀態為 None。"""
+
+    if not rows:
+        return None, []
+    status = rows[0][0]
+    events = [row[1] for row in rows if row[1] is not None]
+    return getattr(status, "value", status), events
+
+
+def _split_events_page_rows(rows: List[Any]) -> Tuple[str | None, bool, List[JobEvent]]:
+    """將 (status, archived, JobEvent) 列拆為工作狀態、游標後是否有封存事件與事件清單。"""
+
+    if not rows:
+        return None, False, []
+    status, archived = rows[0][0], rows[0][1]
+    events = [row[2] for row in rows if row[2] is not None]
+    return getattr(status, "value", status), bool(archived), events
+
+
+def _build_event(
+    *,
+    job_id: UUID,
+    stage: str,
+    message: str | None,
+    payload: Dict[str, Any] | None,
+    created_at: datetime | None = None,
+) -> JobEvent:
+    return JobEvent(
+        job_id=job_id,
+        stage=stage,
+        message=message,
+        payload=payload or {},
+        created_at=created_at or _utc_now(),
+    )
+
+
+def _build_events(events: Iterable[Dict[str, Any]]) -> List[JobEvent]:
+    return [
+        _build_event(
+            job_id=item["job_id"],
+            stage=item["stage"],
+            message=item.get("message"),
+            payload=item.get("payload"),
+            created_at=item.get("created_at"),
+        )
+        for item in events
+    ]
+
+
+_EVENT_COPY_COLUMNS = ("id", "job_id", "stage", "message", "payload", "created_at")
+
+
+def _event_values(events: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """將事件資料補齊主鍵與時間，供批次 INSERT 或 COPY 使用。"""
+
+    return [
+        {
+            "id": uuid4(),
+            "job_id": item["job_id"],
+            "stage": item["stage"],
+            "message": item.get("message"),
+            "payload": item.get("payload") or {},
+            "created_at": item.get("created_at") or _utc_now(),
+        }
+        for item in events
+    ]
+
+
+def _stamp_insert_time(rows: List[Dict[str, Any]], inserted_at: datetime) -> None:
+    """以資料庫寫入當下的時間覆寫 created_at，並依暫存順序各加 1 微秒以保留事件先後。
+
+    worker 暫存的事件要等 flush 才寫入，若沿用暫存時的時間，可能落在讀取端
+    (created_at, id) 游標之後已推進的位置而永遠不會被串流。
+    """
+
+    for offset, row in enumerate(rows):
+        row["created_at"] = inserted_at + timedelta(microseconds=offset)
 
 
 class JobRepository:
@@ -27,14 +624,76 @@ class JobRepository:
         self._session.refresh(job)
         return job
 
+    def create_job_within_limit(self, job: TranscriptionJob, *, limit: int) -> Tuple[TranscriptionJob | None, int]:
+        """在同一交易內佔用作業名額並建立作業；名額已滿時不建立，回傳 None 與目前作業數。"""
+
+        active = None
+        if limit > 0:
+            active = self._session.scalar(_admit_job_statement(user_id=job.user_id, limit=limit))
+        if active is None:
+            self._session.rollback()
+            return None, int(self._session.scalar(_job_counter_statement(user_id=job.user_id)) or 0)
+        self._session.add(job)
+        self._session.commit()
+        self._session.refresh(job)
+        return job, int(active)
+
+    def create_jobs_within_limit(
+        self,
+        jobs: Sequence[TranscriptionJob],
+        *,
+        events: Sequence[Dict[str, Any]],
+        limit: int,
+    ) -> Tuple[List[TranscriptionJob], int]:
+        """鎖定計數列後依剩餘名額建立前面的作業與其事件，全部在同一交易提交；回傳建立的作業與目前作業數。"""
+
+        if not jobs:
+            return [], 0
+        user_id = jobs[0].user_id
+        self._session.execute(_ensure_counter_statement(user_id=user_id))
+        active = int(self._session.scalar(_job_counter_statement(user_id=user_id).with_for_update()) or 0)
+        granted = max(0, min(len(jobs), limit - active))
+        if granted == 0:
+            self._session.rollback()
+            return [], active
+
+        admitted = list(jobs[:granted])
+        admitted_ids = {job.id for job in admitted}
+        self._session.execute(_increment_counter_statement(user_id=user_id, amount=granted))
+        self._session.add_all(admitted)
+        self._session.flush()
+        rows = _event_values(row for row in events if row["job_id"] in admitted_ids)
+        if rows:
+            self._session.execute(insert(JobEvent).values(rows))
+        self._session.commit()
+        return admitted, active + granted
+
+    def reconcile_job_counters(self) -> int:
+        """依實際作業數校正使用者作業計數，回傳校正的使用者數。
+
+        先以不加鎖的查詢找出不一致的使用者，再逐一鎖定計數列後重新計數，
+        鎖定後的查詢可看到所有已提交的送出，不會與並行的送出互相覆寫。
+        """
+
+        user_ids = list(self._session.scalars(_counter_drift_statement()).all())
+        self._session.rollback()
+        for user_id in user_ids:
+            self._session.execute(_ensure_counter_statement(user_id=user_id))
+            self._session.execute(_job_counter_statement(user_id=user_id).with_for_update())
+            active = self.count_jobs_by_statuses(user_id=user_id, statuses=sorted(LIMITED_JOB_STATUSES))
+            self._session.execute(
+                update(UserJobCounter)
+                .where(UserJobCounter.user_id == user_id)
+                .values(active_jobs=active, updated_at=func.now())
+            )
+            self._session.commit()
+        return len(user_ids)
+
     def get_job(self, *, job_id: UUID, user_id: UUID) -> TranscriptionJob | None:
         """依使用者與工作 ID 取得單筆工作資料。"""
 
-        statement = select(TranscriptionJob).where(
-            TranscriptionJob.id == job_id,
-            TranscriptionJob.user_id == user_id,
-        )
-        return self._session.exec(statement).first()
+        statement = _get_job_statement(job_id=job_id, user_id=user_id)
+        return self._session.scalars(statement).first()
 
     def list_jobs(
         self,
@@ -46,59 +705,73 @@ class JobRepository:
     ) -> List[TranscriptionJob]:
         """列出使用者的工作清單並依建立時間排序。"""
 
-        statement = (
-            select(TranscriptionJob)
-            .where(TranscriptionJob.user_id == user_id)
-            .order_by(TranscriptionJob.created_at.desc())
-        )
-        if status:
-            statement = statement.where(TranscriptionJob.status == status)
-        statement = statement.offset(offset).limit(limit)
-        return self._session.exec(statement).all()
+        statement = _list_jobs_statement(user_id=user_id, status=status, limit=limit, offset=offset)
+        return list(self._session.scalars(statement).all())
 
     def count_jobs(self, *, user_id: UUID, status: Optional[str] = None) -> int:
         """計算指定使用者（可選狀態）的工作總數。"""
 
-        statement = select(func.count()).select_from(TranscriptionJob).where(
-            TranscriptionJob.user_id == user_id
+        statement = _count_jobs_statement(user_id=user_id, status=status)
+        return int(self._session.scalar(statement) or 0)
+
+    def list_jobs_page(
+        self,
+        *,
+        user_id: UUID,
+        status: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        before: KeysetCursor | None = None,
+        total: str = TOTAL_EXACT,
+        estimate_cap: int = 1000,
+    ) -> Tuple[List[TranscriptionJob], int | None]:
+        """以單次查詢取得一頁作業與總筆數；before 為上一頁最後一筆的游標，total 為 none 時總筆數為 None。"""
+
+        statement = _list_jobs_page_statement(
+            user_id=user_id,
+            status=status,
+            limit=limit,
+            offset=offset,
+            before=before,
+            total=total,
+            estimate_cap=estimate_cap,
         )
-        if status:
-            statement = statement.where(TranscriptionJob.status == status)
-        result = self._session.exec(statement).one()
-        return int(result[0]) if result else 0
+        jobs, count = _split_page_rows(list(self._session.exec(statement).all()))
+        if not jobs and total != TOTAL_NONE:
+            # 空頁沒有資料列可攜帶總筆數，僅此時另外計數
+            statement = _total_jobs_statement(user_id=user_id, status=status, total=total, estimate_cap=estimate_cap)
+            count = int(self._session.scalar(statement) or 0)
+        return jobs, count
 
     def list_assets(self, *, job_id: UUID, user_id: UUID) -> List[ScoreAsset]:
         """列出指定工作下使用者可存取的譜面資產。"""
 
-        statement = (
-            select(ScoreAsset)
-            .join(TranscriptionJob, ScoreAsset.job_id == TranscriptionJob.id)
-            .where(
-                ScoreAsset.job_id == job_id,
-                TranscriptionJob.user_id == user_id,
-            )
-            .order_by(ScoreAsset.created_at.asc())
-        )
-        return self._session.exec(statement).all()
+        statement = _list_assets_statement(job_id=job_id, user_id=user_id)
+        return list(self._session.scalars(statement).all())
 
     def list_events(
         self,
         *,
         job_id: UUID,
         user_id: UUID,
+        limit: int | None = None,
     ) -> List[JobEvent]:
-        """列出使用者擁有之工作的時間軸事件。"""
+        """列出使用者擁有之工作的時間軸事件，可指定筆數上限。"""
 
-        statement = (
-            select(JobEvent)
-            .join(TranscriptionJob, JobEvent.job_id == TranscriptionJob.id)
-            .where(
-                JobEvent.job_id == job_id,
-                TranscriptionJob.user_id == user_id,
-            )
-            .order_by(JobEvent.created_at.asc())
-        )
-        return self._session.exec(statement).all()
+        statement = _list_events_statement(job_id=job_id, user_id=user_id, limit=limit)
+        return list(self._session.scalars(statement).all())
+
+    def list_event_archives(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        created_after: datetime | None = None,
+    ) -> List[JobEventArchive]:
+        """列出作業已匯出至 Storage 的事件檔，依時間排序；提供 created_after 時略過游標之前的檔案。"""
+
+        statement = _list_event_archives_statement(job_id=job_id, user_id=user_id, created_after=created_after)
+        return list(self._session.scalars(statement).all())
 
     def count_jobs_by_statuses(self, *, user_id: UUID, statuses: Iterable[str]) -> int:
         """統計使用者在多個狀態下的工作數量。"""
@@ -106,12 +779,13 @@ class JobRepository:
         statuses = list(statuses)
         if not statuses:
             return 0
-        statement = select(func.count()).select_from(TranscriptionJob).where(
-            TranscriptionJob.user_id == user_id,
-            TranscriptionJob.status.in_(statuses),
-        )
-        result = self._session.exec(statement).one()
-        return int(result[0]) if result else 0
+        statement = _count_by_statuses_statement(user_id=user_id, statuses=statuses)
+        return int(self._session.scalar(statement) or 0)
+
+    def list_active_job_ids(self, *, user_id: UUID) -> List[UUID]:
+        """列出使用者尚未結束的作業 ID，依建立時間排序。"""
+
+        return list(self._session.scalars(_active_job_ids_statement(user_id=user_id)).all())
 
     def get_event(
         self,
@@ -122,16 +796,8 @@ class JobRepository:
     ) -> JobEvent | None:
         """依事件 ID 取得使用者所屬工作的單筆事件。"""
 
-        statement = (
-            select(JobEvent)
-            .join(TranscriptionJob, JobEvent.job_id == TranscriptionJob.id)
-            .where(
-                JobEvent.id == event_id,
-                JobEvent.job_id == job_id,
-                TranscriptionJob.user_id == user_id,
-            )
-        )
-        return self._session.exec(statement).first()
+        statement = _get_event_statement(job_id=job_id, user_id=user_id, event_id=event_id)
+        return self._session.scalars(statement).first()
 
     def list_events_after(
         self,
@@ -140,30 +806,87 @@ class JobRepository:
         user_id: UUID,
         created_after: datetime | None = None,
         last_event_id: UUID | None = None,
+        limit: int | None = None,
     ) -> List[JobEvent]:
-        """取得指定時間點後的事件清單，支援 Last-Event-ID 比對。"""
+        """依 (created_at, id) 游標取得之後的事件，可指定每頁筆數。"""
 
-        statement = (
-            select(JobEvent)
-            .join(TranscriptionJob, JobEvent.job_id == TranscriptionJob.id)
-            .where(
-                JobEvent.job_id == job_id,
-                TranscriptionJob.user_id == user_id,
+        statement = _list_events_after_statement(
+            job_id=job_id,
+            user_id=user_id,
+            created_after=created_after,
+            last_event_id=last_event_id,
+            limit=limit,
+        )
+        return list(self._session.scalars(statement).all())
+
+    def poll_events_after(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        created_after: datetime | None = None,
+        last_event_id: UUID | None = None,
+        limit: int | None = None,
+    ) -> Tuple[str | None, List[JobEvent]]:
+        """單次查詢同時取得工作狀態與游標後的新事件；工作不存在時狀態為 None。"""
+
+        statement = _poll_events_statement(
+            job_id=job_id,
+            user_id=user_id,
+            created_after=created_after,
+            last_event_id=last_event_id,
+            limit=limit,
+        )
+        return _split_poll_rows(list(self._session.exec(statement).all()))
+
+    def get_job_detail(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        include_assets: bool = False,
+        include_events: bool = False,
+        events_limit: int | None = None,
+    ) -> Tuple[TranscriptionJob, List[ScoreAsset] | None, List[JobEvent] | None, bool] | None:
+        """單次查詢取得作業與內嵌的資產、事件及是否有已封存的事件；未要求的子資源為 None，作業不存在時回傳 None。"""
+
+        statement = _job_detail_statement(
+            job_id=job_id,
+            user_id=user_id,
+            include_assets=include_assets,
+            include_events=include_events,
+            events_limit=events_limit,
+        )
+        return _split_detail_row(self._session.exec(statement).first())
+
+    def get_job_version(self, *, job_id: UUID, user_id: UUID) -> JobVersion | None:
+        """取得作業的版本欄位；作業不存在時回傳 None。"""
+
+        return _split_version_row(self._session.exec(_job_version_statement(job_id=job_id, user_id=user_id)).first())
+
+    def get_jobs_last_modified(self, *, user_id: UUID) -> datetime | None:
+        """使用者作業中最晚的 updated_at；沒有作業時回傳 None。"""
+
+        return self._session.scalar(_jobs_last_modified_statement(user_id=user_id))
+
+    def update_job_status(
+        self,
+        *,
+        job_id: UUID,
+        status: str,
+        progress: float | None = None,
+        error_message: str | None = None,
+    ) -> bool:
+        """更新作業狀態並提交，回傳作業是否存在；狀態改變時由 trigger 送出通知。"""
+
+        result = self._session.execute(
+            _update_job_status_statement(
+                job_id=job_id, status=status, progress=progress, error_message=error_message
             )
-            .order_by(JobEvent.created_at.asc(), JobEvent.id.asc())
         )
-        if created_after is not None:
-            condition = JobEvent.created_at > created_after
-            if last_event_id is not None:
-                condition = or_(
-                    JobEvent.created_at > created_after,
-                    and_(
-                        JobEvent.created_at == created_after,
-                        JobEvent.id > last_event_id,
-                    ),
-                )
-            statement = statement.where(condition)
-        return self._session.exec(statement).all()
+        self._session.commit()
+        return result.rowcount > 0
+
     def create_event(
         self,
         *,
@@ -174,19 +897,387 @@ class JobRepository:
     ) -> JobEvent:
         """新增一筆工作事件並立即持久化。"""
 
-        event = JobEvent(
-            job_id=job_id,
-            stage=stage,
-            message=message,
-            payload=payload or {},
-        )
+        event = _build_event(job_id=job_id, stage=stage, message=message, payload=payload)
         self._session.add(event)
         self._session.commit()
         self._session.refresh(event)
         return event
 
+    def create_events(self, events: Iterable[Dict[str, Any]]) -> List[JobEvent]:
+        """批次新增多筆工作事件，以單一交易提交。"""
+
+        rows = _build_events(events)
+        if not rows:
+            return []
+        self._session.add_all(rows)
+        self._session.commit()
+        return rows
+
+    def bulk_insert_events(self, events: Sequence[Dict[str, Any]], *, copy_threshold: int) -> int:
+        """以單一多列 INSERT 寫入事件並提交一次，筆數達 copy_threshold 時改用 COPY；不回讀寫入的資料列。
+
+        created_at 一律由資料庫在寫入時決定，忽略暫存時記錄的時間。
+        """
+
+        rows = _event_values(events)
+        if not rows:
+            return 0
+        _stamp_insert_time(rows, self._session.scalar(select(func.clock_timestamp())))
+        if len(rows) >= copy_threshold:
+            self._copy_events(rows)
+        else:
+            self._session.execute(insert(JobEvent).values(rows))
+        self._session.commit()
+        return len(rows)
+
+    def _copy_events(self, rows: List[Dict[str, Any]]) -> None:
+        # 直接使用 Session 目前交易的 psycopg 連線，COPY 與後續 commit 在同一交易內
+        driver_connection = self._session.connection().connection.driver_connection
+        columns = ", ".join(_EVENT_COPY_COLUMNS)
+        with driver_connection.cursor() as cursor:
+            with cursor.copy(f"COPY job_events ({columns}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(
+                        [Jsonb(row[column]) if column == "payload" else row[column] for column in _EVENT_COPY_COLUMNS]
+                    )
+
+    def ensure_event_partitions(self, *, start: datetime, months: int) -> List[datetime]:
+        """建立 start 所在月份起連續 months 個月的事件分區，已存在者略過，回傳涵蓋的月初。"""
+
+        covered = [add_months(start, offset) for offset in range(months)]
+        for month in covered:
+            self._session.execute(create_partition_statement(month))
+        self._session.commit()
+        return covered
+
+    def list_event_partitions(self) -> List[datetime]:
+        """列出現有事件月分區的月初，由舊到新排序。"""
+
+        names = self._session.scalars(LIST_PARTITIONS_SQL).all()
+        self._session.rollback()
+        return sorted(month for month in map(parse_partition_name, names) if month is not None)
+
+    def lock_event_partition(self, month: datetime) -> None:
+        """在目前交易內鎖定分區禁止寫入，直到 archive_event_partition 提交或 rollback。"""
+
+        self._session.execute(lock_partition_statement(month))
+
+    def release_event_partition(self, month: datetime) -> None:
+        """放棄封存分區，rollback 目前交易以解除 lock_event_partition 的鎖定。"""
+
+        self._session.rollback()
+
+    def has_unfinished_jobs_in_partition(self, month: datetime) -> bool:
+        """分區內是否有尚未結束之作業的事件；有則不可封存。"""
+
+        return self._session.scalars(_partition_unfinished_job_statement(month)).first() is not None
+
+    def list_partition_jobs(self, month: datetime) -> List[Tuple[UUID, UUID]]:
+        """列出分區內有事件的作業，回傳 (作業 ID, 使用者 ID)。"""
+
+        return [(row[0], row[1]) for row in self._session.execute(_partition_jobs_statement(month)).all()]
+
+    def list_partition_events(self, month: datetime, *, job_id: UUID) -> List[JobEvent]:
+        """依 (created_at, id) 列出作業在分區內的事件。"""
+
+        return list(self._session.scalars(_partition_job_events_statement(month, job_id)).all())
+
+    def archive_event_partition(self, month: datetime, archives: Sequence[JobEventArchive]) -> None:
+        """寫入匯出紀錄並卸載、刪除分區，全部在同一交易提交。"""
+
+        self._session.add_all(archives)
+        self._session.flush()
+        # DETACH 需鎖定父表，放在最後執行以縮短阻塞其他寫入的時間
+        self._session.execute(detach_partition_statement(month))
+        self._session.execute(drop_partition_statement(month))
+        self._session.commit()
+
+
+class AsyncJobRepository:
+    """JobRepository 的非同步版本，方法與語意一致，供 API 事件迴圈使用。"""
+
+    def __init__(self, session: AsyncSession) -> None:
+        """使用既有的 AsyncSession 初始化儲存庫。"""
+
+        self._session = session
+
+    async def release(self) -> None:
+        """結束目前交易並歸還連線；已載入的物件仍可讀取，Session 之後可再使用。"""
+
+        await self._session.close()
+
+    async def create_job(self, job: TranscriptionJob) -> TranscriptionJob:
+        """建立新的轉譯工作並回寫生成欄位。"""
+
+        self._session.add(job)
+        await self._session.commit()
+        await self._session.refresh(job)
+        return job
+
+    async def create_job_within_limit(
+        self, job: TranscriptionJob, *, limit: int
+    ) -> Tuple[TranscriptionJob | None, int]:
+        """在同一交易內佔用作業名額並建立作業；名額已滿時不建立，回傳 None 與目前作業數。"""
+
+        active = None
+        if limit > 0:
+            active = await self._session.scalar(_admit_job_statement(user_id=job.user_id, limit=limit))
+        if active is None:
+            await self._session.rollback()
+            return None, int(await self._session.scalar(_job_counter_statement(user_id=job.user_id)) or 0)
+        self._session.add(job)
+        await self._session.commit()
+        await self._session.refresh(job)
+        return job, int(active)
+
+    async def create_jobs_within_limit(
+        self,
+        jobs: Sequence[TranscriptionJob],
+        *,
+        events: Sequence[Dict[str, Any]],
+        limit: int,
+    ) -> Tuple[List[TranscriptionJob], int]:
+        """鎖定計數列後依剩餘名額建立前面的作業與其事件，全部在同一交易提交；回傳建立的作業與目前作業數。"""
+
+        if not jobs:
+            return [], 0
+        user_id = jobs[0].user_id
+        await self._session.execute(_ensure_counter_statement(user_id=user_id))
+        active = int(await self._session.scalar(_job_counter_statement(user_id=user_id).with_for_update()) or 0)
+        granted = max(0, min(len(jobs), limit - active))
+        if granted == 0:
+            await self._session.rollback()
+            return [], active
+
+        admitted = list(jobs[:granted])
+        admitted_ids = {job.id for job in admitted}
+        await self._session.execute(_increment_counter_statement(user_id=user_id, amount=granted))
+        self._session.add_all(admitted)
+        await self._session.flush()
+        rows = _event_values(row for row in events if row["job_id"] in admitted_ids)
+        if rows:
+            await self._session.execute(insert(JobEvent).values(rows))
+        await self._session.commit()
+        return admitted, active + granted
+
+    async def get_job(self, *, job_id: UUID, user_id: UUID) -> TranscriptionJob | None:
+        """依使用者與工作 ID 取得單筆工作資料。"""
+
+        statement = _get_job_statement(job_id=job_id, user_id=user_id)
+        return (await self._session.scalars(statement)).first()
+
+    async def list_jobs(
+        self,
+        *,
+        user_id: UUID,
+        status: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> List[TranscriptionJob]:
+        """列出使用者的工作清單並依建立時間排序。"""
+
+        statement = _list_jobs_statement(user_id=user_id, status=status, limit=limit, offset=offset)
+        return list((await self._session.scalars(statement)).all())
+
+    async def count_jobs(self, *, user_id: UUID, status: Optional[str] = None) -> int:
+        """計算指定使用者（可選狀態）的工作總數。"""
+
+        statement = _count_jobs_statement(user_id=user_id, status=status)
+        return int(await self._session.scalar(statement) or 0)
+
+    async def list_jobs_page(
+        self,
+        *,
+        user_id: UUID,
+        status: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+        before: KeysetCursor | None = None,
+        total: str = TOTAL_EXACT,
+        estimate_cap: int = 1000,
+    ) -> Tuple[List[TranscriptionJob], int | None]:
+        """以單次查詢取得一頁作業與總筆數；before 為上一頁最後一筆的游標，total 為 none 時總筆數為 None。"""
+
+        statement = _list_jobs_page_statement(
+            user_id=user_id,
+            status=status,
+            limit=limit,
+            offset=offset,
+            before=before,
+            total=total,
+            estimate_cap=estimate_cap,
+        )
+        jobs, count = _split_page_rows(list((await self._session.exec(statement)).all()))
+        if not jobs and total != TOTAL_NONE:
+            # 空頁沒有資料列可攜帶總筆數，僅此時另外計數
+            statement = _total_jobs_statement(user_id=user_id, status=status, total=total, estimate_cap=estimate_cap)
+            count = int(await self._session.scalar(statement) or 0)
+        return jobs, count
+
+    async def list_assets(self, *, job_id: UUID, user_id: UUID) -> List[ScoreAsset]:
+        """列出指定工作下使用者可存取的譜面資產。"""
+
+        statement = _list_assets_statement(job_id=job_id, user_id=user_id)
+        return list((await self._session.scalars(statement)).all())
+
+    async def list_events(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        limit: int | None = None,
+    ) -> List[JobEvent]:
+        """列出使用者擁有之工作的時間軸事件，可指定筆數上限。"""
+
+        statement = _list_events_statement(job_id=job_id, user_id=user_id, limit=limit)
+        return list((await self._session.scalars(statement)).all())
+
+    async def list_event_archives(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        created_after: datetime | None = None,
+    ) -> List[JobEventArchive]:
+        """列出作業已匯出至 Storage 的事件檔，依時間排序；提供 created_after 時略過游標之前的檔案。"""
+
+        statement = _list_event_archives_statement(job_id=job_id, user_id=user_id, created_after=created_after)
+        return list((await self._session.scalars(statement)).all())
+
+    async def count_jobs_by_statuses(self, *, user_id: UUID, statuses: Iterable[str]) -> int:
+        """統計使用者在多個狀態下的工作數量。"""
+
+        statuses = list(statuses)
+        if not statuses:
+            return 0
+        statement = _count_by_statuses_statement(user_id=user_id, statuses=statuses)
+        return int(await self._session.scalar(statement) or 0)
+
+    async def list_active_job_ids(self, *, user_id: UUID) -> List[UUID]:
+        """列出使用者尚未結束的作業 ID，依建立時間排序。"""
+
+        return list((await self._session.scalars(_active_job_ids_statement(user_id=user_id))).all())
+
+    async def get_event(self, *, job_id: UUID, user_id: UUID, event_id: UUID) -> JobEvent | None:
+        """依事件 ID 取得使用者所屬工作的單筆事件。"""
+
+        statement = _get_event_statement(job_id=job_id, user_id=user_id, event_id=event_id)
+        return (await self._session.scalars(statement)).first()
+
+    async def list_events_after(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        created_after: datetime | None = None,
+        last_event_id: UUID | None = None,
+        limit: int | None = None,
+    ) -> List[JobEvent]:
+        """依 (created_at, id) 游標取得之後的事件，可指定每頁筆數。"""
+
+        statement = _list_events_after_statement(
+            job_id=job_id,
+            user_id=user_id,
+            created_after=created_after,
+            last_event_id=last_event_id,
+            limit=limit,
+        )
+        return list((await self._session.scalars(statement)).all())
+
+    async def poll_events_after(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        created_after: datetime | None = None,
+        last_event_id: UUID | None = None,
+        limit: int | None = None,
+    ) -> Tuple[str | None, List[JobEvent]]:
+        """單次查詢同時取得工作狀態與游標後的新事件；工作不存在時狀態為 None。"""
+
+        statement = _poll_events_statement(
+            job_id=job_id,
+            user_id=user_id,
+            created_after=created_after,
+            last_event_id=last_event_id,
+            limit=limit,
+        )
+        return _split_poll_rows(list((await self._session.exec(statement)).all()))
 
+    async def poll_events_page(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        created_after: datetime | None = None,
+        last_event_id: UUID | None = None,
+        limit: int | None = None,
+    ) -> Tuple[str | None, bool, List[JobEvent]]:
+        """同 poll_events_after，另於同一次往返回傳游標之後是否有已封存的事件。"""
 
+        statement = _poll_events_statement(
+            job_id=job_id,
+            user_id=user_id,
+            created_after=created_after,
+            last_event_id=last_event_id,
+            limit=limit,
+            with_archives=True,
+        )
+        return _split_events_page_rows(list((await self._session.exec(statement)).all()))
 
+    async def get_job_detail(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        include_assets: bool = False,
+        include_events: bool = False,
+        events_limit: int | None = None,
+    ) -> Tuple[TranscriptionJob, List[ScoreAsset] | None, List[JobEvent] | None, bool] | None:
+        """單次查詢取得作業與內嵌的資產、事件及是否有已封存的事件；未要求的子資源為 None，作業不存在時回傳 None。"""
+
+        statement = _job_detail_statement(
+            job_id=job_id,
+            user_id=user_id,
+            include_assets=include_assets,
+            include_events=include_events,
+            events_limit=events_limit,
+        )
+        return _split_detail_row((await self._session.exec(statement)).first())
+
+    async def get_job_version(self, *, job_id: UUID, user_id: UUID) -> JobVersion | None:
+        """取得作業的版本欄位；作業不存在時回傳 None。"""
+
+        statement = _job_version_statement(job_id=job_id, user_id=user_id)
+        return _split_version_row((await self._session.exec(statement)).first())
+
+    async def get_jobs_last_modified(self, *, user_id: UUID) -> datetime | None:
+        """使用者作業中最晚的 updated_at；沒有作業時回傳 None。"""
+
+        return await self._session.scalar(_jobs_last_modified_statement(user_id=user_id))
+
+    async def create_event(
+        self,
+        *,
+        job_id: UUID,
+        stage: str,
+        message: str | None = None,
+        payload: Dict[str, Any] | None = None,
+    ) -> JobEvent:
+        """新增一筆工作事件並立即持久化。"""
+
+        event = _build_event(job_id=job_id, stage=stage, message=message, payload=payload)
+        self._session.add(event)
+        await self._session.commit()
+        await self._session.refresh(event)
+        return event
 
+    async def create_events(self, events: Iterable[Dict[str, Any]]) -> List[JobEvent]:
+        """批次新增多筆工作事件，以單一交易提交。"""
 
+        rows = _build_events(events)
+        if not rows:
+            return []
+        self._session.add_all(rows)
+        await self._session.commit()
+        return rows
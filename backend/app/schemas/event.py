@@ -19,6 +19,7 @@ class JobEventResource(BaseModel):
 
 
 class JobEventListResponse(BaseModel):
-    """包裝事件列表。"""
+    """包裝事件列表；nextCursor 不為 null 時代表還有下一頁。"""
 
     data: List[JobEventResource]
+    next_cursor: Optional[str] = Field(default=None, serialization_alias="nextCursor")
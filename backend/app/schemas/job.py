@@ -2,11 +2,14 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field, model_validator
 
+from app.schemas.asset import ScoreAssetResource
+from app.schemas.event import JobEventResource
+
 
 class JobCreateRequest(BaseModel):
     """建立作業的請求負載。"""
@@ -52,9 +55,43 @@ class JobResource(BaseModel):
     updated_at: datetime = Field(serialization_alias="updatedAt")
 
 
+class JobDetailResource(JobResource):
+    """作業詳情，依 include 參數內嵌資產與事件；未要求的欄位不會出現在回應中。"""
+
+    assets: Optional[List[ScoreAssetResource]] = None
+    events: Optional[List[JobEventResource]] = None
+    events_next_cursor: Optional[str] = Field(default=None, serialization_alias="eventsNextCursor")
+
+
 class JobListResponse(BaseModel):
-    """作業列表回應包裝。"""
+    """作業列表回應包裝；nextCursor 不為 null 時代表還有下一頁。
+
+    total 依查詢的 total 模式可能為 null（none）或下限估計（estimate，此時 totalEstimated 為 true）。
+    """
 
     data: List[JobResource]
-    total: int
+    total: Optional[int] = None
+    total_estimated: bool = Field(default=False, serialization_alias="totalEstimated")
+    next_cursor: Optional[str] = Field(default=None, serialization_alias="nextCursor")
+
+
+
+class JobBatchCreateRequest(BaseModel):
+    """批次建立作業的請求負載；各筆於端點內個別驗證，單筆錯誤不影響其他筆。"""
+
+    jobs: List[Dict[str, Any]] = Field(min_length=1)
+
+
+class JobBatchItemResult(BaseModel):
+    """批次中單筆作業的結果；index 對應請求中的位置。"""
+
+    index: int
+    status: Literal["created", "rejected", "invalid"]
+    job: Optional[JobResource] = None
+    error: Optional[Dict[str, str]] = None
+
+
+class JobBatchResponse(BaseModel):
+    """批次建立作業的回應，data 依請求順序排列。"""
 
+    data: List[JobBatchItemResult]
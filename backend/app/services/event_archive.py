@@ -0,0 +1,77 @@
+﻿"""作業事件封存檔：已結束作業的舊月分區以 gzip 壓縮的 JSON Lines 存放於 Storage。"""
+from __future__ import annotations
+
+import gzip
+import json
+from datetime import datetime
+from typing import Iterable, List, Sequence
+from uuid import UUID
+
+from app.core.pagination import KeysetCursor
+from app.models.tables import JobEvent
+from app.services.storage_service import StorageService, get_storage_service
+
+ARCHIVE_CONTENT_TYPE = "application/gzip"
+
+
+def archive_object_path(*, user_id: UUID, job_id: UUID, month: datetime) -> str:
+    """封存檔路徑沿用 {user_id}/ 前綴，與使用者上傳的物件一致。"""
+
+    return f"{user_id}/events/{job_id}/{month:%Y%m}.jsonl.gz"
+
+
+def encode_archive(events: Iterable[JobEvent]) -> bytes:
+    """將事件依序編碼為一行一筆的 JSON 並壓縮。"""
+
+    lines = (event.model_dump_json() for event in events)
+    return gzip.compress("\n".join(lines).encode("utf-8"))
+
+
+def decode_archive(data: bytes) -> List[JobEvent]:
+    """還原封存檔中的事件，順序與寫入時相同。"""
+
+    text = gzip.decompress(data).decode("utf-8")
+    return [JobEvent.model_validate(json.loads(line)) for line in text.splitlines() if line]
+
+
+def events_after(events: Sequence[JobEvent], after: KeysetCursor | None) -> List[JobEvent]:
+    """取出 (created_at, id) 大於游標的事件，比較方式與資料庫查詢一致。"""
+
+    if after is None:
+        return list(events)
+    return [event for event in events if (event.created_at, event.id) > (after.created_at, after.id)]
+
+
+class JobEventArchiveStore:
+    """讀寫 Storage 中的事件封存檔；存取為同步 I/O，非同步呼叫端需移至執行緒。"""
+
+    def __init__(self, storage: StorageService | None = None) -> None:
+        self._storage = storage
+
+    def _service(self) -> StorageService:
+        # 只有讀寫封存檔時才需要 Storage 設定，延後到第一次使用時取得
+        if self._storage is None:
+            self._storage = get_storage_service()
+        return self._storage
+
+    def write(self, *, user_id: UUID, job_id: UUID, month: datetime, events: Sequence[JobEvent]) -> str:
+        """上傳作業在指定月份的事件，回傳物件路徑；重跑時覆寫同一路徑。"""
+
+        object_path = archive_object_path(user_id=user_id, job_id=job_id, month=month)
+        self._service().upload_object(object_path, encode_archive(events), content_type=ARCHIVE_CONTENT_TYPE)
+        return object_path
+
+    def read(self, object_path: str) -> List[JobEvent]:
+        """下載並還原封存檔中的事件。"""
+
+        return decode_archive(self._service().download_object(object_path))
+
+
+# job_event_archive_store 為行程內共用的封存檔存取器
+job_event_archive_store = JobEventArchiveStore()
+
+
+def get_event_archive_store() -> JobEventArchiveStore:
+    """提供 FastAPI 依賴注入的 JobEventArchiveStore。"""
+
+    return job_event_archive_store
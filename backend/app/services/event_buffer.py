@@ -0,0 +1,215 @@
+﻿"""行程內的作業事件環形緩衝，讓 Last-Event-ID 續傳直接由記憶體補齊。
+
+所有事件查詢都會經過 _job_event_fetcher，查詢結果依游標連續寫入各作業的環形緩衝；
+緩衝只保留一段連續的事件，續傳錨點仍在緩衝內時即可省去 get_job_event 與補齊查詢。
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, NamedTuple, Sequence
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.pagination import KeysetCursor
+from app.models.tables import TERMINAL_JOB_STATUSES, JobEvent
+
+# 單筆事件的固定記憶體估計（物件、UUID、datetime 與索引項目），再加上文字與 payload 長度
+_EVENT_OVERHEAD_BYTES = 512
+
+
+def _estimate_size(event: JobEvent) -> int:
+    """粗估事件佔用的記憶體位元組數，僅用於總量預算。"""
+
+    payload_size = len(repr(event.payload)) if event.payload else 0
+    return _EVENT_OVERHEAD_BYTES + len(event.stage) + len(event.message or "") + payload_size
+
+
+def _cursor(event: JobEvent) -> KeysetCursor:
+    return KeysetCursor(event.created_at, event.id)
+
+
+class EventReplay(NamedTuple):
+    """由緩衝補齊的結果：錨點游標、錨點之後的事件，以及緩衝尾端是否已是作業結束狀態。"""
+
+    cursor: KeysetCursor
+    events: List[JobEvent]
+    status: str | None
+    ended: bool
+
+
+@dataclass
+class _JobRing:
+    """單一作業的環形緩衝，events 為 base 之後連續且依 (created_at, id) 排序的事件。"""
+
+    user_id: UUID
+    base: KeysetCursor | None
+    events: Deque[JobEvent] = field(default_factory=deque)
+    index: Dict[UUID, int] = field(default_factory=dict)  # 事件 ID 對應寫入序號
+    sizes: Deque[int] = field(default_factory=deque)
+    offset: int = 0  # events[0] 的寫入序號
+    size: int = 0
+    status: str | None = None
+    ended: bool = False
+    touched: float = field(default_factory=time.monotonic)
+
+    @property
+    def tail(self) -> KeysetCursor | None:
+        return _cursor(self.events[-1]) if self.events else self.base
+
+
+class JobEventBuffer:
+    """每個 API 行程內的事件緩衝，每個作業保留最近 capacity 筆事件。
+
+    閒置超過 idle_seconds 的作業會被移除；總量超過 max_bytes 時優先移除最久未使用的作業。
+    """
+
+    def __init__(self, *, capacity: int, idle_seconds: float, max_bytes: int) -> None:
+        self._capacity = max(0, capacity)
+        self._idle_seconds = idle_seconds
+        self._max_bytes = max_bytes
+        self._rings: OrderedDict[UUID, _JobRing] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def record(
+        self,
+        job_id: UUID,
+        *,
+        user_id: UUID,
+        after: KeysetCursor | None,
+        events: Sequence[JobEvent],
+        status: str | None,
+        has_more: bool,
+    ) -> None:
+        """寫入一次查詢的結果；after 為查詢游標，events 為其後連續的事件。
+
+        after 落在緩衝尾端之後代表中間有空窗，此時捨棄舊內容，從 after 重新開始。
+        """
+
+        if self._capacity == 0:
+            return
+        ring = self._rings.get(job_id)
+        if ring is not None and ring.user_id != user_id:
+            return
+        if ring is None or not self._is_contiguous(ring, after):
+            if ring is not None:
+                self._drop(job_id)
+            ring = _JobRing(user_id=user_id, base=after)
+            self._rings[job_id] = ring
+
+        tail = ring.tail
+        for event in events:
+            if tail is not None and _cursor(event) <= tail:
+                continue
+            self._append(ring, event)
+            tail = _cursor(event)
+
+        if not has_more and not ring.ended:
+            # 本次查詢已讀到最後一筆，緩衝尾端即為查詢當下的最新狀態
+            ring.status = status
+            ring.ended = status is None or status in TERMINAL_JOB_STATUSES
+        self._touch(job_id, ring)
+        self._evict()
+
+    def replay_after(self, job_id: UUID, event_id: UUID, *, user_id: UUID) -> EventReplay | None:
+        """取得錨點之後的事件；錨點已不在緩衝或作業不屬於該使用者時回傳 None。"""
+
+        ring = self._rings.get(job_id)
+        if ring is None or ring.user_id != user_id:
+            self.misses += 1
+            return None
+
+        if ring.base is not None and ring.base.id == event_id:
+            cursor, start = ring.base, 0
+        else:
+            sequence = ring.index.get(event_id)
+            if sequence is None:
+                self.misses += 1
+                return None
+            start = sequence - ring.offset + 1
+            cursor = _cursor(ring.events[start - 1])
+
+        self.hits += 1
+        self._touch(job_id, ring)
+        events = [ring.events[position] for position in range(start, len(ring.events))]
+        return EventReplay(cursor, events, ring.status, ring.ended)
+
+    def _is_contiguous(self, ring: _JobRing, after: KeysetCursor | None) -> bool:
+        """查詢游標不晚於緩衝尾端時，新事件可接續在緩衝之後。"""
+
+        if after is None:
+            return True
+        tail = ring.tail
+        return tail is not None and after <= tail
+
+    def _append(self, ring: _JobRing, event: JobEvent) -> None:
+        size = _estimate_size(event)
+        ring.index[event.id] = ring.offset + len(ring.events)
+        ring.events.append(event)
+        ring.sizes.append(size)
+        ring.size += size
+        self._bytes += size
+        if len(ring.events) > self._capacity:
+            evicted = ring.events.popleft()
+            evicted_size = ring.sizes.popleft()
+            ring.index.pop(evicted.id, None)
+            ring.offset += 1
+            ring.size -= evicted_size
+            self._bytes -= evicted_size
+            ring.base = _cursor(evicted)
+
+    def _touch(self, job_id: UUID, ring: _JobRing) -> None:
+        ring.touched = time.monotonic()
+        self._rings.move_to_end(job_id)
+
+    def _drop(self, job_id: UUID) -> None:
+        ring = self._rings.pop(job_id)
+        self._bytes -= ring.size
+
+    def _evict(self) -> None:
+        """依使用時間由舊到新移除閒置或超出總量預算的作業。"""
+
+        deadline = time.monotonic() - self._idle_seconds
+        while self._rings:
+            job_id, ring = next(iter(self._rings.items()))
+            if ring.touched >= deadline and self._bytes <= self._max_bytes:
+                break
+            self._drop(job_id)
+
+    def clear(self) -> None:
+        """清空緩衝與統計。"""
+
+        self._rings.clear()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """回傳緩衝的作業數、事件數、估計位元組與命中統計。"""
+
+        return {
+            "jobs": len(self._rings),
+            "events": sum(len(ring.events) for ring in self._rings.values()),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# event_buffer 為行程內共用的事件緩衝
+event_buffer = JobEventBuffer(
+    capacity=settings.event_buffer_size,
+    idle_seconds=settings.event_buffer_idle_seconds,
+    max_bytes=settings.event_buffer_max_bytes,
+)
+metrics.register_collector("event_buffer", event_buffer.stats)
+
+
+def get_event_buffer() -> JobEventBuffer:
+    """提供 FastAPI 依賴注入的 JobEventBuffer。"""
+
+    return event_buffer
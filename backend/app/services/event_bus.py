@@ -0,0 +1,177 @@
+﻿"""Redis pub/sub 事件匯流排，承載不落地的即時進度事件。"""
+from __future__ import annotations
+
+import asyncio
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, Set
+from uuid import UUID
+
+from loguru import logger
+from redis import Redis
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+
+CHANNEL_PREFIX = "job-events:"
+# 停止轉送時等待背景工作結束的上限秒數
+RELAY_STOP_TIMEOUT = 2.0
+# PROGRESS_STAGE 為高頻進度事件的階段代碼，只推播不落地
+PROGRESS_STAGE = "progress"
+
+
+def job_channel(job_id: UUID | str) -> str:
+    """取得作業專屬的 pub/sub 頻道名稱。"""
+
+    return f"{CHANNEL_PREFIX}{job_id}"
+
+
+@dataclass
+class TransientJobEvent:
+    """僅經由匯流排傳遞、不寫入 job_events 的事件。
+
+    欄位與 JobEvent 相同以便共用序列化，但沒有 id，不可作為 Last-Event-ID 續傳點。
+    """
+
+    job_id: UUID
+    stage: str
+    message: str | None = None
+    payload: Dict[str, Any] | None = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+    def to_json(self) -> str:
+        """轉為匯流排傳輸格式。"""
+
+        return json.dumps(
+            {
+                "jobId": str(self.job_id),
+                "stage": self.stage,
+                "message": self.message,
+                "payload": self.payload,
+                "createdAt": self.created_at.isoformat(),
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> "TransientJobEvent | None":
+        """解析匯流排訊息，格式錯誤時回傳 None。"""
+
+        try:
+            data = json.loads(raw)
+            return cls(
+                job_id=UUID(data["jobId"]),
+                stage=str(data["stage"]),
+                message=data.get("message"),
+                payload=data.get("payload"),
+                created_at=datetime.fromisoformat(data["createdAt"]),
+            )
+        except (ValueError, KeyError, TypeError):
+            return None
+
+
+def publish_transient_event(client: Redis, event: TransientJobEvent) -> None:
+    """由 worker 發布即時事件；Redis 失敗僅記錄，不影響任務執行。"""
+
+    try:
+        client.publish(job_channel(event.job_id), event.to_json())
+    except Exception:  # noqa: BLE001 - 進度推播屬盡力而為
+        logger.warning("Failed to publish progress event job={}", event.job_id)
+
+
+class RedisEventRelay:
+    """API 行程內的匯流排訂閱者，只訂閱本行程有人觀看的作業頻道。"""
+
+    def __init__(self, client: aioredis.Redis, *, reconnect_delay: float = 5.0) -> None:
+        self._client = client
+        self._reconnect_delay = reconnect_delay
+        self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        self._channels: Set[str] = set()
+        self._hub: Any = None
+        self._task: asyncio.Task[None] | None = None
+        self._stopping = False
+
+    async def start(self, hub: Any) -> None:
+        """綁定事件中心並開始轉送訊息。"""
+
+        self._hub = hub
+        self._stopping = False
+        hub.attach_relay(self)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止轉送並關閉連線。
+
+        redis 的讀取可能吞掉 CancelledError，因此除了取消外另以 _stopping 結束迴圈，並限制等待時間。
+        """
+
+        self._stopping = True
+        if self._hub is not None:
+            self._hub.attach_relay(None)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await asyncio.wait_for(asyncio.gather(self._task, return_exceptions=True), RELAY_STOP_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.warning("Progress relay did not stop within {}s", RELAY_STOP_TIMEOUT)
+            self._task = None
+        await self._pubsub.aclose()
+        await self._client.aclose()
+
+    async def watch(self, job_id: UUID) -> None:
+        """訂閱作業頻道。"""
+
+        channel = job_channel(job_id)
+        self._channels.add(channel)
+        try:
+            await self._pubsub.subscribe(channel)
+        except Exception:  # noqa: BLE001 - 重連時會重新訂閱
+            logger.warning("Failed to subscribe progress channel job={}", job_id)
+
+    async def unwatch(self, job_id: UUID) -> None:
+        """取消訂閱作業頻道。"""
+
+        channel = job_channel(job_id)
+        self._channels.discard(channel)
+        try:
+            await self._pubsub.unsubscribe(channel)
+        except Exception:  # noqa: BLE001 - 連線中斷時無需處理
+            logger.debug("Failed to unsubscribe progress channel job={}", job_id)
+
+    async def _run(self) -> None:
+        """持續讀取訊息並交給事件中心扇出。"""
+
+        while not self._stopping:
+            try:
+                if not self._pubsub.subscribed:
+                    if self._channels:
+                        await self._pubsub.subscribe(*self._channels)
+                    else:
+                        await asyncio.sleep(0.1)
+                        continue
+                message = await self._pubsub.get_message(timeout=1.0)
+                if message is None or message.get("type") != "message":
+                    continue
+                event = TransientJobEvent.from_json(message["data"])
+                if event is not None and self._hub is not None:
+                    self._hub.publish_transient(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001 - Redis 中斷時延遲後重訂閱
+                if self._stopping:
+                    return
+                logger.exception("Progress relay disconnected")
+                await self._pubsub.reset()
+                self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                await asyncio.sleep(self._reconnect_delay)
+
+
+def build_event_relay() -> RedisEventRelay | None:
+    """依設定建立匯流排轉送器；停用時回傳 None。"""
+
+    if not settings.event_bus_enabled:
+        return None
+    client = aioredis.from_url(settings.redis_url)
+    return RedisEventRelay(client)
@@ -0,0 +1,108 @@
+﻿"""進度事件合併：每個作業每個時間窗最多放行一筆進度事件，階段轉換立即放行。
+
+worker 發布進度與 API 事件中心扇出都使用同一套規則，無論 worker 回報多頻繁，
+匯流排流量與每條連線收到的事件數都受時間窗限制。
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Generic, List, Mapping, TypeVar
+from uuid import UUID
+
+from app.services.event_bus import PROGRESS_STAGE
+
+EventT = TypeVar("EventT")
+
+
+def progress_phase(stage: str, payload: Mapping[str, Any] | None) -> str | None:
+    """取得進度事件所屬的處理階段；非進度事件回傳 None。
+
+    進度事件的 stage 固定為 progress，實際處理階段記錄在 payload.stage。
+    """
+
+    if stage != PROGRESS_STAGE:
+        return None
+    return str((payload or {}).get("stage") or "")
+
+
+@dataclass
+class _PhaseState(Generic[EventT]):
+    phase: str
+    emitted_at: float
+    pending: EventT | None = None
+
+
+class ProgressCoalescer(Generic[EventT]):
+    """以作業為單位合併進度事件。
+
+    時間窗內的後續進度只保留最新一筆為待送，時間窗結束後由 take_due 取出；
+    非進度事件或處理階段改變視為階段轉換，會先送出待送進度再立即放行。呼叫端需自行處理並行存取。
+    """
+
+    def __init__(self, window: float, *, clock: Callable[[], float] = time.monotonic) -> None:
+        self._window = max(0.0, window)
+        self._clock = clock
+        self._states: Dict[UUID, _PhaseState[EventT]] = {}
+
+    def offer(self, job_id: UUID, event: EventT, phase: str | None) -> List[EventT]:
+        """提交事件並回傳應立即送出的事件；phase 為 None 代表非進度事件。"""
+
+        if phase is None:
+            return self.mark_transition(job_id) + [event]
+
+        now = self._clock()
+        state = self._states.get(job_id)
+        if state is None or state.phase != phase:
+            ready = self.mark_transition(job_id)
+            self._states[job_id] = _PhaseState(phase, now)
+            return ready + [event]
+        if now - state.emitted_at >= self._window:
+            # 新事件已涵蓋待送進度，直接取代
+            state.emitted_at = now
+            state.pending = None
+            return [event]
+        state.pending = event
+        return []
+
+    def mark_transition(self, job_id: UUID) -> List[EventT]:
+        """階段轉換：取出待送進度並重設狀態，下一筆進度會立即放行。"""
+
+        state = self._states.pop(job_id, None)
+        if state is None or state.pending is None:
+            return []
+        return [state.pending]
+
+    def pending_delay(self, job_id: UUID) -> float | None:
+        """距離待送進度可送出的秒數；沒有待送進度時回傳 None。"""
+
+        state = self._states.get(job_id)
+        if state is None or state.pending is None:
+            return None
+        return max(0.0, state.emitted_at + self._window - self._clock())
+
+    def take_due(self, job_id: UUID, *, force: bool = False) -> List[EventT]:
+        """取出時間窗已結束的待送進度；force 時不論時間窗一律取出。"""
+
+        state = self._states.get(job_id)
+        if state is None or state.pending is None:
+            return []
+        now = self._clock()
+        if not force and now - state.emitted_at < self._window:
+            return []
+        event, state.pending = state.pending, None
+        state.emitted_at = now
+        return [event]
+
+    def drain(self) -> List[EventT]:
+        """取出所有作業的待送進度，供任務結束時呼叫。"""
+
+        ready: List[EventT] = []
+        for job_id in list(self._states):
+            ready.extend(self.take_due(job_id, force=True))
+        return ready
+
+    def forget(self, job_id: UUID) -> None:
+        """移除作業狀態，待送進度一併捨棄。"""
+
+        self._states.pop(job_id, None)
@@ -0,0 +1,420 @@
+﻿"""作業事件扇出中心，讓同一作業的多個 SSE 連線共用一次查詢。"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Sequence, Set, Union
+from uuid import UUID
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.tables import TERMINAL_JOB_STATUSES, JobEvent, JobStatus
+from app.services.event_bus import TransientJobEvent
+from app.services.event_coalescer import ProgressCoalescer, progress_phase
+
+
+class EventPoll(NamedTuple):
+    """單次輪詢結果：作業狀態（作業不存在時為 None）、新事件與是否還有下一頁。"""
+
+    status: str | None
+    events: Sequence[JobEvent]
+    has_more: bool = False
+
+
+@dataclass(frozen=True)
+class JobStreamEnd:
+    """作業進入終止狀態的通知，訂閱者收到後應送出 end 事件並關閉串流。"""
+
+    job_id: UUID
+    status: str | None
+
+
+# EventFetcher 接收 (created_after, last_event_id)，以非同步查詢回傳作業狀態與之後的事件
+EventFetcher = Callable[[datetime | None, UUID | None], Awaitable[EventPoll]]
+# HubEvent 為佇列中的項目：已落地的 JobEvent、僅經匯流排傳遞的 TransientJobEvent 或結束通知
+HubEvent = Union[JobEvent, TransientJobEvent, JobStreamEnd]
+
+
+def is_terminal_status(status: str | None) -> bool:
+    """判斷作業是否已結束；查無作業也視為結束。"""
+
+    return status is None or status in TERMINAL_JOB_STATUSES
+
+
+async def drain_queue(queue: asyncio.Queue[HubEvent], timeout: float) -> List[HubEvent]:
+    """等待佇列中的事件，逾時則回傳空清單；一次取出佇列中所有事件。"""
+
+    try:
+        first = await asyncio.wait_for(queue.get(), timeout=timeout)
+    except asyncio.TimeoutError:
+        return []
+    events = [first]
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+class JobEventSubscription:
+    """單一 SSE 連線對單一作業的訂閱；多工串流的多個訂閱可共用同一個佇列。"""
+
+    def __init__(
+        self,
+        hub: "JobEventHub",
+        job_id: UUID,
+        fetch: EventFetcher,
+        polls_at_start: int,
+        queue: asyncio.Queue[HubEvent] | None = None,
+    ) -> None:
+        self.job_id = job_id
+        self.fetch = fetch
+        self.queue: asyncio.Queue[HubEvent] = queue if queue is not None else asyncio.Queue()
+        self.polls_at_start = polls_at_start
+        self.polls_at_end: int | None = None
+        self.overflowed = False  # 佇列滿載而停止投遞，串流端應中斷連線讓客戶端續傳
+        self._hub = hub
+        self._closed = False
+
+    async def next_batch(self, timeout: float) -> List[HubEvent]:
+        """等待新事件，逾時則回傳空清單；一次取出佇列中所有事件。"""
+
+        return await drain_queue(self.queue, timeout)
+
+    @property
+    def shared_polls(self) -> int:
+        """訂閱期間共用輪詢器實際執行的查詢次數。"""
+
+        current = self.polls_at_end if self.polls_at_end is not None else self._hub.poll_count(self.job_id)
+        return max(0, current - self.polls_at_start)
+
+    def close(self) -> None:
+        """取消訂閱；重複呼叫不會有副作用。"""
+
+        if self._closed:
+            return
+        self._closed = True
+        self._hub._release(self)
+
+    def __enter__(self) -> "JobEventSubscription":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+class _JobWatcher:
+    """單一作業的輪詢器，負責把新事件分送給所有訂閱者。"""
+
+    def __init__(
+        self,
+        job_id: UUID,
+        fetch: EventFetcher,
+        created_after: datetime | None,
+        last_event_id: UUID | None,
+        status: str | None,
+    ) -> None:
+        self.job_id = job_id
+        self.fetch = fetch  # 建立輪詢器的訂閱者提供；訂閱者離開後仍會沿用，不可依附單一請求的 Session
+        self.created_after = created_after
+        self.last_event_id = last_event_id
+        self.status = status
+        self.subscribers: Set[JobEventSubscription] = set()
+        self.idle_since: float | None = None
+        self.task: asyncio.Task[None] | None = None
+        self.wake = asyncio.Event()
+        self.backoff_step = 0
+        self.polls = 0
+        self.flush_handle: asyncio.TimerHandle | None = None  # 送出合併中進度的計時器
+
+    def advance(self, event: JobEvent) -> None:
+        """更新游標至最新事件，避免重複查詢。"""
+
+        self.created_after = event.created_at
+        self.last_event_id = event.id
+
+
+class JobEventHub:
+    """每個 API 行程內的事件中心，每個作業僅保留一個輪詢器。"""
+
+    def __init__(
+        self,
+        *,
+        poll_interval: float = 1.0,
+        push_poll_interval: float = 15.0,
+        idle_seconds: float = 10.0,
+        pending_backoff: Sequence[float] = (1.0, 2.0, 5.0),
+        progress_window: float = 0.0,
+    ) -> None:
+        self._poll_interval = poll_interval
+        self._push_poll_interval = push_poll_interval
+        self._idle_seconds = idle_seconds
+        self._pending_backoff = tuple(pending_backoff) or (poll_interval,)
+        self._watchers: Dict[UUID, _JobWatcher] = {}
+        self._push_available = False
+        self._relay: Any = None
+        self._user_waiters: Dict[UUID, Set[asyncio.Event]] = {}
+        # 進度事件於扇出前依作業合併一次，所有連線共用結果
+        self._progress: ProgressCoalescer[HubEvent] = ProgressCoalescer(progress_window)
+
+    def attach_relay(self, relay: Any) -> None:
+        """綁定匯流排轉送器，輪詢器啟動與結束時會訂閱或退訂作業頻道。"""
+
+        self._relay = relay
+
+    def publish_transient(self, event: TransientJobEvent) -> None:
+        """將匯流排收到的即時事件直接扇出，不經資料庫。"""
+
+        watcher = self._watchers.get(event.job_id)
+        if watcher is not None:
+            self._fan_out(watcher, event)
+
+    def set_push_available(self, available: bool) -> None:
+        """由通知來源回報 LISTEN 連線狀態；斷線時輪詢器立即改回短間隔輪詢。"""
+
+        self._push_available = available
+        if not available:
+            for watcher in self._watchers.values():
+                watcher.wake.set()
+
+    def notify(self, job_id: UUID) -> None:
+        """收到新事件通知時喚醒對應作業的輪詢器。"""
+
+        watcher = self._watchers.get(job_id)
+        if watcher is not None:
+            watcher.wake.set()
+
+    def watch_user(self, user_id: UUID) -> asyncio.Event:
+        """取得使用者的作業異動旗標，本行程建立新作業時會被設置，供多工串流立即納入新作業。"""
+
+        waiter = asyncio.Event()
+        self._user_waiters.setdefault(user_id, set()).add(waiter)
+        return waiter
+
+    def unwatch_user(self, user_id: UUID, waiter: asyncio.Event) -> None:
+        """移除使用者的作業異動旗標。"""
+
+        waiters = self._user_waiters.get(user_id)
+        if waiters is None:
+            return
+        waiters.discard(waiter)
+        if not waiters:
+            del self._user_waiters[user_id]
+
+    def notify_user(self, user_id: UUID) -> None:
+        """通知使用者的多工串流重新查詢使用中的作業。"""
+
+        for waiter in self._user_waiters.get(user_id, ()):
+            waiter.set()
+
+    def subscribe(
+        self,
+        job_id: UUID,
+        *,
+        fetch: EventFetcher,
+        created_after: datetime | None,
+        last_event_id: UUID | None,
+        status: str | None = None,
+        queue: asyncio.Queue[HubEvent] | None = None,
+    ) -> JobEventSubscription:
+        """訂閱作業事件；游標為呼叫端補齊後的最後一筆事件。
+
+        既有輪詢器的游標可能已超前呼叫端，呼叫端訂閱後應再查詢一次補上空窗，重複事件以游標去重。
+        第一位訂閱者的 fetch 會成為輪詢器的查詢函式，各作業的輪詢器並行查詢，fetch 應每次自行開啟 Session。
+        """
+
+        watcher = self._watchers.get(job_id)
+        if watcher is None:
+            watcher = _JobWatcher(job_id, fetch, created_after, last_event_id, status)
+            self._watchers[job_id] = watcher
+            watcher.task = asyncio.create_task(self._run(watcher))
+        subscription = JobEventSubscription(self, job_id, fetch, watcher.polls, queue=queue)
+        watcher.subscribers.add(subscription)
+        watcher.idle_since = None
+        return subscription
+
+    def covers(self, job_id: UUID, created_after: datetime | None, last_event_id: UUID | None) -> bool:
+        """作業已有輪詢器且其游標不超前指定位置時，訂閱後即可接續收到之後的事件而不需補查。"""
+
+        watcher = self._watchers.get(job_id)
+        if watcher is None:
+            return False
+        if watcher.created_after is None:
+            return True
+        if created_after is None or watcher.last_event_id is None or last_event_id is None:
+            return False
+        return (watcher.created_after, watcher.last_event_id) <= (created_after, last_event_id)
+
+    def poll_count(self, job_id: UUID) -> int:
+        """取得作業輪詢器累計查詢次數；輪詢器不存在時為 0。"""
+
+        watcher = self._watchers.get(job_id)
+        return watcher.polls if watcher is not None else 0
+
+    def _release(self, subscription: JobEventSubscription) -> None:
+        """移除訂閱者，最後一位離開時開始計算閒置時間。"""
+
+        watcher = self._watchers.get(subscription.job_id)
+        if watcher is None:
+            return
+        if subscription.polls_at_end is None:
+            subscription.polls_at_end = watcher.polls
+        watcher.subscribers.discard(subscription)
+        if not watcher.subscribers:
+            watcher.idle_since = time.monotonic()
+
+    async def _run(self, watcher: _JobWatcher) -> None:
+        """輪詢迴圈：有訂閱者才查詢，作業結束或閒置超過門檻即自行結束。"""
+
+        relay = self._relay
+        try:
+            # 訂閱期間被取消時仍須經 finally 移除 watcher 並取消訂閱
+            if relay is not None:
+                await relay.watch(watcher.job_id)
+            while True:
+                await self._wait_for_wake(watcher)
+                if not watcher.subscribers:
+                    idle_since = watcher.idle_since or time.monotonic()
+                    if time.monotonic() - idle_since >= self._idle_seconds:
+                        break
+                    continue
+
+                watcher.polls += 1
+                try:
+                    poll = await watcher.fetch(watcher.created_after, watcher.last_event_id)
+                except Exception:  # noqa: BLE001 - 輪詢失敗時記錄後重試
+                    logger.exception("Job event poll failed job={}", watcher.job_id)
+                    continue
+
+                watcher.status = poll.status
+                if poll.events:
+                    watcher.backoff_step = 0
+                elif watcher.status == JobStatus.PENDING.value:
+                    watcher.backoff_step += 1
+
+                for event in poll.events:
+                    watcher.advance(event)
+                    self._fan_out(watcher, event)
+
+                if poll.has_more:
+                    # 本頁已滿則立即查詢下一頁，待事件補齊後才判斷是否結束
+                    watcher.wake.set()
+                    continue
+
+                if is_terminal_status(poll.status):
+                    self._fan_out(watcher, JobStreamEnd(job_id=watcher.job_id, status=poll.status))
+                    break
+        finally:
+            for subscription in watcher.subscribers:
+                subscription.polls_at_end = watcher.polls
+            if watcher.flush_handle is not None:
+                watcher.flush_handle.cancel()
+            if self._watchers.get(watcher.job_id) is watcher:
+                del self._watchers[watcher.job_id]
+                self._progress.forget(watcher.job_id)
+            if relay is not None:
+                await relay.unwatch(watcher.job_id)
+
+    def _fan_out(self, watcher: _JobWatcher, item: HubEvent) -> None:
+        """合併進度後扇出；階段轉換與結束通知會先送出合併中的進度。"""
+
+        phase = None if isinstance(item, JobStreamEnd) else progress_phase(item.stage, item.payload)
+        for ready in self._progress.offer(watcher.job_id, item, phase):
+            self._broadcast(watcher, ready)
+        self._schedule_pending(watcher)
+
+    def _schedule_pending(self, watcher: _JobWatcher) -> None:
+        """有合併中的進度時，於時間窗結束後送出最新一筆。"""
+
+        delay = self._progress.pending_delay(watcher.job_id)
+        if delay is None or watcher.flush_handle is not None:
+            return
+        watcher.flush_handle = asyncio.get_running_loop().call_later(delay, self._flush_pending, watcher)
+
+    def _flush_pending(self, watcher: _JobWatcher) -> None:
+        watcher.flush_handle = None
+        if self._watchers.get(watcher.job_id) is not watcher:
+            return
+        for ready in self._progress.take_due(watcher.job_id):
+            self._broadcast(watcher, ready)
+        self._schedule_pending(watcher)
+
+    @staticmethod
+    def _broadcast(watcher: _JobWatcher, item: HubEvent) -> None:
+        """將項目放入所有訂閱者的佇列；佇列已滿的訂閱者會被移除。"""
+
+        for subscription in list(watcher.subscribers):
+            try:
+                subscription.queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # 消費端過慢，停止投遞以免無限累積；已送出的游標不變，客戶端重連後可續傳
+                subscription.overflowed = True
+                subscription.close()
+
+    def _next_interval(self, watcher: _JobWatcher) -> float:
+        """計算下一次查詢的等待秒數。
+
+        有推播時僅需長間隔保底；pending 且持續無事件時依序拉長間隔，收到事件即回到最短間隔。
+        """
+
+        if self._push_available:
+            return self._push_poll_interval
+        if watcher.status == JobStatus.PENDING.value:
+            step = min(watcher.backoff_step, len(self._pending_backoff) - 1)
+            return self._pending_backoff[step]
+        return self._poll_interval
+
+    async def _wait_for_wake(self, watcher: _JobWatcher) -> None:
+        """等待通知喚醒或輪詢間隔到期。"""
+
+        timeout = self._next_interval(watcher)
+        if not watcher.subscribers:
+            timeout = min(timeout, self._idle_seconds)
+        try:
+            await asyncio.wait_for(watcher.wake.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        watcher.wake.clear()
+
+    async def shutdown(self) -> None:
+        """停止所有輪詢器，供應用關閉時呼叫。"""
+
+        tasks = [watcher.task for watcher in self._watchers.values() if watcher.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._watchers.clear()
+
+    def stats(self) -> dict[str, int]:
+        """回傳目前輪詢器與訂閱者數量。"""
+
+        return {
+            "push_available": int(self._push_available),
+            "watchers": len(self._watchers),
+            "subscribers": sum(len(watcher.subscribers) for watcher in self._watchers.values()),
+        }
+
+
+def _parse_backoff(raw: str) -> tuple[float, ...]:
+    """解析以逗號分隔的退避秒數設定。"""
+
+    return tuple(float(item) for item in raw.split(",") if item.strip())
+
+
+# event_hub 為行程內共用的事件中心
+event_hub = JobEventHub(
+    poll_interval=settings.event_hub_poll_interval,
+    push_poll_interval=settings.event_hub_push_poll_interval,
+    idle_seconds=settings.event_hub_idle_seconds,
+    pending_backoff=_parse_backoff(settings.event_hub_pending_backoff),
+    progress_window=settings.event_progress_window,
+)
+metrics.register_collector("event_hub", event_hub.stats)
+
+
+def get_event_hub() -> JobEventHub:
+    """提供 FastAPI 依賴注入的 JobEventHub。"""
+
+    return event_hub
@@ -0,0 +1,162 @@
+﻿"""job_events 寫入與作業狀態變更通知，透過 Postgres LISTEN/NOTIFY 即時喚醒事件中心。"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Protocol
+from uuid import UUID
+
+import psycopg
+from loguru import logger
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.services.event_hub import JobEventHub
+from app.services.job_cache import FinishedJobCache, finished_job_cache
+
+# NOTIFY_CHANNEL 需與 alembic 20250920_0002、20250925_0007 的 trigger 一致
+NOTIFY_CHANNEL = "job_events"
+
+
+class JobEventNotifier(Protocol):
+    """事件通知來源介面。"""
+
+    async def start(self) -> None:
+        """開始接收通知。"""
+
+    async def stop(self) -> None:
+        """停止接收通知並釋放連線。"""
+
+
+def _parse_notification(raw: str) -> UUID | None:
+    """解析 trigger 送出的 JSON 負載，格式錯誤時回傳 None。"""
+
+    try:
+        data = json.loads(raw)
+        return UUID(str(data["job_id"]))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _to_libpq_dsn(database_url: str) -> str:
+    """將 SQLAlchemy URL 轉為 psycopg 可用的連線字串。"""
+
+    url = make_url(database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+class PostgresEventNotifier:
+    """以獨立連線 LISTEN job_events，斷線時交由事件中心改回輪詢。
+
+    提供 cache 時，收到作業的新事件或狀態變更即清除其已結束作業快取；斷線期間停用快取。
+    """
+
+    def __init__(
+        self,
+        *,
+        database_url: str,
+        hub: JobEventHub,
+        cache: FinishedJobCache | None = None,
+        reconnect_delay: float = 5.0,
+    ) -> None:
+        self._dsn = _to_libpq_dsn(database_url)
+        self._hub = hub
+        self._cache = cache
+        self._reconnect_delay = reconnect_delay
+        self._task: asyncio.Task[None] | None = None
+
+    def _set_available(self, available: bool) -> None:
+        self._hub.set_push_available(available)
+        if self._cache is not None:
+            self._cache.set_invalidation_available(available)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self._set_available(False)
+
+    async def _run(self) -> None:
+        """維持 LISTEN 連線，失敗後延遲重連。"""
+
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(self._dsn, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                    self._set_available(True)
+                    logger.info("Listening for job event notifications")
+                    async for notify in conn.notifies():
+                        job_id = _parse_notification(notify.payload)
+                        if job_id is not None:
+                            if self._cache is not None:
+                                self._cache.invalidate(job_id)
+                            self._hub.notify(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:  # noqa: BLE001 - 連線中斷時改回輪詢並重試
+                logger.exception("Job event listener disconnected")
+            self._set_available(False)
+            await asyncio.sleep(self._reconnect_delay)
+
+
+class InMemoryEventNotifier:
+    """測試與本機開發用的通知替身，直接喚醒事件中心。"""
+
+    def __init__(self, hub: JobEventHub, cache: FinishedJobCache | None = None) -> None:
+        self._hub = hub
+        self._cache = cache
+
+    async def start(self) -> None:
+        self._hub.set_push_available(True)
+        if self._cache is not None:
+            self._cache.set_invalidation_available(True)
+
+    async def stop(self) -> None:
+        self._hub.set_push_available(False)
+        if self._cache is not None:
+            self._cache.set_invalidation_available(False)
+
+    def publish(self, job_id: UUID, event_id: UUID | None = None) -> None:
+        """模擬 trigger 送出一筆通知。"""
+
+        payload = json.dumps({"job_id": str(job_id), "event_id": str(event_id) if event_id else None})
+        parsed = _parse_notification(payload)
+        if parsed is not None:
+            if self._cache is not None:
+                self._cache.invalidate(parsed)
+            self._hub.notify(parsed)
+
+
+def _listener_url() -> str | None:
+    """LISTEN 使用的連線字串；優先使用直連 URL，經交易模式連線池且未設定直連時回傳 None。
+
+    PgBouncer 交易模式不保留 session，LISTEN 不會報錯卻收不到任何通知。
+    """
+
+    if settings.supabase_direct_url:
+        return settings.supabase_direct_url
+    if settings.db_transaction_pooler:
+        return None
+    return settings.supabase_url
+
+
+def build_event_notifier(hub: JobEventHub) -> JobEventNotifier | None:
+    """依設定建立通知來源；未設定資料庫、停用或沒有可 LISTEN 的連線時回傳 None。
+
+    不建立通知來源時事件中心維持輪詢，已結束作業快取也保持停用。
+    """
+
+    if not settings.event_listener_enabled:
+        return None
+    database_url = _listener_url()
+    if not database_url:
+        if settings.db_transaction_pooler:
+            logger.warning("DB_TRANSACTION_POOLER is on without SUPABASE_DIRECT_URL; job event LISTEN disabled")
+        return None
+    return PostgresEventNotifier(database_url=database_url, hub=hub, cache=finished_job_cache)
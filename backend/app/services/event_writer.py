@@ -0,0 +1,121 @@
+﻿"""Worker 端的作業事件批次寫入器：事件先暫存於記憶體，達到筆數或時間門檻時一次寫入。"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from loguru import logger
+
+from app.core.metrics import MetricsRegistry, metrics
+
+EventPersister = Callable[[List[Dict[str, Any]]], None]
+TimerFactory = Callable[[float, Callable[[], None]], threading.Timer]
+
+
+def _daemon_timer(interval: float, callback: Callable[[], None]) -> threading.Timer:
+    timer = threading.Timer(interval, callback)
+    timer.daemon = True
+    return timer
+
+
+class JobEventWriter:
+    """以單次批次寫入取代逐筆 add、commit、refresh。
+
+    暫存達 batch_size 筆立即寫入；第一筆暫存後 max_delay 秒仍未寫入時由計時器寫入，
+    任務結束與 worker 關閉時由呼叫端 flush。寫入失敗時保留資料待下次重試。
+    """
+
+    def __init__(
+        self,
+        *,
+        persist: EventPersister,
+        batch_size: int,
+        max_delay: float,
+        registry: MetricsRegistry = metrics,
+        timer_factory: TimerFactory = _daemon_timer,
+    ) -> None:
+        self._persist = persist
+        self._batch_size = max(1, batch_size)
+        self._max_delay = max_delay
+        self._timer_factory = timer_factory
+        self._timer: threading.Timer | None = None
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        # 寫入本身另以 flush 鎖序列化，避免計時器與任務結束同時寫入而打亂順序
+        self._flush_lock = threading.Lock()
+        self._flushes = registry.counter("job_event_flushes_total", "作業事件批次寫入次數")
+        self._rows = registry.counter("job_event_rows_written_total", "批次寫入的作業事件筆數")
+        self._failures = registry.counter("job_event_flush_failures_total", "作業事件批次寫入失敗次數")
+        self.last_batch = 0
+        self.max_batch = 0
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """暫存一筆事件，達到批次大小時立即寫入。"""
+
+        with self._lock:
+            self._pending.append(row)
+            should_flush = len(self._pending) >= self._batch_size
+            if not should_flush and self._timer is None and self._max_delay > 0:
+                self._timer = self._timer_factory(self._max_delay, self._flush_on_timer)
+                self._timer.start()
+        if should_flush:
+            self.flush()
+
+    def _flush_on_timer(self) -> None:
+        try:
+            self.flush()
+        except Exception:  # noqa: BLE001 - 已於 flush 記錄，資料保留待下次寫入
+            pass
+
+    def flush(self) -> int:
+        """寫入所有暫存事件並回傳筆數；失敗時保留資料並重新拋出例外。"""
+
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not rows:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                self._persist(rows)
+            except Exception:
+                with self._lock:
+                    self._pending = rows + self._pending
+                self._failures.inc()
+                logger.exception("Failed to persist {} job events", len(rows))
+                raise
+            self._record(len(rows), (time.perf_counter() - started) * 1000)
+            return len(rows)
+
+    def _record(self, size: int, latency_ms: float) -> None:
+        self._flushes.inc()
+        self._rows.inc(size)
+        self.last_batch = size
+        self.max_batch = max(self.max_batch, size)
+        self.last_latency_ms = latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+        logger.debug("Flushed {} job events in {:.1f} ms", size, latency_ms)
+
+    @property
+    def pending(self) -> int:
+        """尚未寫入的事件數量。"""
+
+        return len(self._pending)
+
+    def stats(self) -> dict[str, int]:
+        """回傳暫存筆數與最近、最大的批次大小及寫入延遲（毫秒）。"""
+
+        return {
+            "pending": self.pending,
+            "last_batch": self.last_batch,
+            "max_batch": self.max_batch,
+            "last_latency_ms": round(self.last_latency_ms),
+            "max_latency_ms": round(self.max_latency_ms),
+        }
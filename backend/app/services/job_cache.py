@@ -0,0 +1,168 @@
+﻿"""已結束作業的回應快取：completed、failed 作業的資產與事件不再變動，序列化後的回應本文可直接重用。
+
+快取只在 LISTEN/NOTIFY 連線正常時啟用：重新處理的作業一定會寫入新事件，
+通知來源收到事件時呼叫 invalidate 清除該作業；連線中斷時無法得知失效，因此整個停用並清空。
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+# 每個回應本文的固定記憶體估計（bytes 物件、ETag 與索引項目）
+_ENTRY_OVERHEAD_BYTES = 256
+
+CacheKey = Tuple[UUID, UUID]
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    """已序列化的 JSON 回應本文與其 ETag。"""
+
+    body: bytes
+    etag: str
+
+
+@dataclass
+class _JobEntry:
+    """單一作業的所有快取回應，以資源與查詢參數區分。"""
+
+    bodies: Dict[Hashable, CachedBody] = field(default_factory=dict)
+    size: int = 0
+
+
+class FinishedJobCache:
+    """以 (user_id, job_id) 為鍵的 LRU 快取，總量超過 max_bytes 時移除最久未使用的作業。
+
+    鍵包含使用者 ID，命中時不需再查詢資料庫確認擁有權。寫入前以 token 確認
+    讀取資料庫期間沒有發生失效，避免把失效前讀到的舊內容放回快取。
+    """
+
+    def __init__(self, *, max_bytes: int, max_entry_bytes: int) -> None:
+        self._max_bytes = max(0, max_bytes)
+        self._max_entry_bytes = max_entry_bytes
+        self._jobs: OrderedDict[CacheKey, _JobEntry] = OrderedDict()
+        self._owners: Dict[UUID, UUID] = {}
+        self._bytes = 0
+        self._available = False
+        self._invalidations = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def available(self) -> bool:
+        return self._available and self._max_bytes > 0
+
+    def set_invalidation_available(self, available: bool) -> None:
+        """由通知來源回報是否能收到失效通知；無法收到時清空並停用快取。"""
+
+        self._available = available
+        if not available:
+            self._invalidations += 1
+            self._jobs.clear()
+            self._owners.clear()
+            self._bytes = 0
+
+    def token(self) -> int:
+        """查詢資料庫前取得的失效序號，交給 put 檢查。"""
+
+        return self._invalidations
+
+    def get(self, user_id: UUID, job_id: UUID, variant: Hashable) -> CachedBody | None:
+        """取得快取的回應本文；未命中或快取停用時回傳 None。"""
+
+        if not self.available:
+            return None
+        entry = self._jobs.get((user_id, job_id))
+        cached = entry.bodies.get(variant) if entry is not None else None
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._jobs.move_to_end((user_id, job_id))
+        return cached
+
+    def put(
+        self, user_id: UUID, job_id: UUID, variant: Hashable, *, body: bytes, etag: str, token: int
+    ) -> CachedBody:
+        """寫入已結束作業的回應本文並回傳；快取停用、本文過大或期間發生失效時不寫入。"""
+
+        cached = CachedBody(body, etag)
+        size = len(body) + _ENTRY_OVERHEAD_BYTES
+        if not self.available or token != self._invalidations or size > self._max_entry_bytes:
+            return cached
+
+        key = (user_id, job_id)
+        entry = self._jobs.get(key)
+        if entry is None:
+            entry = self._jobs[key] = _JobEntry()
+            self._owners[job_id] = user_id
+        previous = entry.bodies.get(variant)
+        if previous is not None:
+            entry.size -= len(previous.body) + _ENTRY_OVERHEAD_BYTES
+            self._bytes -= len(previous.body) + _ENTRY_OVERHEAD_BYTES
+        entry.bodies[variant] = cached
+        entry.size += size
+        self._bytes += size
+        self._jobs.move_to_end(key)
+        self._evict()
+        return cached
+
+    def invalidate(self, job_id: UUID) -> None:
+        """作業重新處理或寫入新事件時移除其所有快取回應。"""
+
+        self._invalidations += 1
+        user_id = self._owners.pop(job_id, None)
+        if user_id is None:
+            return
+        entry = self._jobs.pop((user_id, job_id), None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _evict(self) -> None:
+        while self._jobs and self._bytes > self._max_bytes:
+            (_, job_id), entry = self._jobs.popitem(last=False)
+            self._owners.pop(job_id, None)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """清空快取與統計，保留啟用狀態。"""
+
+        self._jobs.clear()
+        self._owners.clear()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> dict[str, int]:
+        """回傳快取的作業數、位元組與命中統計。"""
+
+        return {
+            "jobs": len(self._jobs),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self._invalidations,
+        }
+
+
+# finished_job_cache 為行程內共用的已結束作業快取
+finished_job_cache = FinishedJobCache(
+    max_bytes=settings.finished_job_cache_max_bytes,
+    max_entry_bytes=settings.finished_job_cache_max_entry_bytes,
+)
+metrics.register_collector("finished_job_cache", finished_job_cache.stats)
+
+
+def get_finished_job_cache() -> FinishedJobCache:
+    """提供 FastAPI 依賴注入的 FinishedJobCache。"""
+
+    return finished_job_cache
@@ -1,15 +1,19 @@
-"""???????"""
+﻿"""???????"""
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple, TypeVar
 from uuid import UUID
 
 from app.core.celery_app import celery_app
 from app.core.config import settings
-from app.models.tables import JobEvent, JobStatus, ScoreAsset, TranscriptionJob
-from app.repositories.jobs import JobRepository
+from app.core.db_routing import ReplicaRouter
+from app.core.pagination import KeysetCursor
+from app.models.tables import JobEvent, JobEventArchive, JobStatus, ScoreAsset, TranscriptionJob
+from app.repositories.jobs import TOTAL_EXACT, AsyncJobRepository, JobVersion
 from app.schemas.job import JobCreateRequest
+from app.services.event_archive import JobEventArchiveStore, events_after, job_event_archive_store
 
 
 class JobSubmissionLockedError(Exception):
@@ -21,125 +25,378 @@ class JobSubmissionLockedError(Exception):
         self.active = active
 
 
-class JobService:
-    """????????????"""
+def _build_job(payload: JobCreateRequest, user_id: UUID) -> TranscriptionJob:
+    """依請求內容建立尚未寫入的作業實體。"""
 
-    def __init__(self, repository: JobRepository) -> None:
+    source_uri: Optional[str]
+    if payload.source_type == "youtube":
+        source_uri = payload.youtube_url
+    else:
+        source_uri = payload.storage_object_path
+
+    return TranscriptionJob(
+        user_id=user_id,
+        source_type=payload.source_type,
+        source_uri=source_uri,
+        storage_object_path=payload.storage_object_path,
+        instrument_modes=payload.instrument_modes,
+        model_profile=payload.model_profile or "balanced",
+        status=JobStatus.PENDING,
+        progress=0.0,
+    )
+
+
+ItemT = TypeVar("ItemT")
+
+
+def _split_page(items: List[ItemT], limit: int | None) -> Tuple[List[ItemT], bool]:
+    """多查一筆判斷是否還有下一頁，回傳截斷後的資料與旗標。"""
+
+    if limit is None or len(items) <= limit:
+        return items, False
+    return items[:limit], True
+
+
+def _submitted_event(job: TranscriptionJob) -> Dict[str, Any]:
+    """作業送出時寫入的 submitted 事件。"""
+
+    return {
+        "job_id": job.id,
+        "stage": "submitted",
+        "message": "Job submitted",
+        "payload": {"sourceType": job.source_type},
+    }
+
+
+def _task_payload(job: TranscriptionJob) -> Dict[str, Any]:
+    return {
+        "source_type": job.source_type,
+        "source_uri": job.source_uri,
+        "storage_path": job.storage_object_path,
+        "instrument_modes": list(job.instrument_modes or []),
+        "model_profile": job.model_profile,
+    }
+
+
+def _dispatch_job(job: TranscriptionJob) -> None:
+    """將作業交給 Celery orchestrator。"""
+
+    celery_app.send_task(
+        "app.tasks.orchestrator.process_transcription_job",
+        args=(str(job.id), _task_payload(job)),
+    )
+
+
+def _dispatch_jobs(jobs: List[TranscriptionJob]) -> None:
+    """以單一訊息將多筆作業交給 orchestrator，由 worker 端逐筆展開。"""
+
+    celery_app.send_task(
+        "app.tasks.orchestrator.process_transcription_jobs",
+        args=([[str(job.id), _task_payload(job)] for job in jobs],),
+    )
+
+
+class AsyncJobService:
+    """作業服務，供 API 端點使用，以非同步查詢避免阻塞事件迴圈。
+
+    提供 replica 與 router 時，唯讀查詢依 router 判斷改送讀取副本，寫入一律走主庫。
+    已封存至 Storage 的事件由 archive 讀取，與資料表中的事件接續分頁。
+    """
+
+    def __init__(
+        self,
+        repository: AsyncJobRepository,
+        *,
+        replica: AsyncJobRepository | None = None,
+        router: ReplicaRouter | None = None,
+        archive: JobEventArchiveStore = job_event_archive_store,
+    ) -> None:
         self._repository = repository
+        self._replica = replica
+        self._router = router
+        self._archive = archive
+        self.from_primary = replica is None  # 所有讀取是否都走主庫
+
+    async def _reader(self, user_id: UUID) -> AsyncJobRepository:
+        """選擇唯讀查詢使用的儲存庫。"""
+
+        if self._replica is not None and self._router is not None and await self._router.use_replica(user_id):
+            return self._replica
+        return self._repository
+
+    async def consistent_reads(self, *, user_id: UUID, primary: bool = False) -> "AsyncJobService":
+        """選定一次讀取來源，回傳所有查詢都走該來源的服務，供同一請求的多次唯讀查詢使用。
+
+        每次查詢各自選擇時，條件式 GET 的版本可能來自主庫、內容卻來自延遲的副本，ETag 便與本文不符。
+        primary 為 True 時固定讀主庫，用於結果會放入跨請求快取的查詢。
+        """
+
+        reader = self._repository if primary else await self._reader(user_id)
+        reads = AsyncJobService(reader, archive=self._archive)
+        reads.from_primary = reader is self._repository
+        return reads
 
-    def create_job(self, *, payload: JobCreateRequest, user_id: UUID) -> TranscriptionJob:
-        """??????????????"""
+    def _record_write(self, user_id: UUID) -> None:
+        if self._router is not None:
+            self._router.record_write(user_id)
+
+    async def create_job(self, *, payload: JobCreateRequest, user_id: UUID) -> TranscriptionJob:
+        """檢查使用中作業上限後建立作業、寫入 submitted 事件並派送任務。"""
 
         active_limit = settings.job_submission_active_limit
-        active_count = self._repository.count_jobs_by_statuses(
-            user_id=user_id,
-            statuses=[JobStatus.PENDING.value, JobStatus.PROCESSING.value],
+        # 名額檢查與作業寫入在同一交易完成，成本固定且並行送出不會超過上限
+        created_job, active_count = await self._repository.create_job_within_limit(
+            _build_job(payload, user_id),
+            limit=active_limit,
         )
-        if active_count >= active_limit:
+        if created_job is None:
             raise JobSubmissionLockedError(limit=active_limit, active=active_count)
 
-        source_uri: Optional[str]
-        if payload.source_type == "youtube":
-            source_uri = payload.youtube_url
-        else:
-            source_uri = payload.storage_object_path
+        self._record_write(user_id)
+        await self._repository.create_event(**_submitted_event(created_job))
 
-        job = TranscriptionJob(
-            user_id=user_id,
-            source_type=payload.source_type,
-            source_uri=source_uri,
-            storage_object_path=payload.storage_object_path,
-            instrument_modes=payload.instrument_modes,
-            model_profile=payload.model_profile or "balanced",
-            status=JobStatus.PENDING,
-            progress=0.0,
-        )
-        created_job = self._repository.create_job(job)
+        # Celery 發送為同步 I/O，移至執行緒避免卡住事件迴圈
+        await asyncio.to_thread(_dispatch_job, created_job)
 
-        self._repository.create_event(
-            job_id=created_job.id,
-            stage="submitted",
-            message="Job submitted",
-            payload={"sourceType": created_job.source_type},
-        )
+        return created_job
 
-        task_payload: Dict[str, Any] = {
-            "source_type": created_job.source_type,
-            "source_uri": created_job.source_uri,
-            "storage_path": created_job.storage_object_path,
-            "instrument_modes": list(created_job.instrument_modes or []),
-            "model_profile": created_job.model_profile,
-        }
-        celery_app.send_task(
-            "app.tasks.orchestrator.process_transcription_job",
-            args=(str(created_job.id), task_payload),
-        )
+    async def create_jobs(
+        self, *, payloads: List[JobCreateRequest], user_id: UUID
+    ) -> Tuple[List[TranscriptionJob], int]:
+        """批次建立作業，回傳建立的作業與目前使用中作業數；名額不足時只建立前面可容納的作業。
 
-        return created_job
+        名額檢查、作業與 submitted 事件寫入在同一交易完成，派送只送出一則訊息。
+        """
+
+        jobs = [_build_job(payload, user_id) for payload in payloads]
+        created, active = await self._repository.create_jobs_within_limit(
+            jobs,
+            events=[_submitted_event(job) for job in jobs],
+            limit=settings.job_submission_active_limit,
+        )
+        if created:
+            self._record_write(user_id)
+            await asyncio.to_thread(_dispatch_jobs, created)
+        return created, active
 
-    def list_jobs(
+    async def list_jobs(
         self,
         *,
         user_id: UUID,
         status: Optional[str] = None,
         limit: int = 20,
         offset: int = 0,
-    ) -> Tuple[List[TranscriptionJob], int]:
-        """??????????,?????????"""
+        after: KeysetCursor | None = None,
+        total: str = TOTAL_EXACT,
+    ) -> Tuple[List[TranscriptionJob], Optional[int], bool]:
+        """依建立時間遞減列出作業，回傳一頁資料、總筆數與是否還有下一頁；帶 after 時以 keyset 分頁並忽略 offset。
+
+        總筆數與資料在同一次查詢取得。
+        """
+
+        reader = await self._reader(user_id)
+        jobs, count = await reader.list_jobs_page(
+            user_id=user_id,
+            status=status,
+            limit=limit + 1,
+            offset=offset,
+            before=after,
+            total=total,
+            estimate_cap=settings.job_list_estimate_cap,
+        )
+        page, has_more = _split_page(jobs, limit)
+        return page, count, has_more
 
-        jobs = self._repository.list_jobs(user_id=user_id, status=status, limit=limit, offset=offset)
-        total = self._repository.count_jobs(user_id=user_id, status=status)
-        return jobs, total
+    async def list_active_job_ids(self, *, user_id: UUID) -> List[UUID]:
+        """列出使用者尚未結束的作業 ID，供多工串流定期查詢，查詢後立即歸還連線。"""
 
-    def get_job(self, *, user_id: UUID, job_id: UUID) -> TranscriptionJob | None:
-        """?????????????"""
+        reader = await self._reader(user_id)
+        try:
+            return await reader.list_active_job_ids(user_id=user_id)
+        finally:
+            await reader.release()
 
-        return self._repository.get_job(job_id=job_id, user_id=user_id)
+    async def get_job(self, *, user_id: UUID, job_id: UUID) -> TranscriptionJob | None:
+        """取得使用者擁有的單一作業。"""
 
-    def list_job_assets(self, *, user_id: UUID, job_id: UUID) -> Optional[List[ScoreAsset]]:
-        """?????????????????????"""
+        reader = await self._reader(user_id)
+        return await reader.get_job(job_id=job_id, user_id=user_id)
 
-        job = self._repository.get_job(job_id=job_id, user_id=user_id)
-        if job is None:
+    async def list_job_assets(self, *, user_id: UUID, job_id: UUID) -> Optional[List[ScoreAsset]]:
+        """列出作業資產；作業不存在或不屬於使用者時回傳 None。"""
+
+        reader = await self._reader(user_id)
+        detail = await reader.get_job_detail(job_id=job_id, user_id=user_id, include_assets=True)
+        if detail is None:
+            return None
+        return detail[1] or []
+
+    async def list_job_events(
+        self,
+        *,
+        user_id: UUID,
+        job_id: UUID,
+        limit: int | None = None,
+        after: KeysetCursor | None = None,
+    ) -> Optional[Tuple[List[JobEvent], bool]]:
+        """依 (created_at, id) 分頁列出作業事件與是否還有下一頁；作業不存在時回傳 None。
+
+        游標之後若有已封存的事件，先由封存檔取得，不足一頁時再接續查詢資料表；
+        沒有封存時狀態、封存旗標與事件在同一次往返取得。
+        """
+
+        reader = await self._reader(user_id)
+        job_status, archived, events = await reader.poll_events_page(
+            job_id=job_id,
+            user_id=user_id,
+            created_after=after.created_at if after else None,
+            last_event_id=after.id if after else None,
+            limit=None if limit is None else limit + 1,
+        )
+        if job_status is None:
             return None
-        assets = self._repository.list_assets(job_id=job_id, user_id=user_id)
-        return sorted(assets, key=lambda item: item.created_at)
+        if not archived:
+            return _split_page(events, limit)
+        archives = await reader.list_event_archives(
+            job_id=job_id,
+            user_id=user_id,
+            created_after=after.created_at if after else None,
+        )
+        return await self._events_page(reader, archives, user_id=user_id, job_id=job_id, limit=limit, after=after)
 
-    def list_job_events(self, *, user_id: UUID, job_id: UUID) -> Optional[List[JobEvent]]:
-        """????????????????"""
+    async def _events_page(
+        self,
+        reader: AsyncJobRepository,
+        archives: List[JobEventArchive],
+        *,
+        user_id: UUID,
+        job_id: UUID,
+        limit: int | None,
+        after: KeysetCursor | None,
+    ) -> Optional[Tuple[List[JobEvent], bool]]:
+        archived: List[JobEvent] = []
+        for archive in archives:
+            if limit is not None and len(archived) > limit:
+                break
+            # Storage 下載為同步 I/O，移至執行緒避免卡住事件迴圈
+            events = await asyncio.to_thread(self._archive.read, archive.storage_object_path)
+            archived.extend(events_after(events, after))
+        if limit is not None and len(archived) > limit:
+            return archived[:limit], True
+        if archived:
+            after = KeysetCursor(archived[-1].created_at, archived[-1].id)
 
-        job = self._repository.get_job(job_id=job_id, user_id=user_id)
-        if job is None:
+        # 每列帶有作業狀態，擁有權檢查與事件查詢在同一次往返完成
+        job_status, events = await reader.poll_events_after(
+            job_id=job_id,
+            user_id=user_id,
+            created_after=after.created_at if after else None,
+            last_event_id=after.id if after else None,
+            limit=None if limit is None else limit - len(archived) + 1,
+        )
+        if job_status is None:
             return None
-        events = self._repository.list_events(job_id=job_id, user_id=user_id)
-        return sorted(events, key=lambda item: item.created_at)
+        return _split_page(archived + events, limit)
 
-    def get_job_event(
+    async def get_job_detail(
+        self,
+        *,
+        user_id: UUID,
+        job_id: UUID,
+        include_assets: bool = False,
+        include_events: bool = False,
+        events_limit: int | None = None,
+    ) -> Optional[Tuple[TranscriptionJob, Optional[List[ScoreAsset]], Optional[Tuple[List[JobEvent], bool]]]]:
+        """單次查詢取得作業與內嵌資源；事件依 (created_at, id) 取前 events_limit 筆並回傳是否還有更多。"""
+
+        reader = await self._reader(user_id)
+        detail = await reader.get_job_detail(
+            job_id=job_id,
+            user_id=user_id,
+            include_assets=include_assets,
+            include_events=include_events,
+            events_limit=None if events_limit is None else events_limit + 1,
+        )
+        if detail is None:
+            return None
+        job, assets, events, archived = detail
+        if events is None:
+            return job, assets, None
+        if archived:
+            archives = await reader.list_event_archives(job_id=job_id, user_id=user_id)
+            # 最早的事件已封存，內嵌事件改由封存檔開始取
+            page = await self._events_page(
+                reader, archives, user_id=user_id, job_id=job_id, limit=events_limit, after=None
+            )
+            return job, assets, page or ([], False)
+        return job, assets, _split_page(events, events_limit)
+
+    async def get_job_version(self, *, user_id: UUID, job_id: UUID) -> JobVersion | None:
+        """以單次索引查詢取得作業版本，供條件式 GET 在完整查詢前比對 ETag；作業不存在時回傳 None。"""
+
+        reader = await self._reader(user_id)
+        return await reader.get_job_version(job_id=job_id, user_id=user_id)
+
+    async def get_jobs_last_modified(self, *, user_id: UUID) -> datetime | None:
+        """取得使用者作業列表的最後修改時間；沒有作業時回傳 None。"""
+
+        reader = await self._reader(user_id)
+        return await reader.get_jobs_last_modified(user_id=user_id)
+
+    async def get_job_event(
         self,
         *,
         user_id: UUID,
         job_id: UUID,
         event_id: UUID,
     ) -> JobEvent | None:
-        """??? ID ??????,?????????"""
+        """依事件 ID 取得作業事件，用於 Last-Event-ID 續傳。"""
 
-        return self._repository.get_event(job_id=job_id, user_id=user_id, event_id=event_id)
+        reader = await self._reader(user_id)
+        return await reader.get_event(job_id=job_id, user_id=user_id, event_id=event_id)
 
-    def list_job_events_after(
+    async def list_job_events_after(
         self,
         *,
         user_id: UUID,
         job_id: UUID,
         created_after: datetime | None,
         last_event_id: UUID | None,
+        limit: int | None = None,
     ) -> List[JobEvent]:
-        """???????????????"""
+        """取得游標之後的作業事件。"""
 
-        return self._repository.list_events_after(
+        reader = await self._reader(user_id)
+        return await reader.list_events_after(
             job_id=job_id,
             user_id=user_id,
             created_after=created_after,
             last_event_id=last_event_id,
+            limit=limit,
         )
 
+    async def poll_job_events(
+        self,
+        *,
+        user_id: UUID,
+        job_id: UUID,
+        created_after: datetime | None,
+        last_event_id: UUID | None,
+        limit: int | None = None,
+    ) -> Tuple[str | None, List[JobEvent]]:
+        """以單次查詢取得作業狀態與新事件，並立即歸還連線。
+
+        SSE 長連線會反覆呼叫此方法，若不歸還連線，每條串流都會在整段連線期間佔用連線池。
+        """
 
+        reader = await self._reader(user_id)
+        try:
+            return await reader.poll_events_after(
+                job_id=job_id,
+                user_id=user_id,
+                created_after=created_after,
+                last_event_id=last_event_id,
+                limit=limit,
+            )
+        finally:
+            await reader.release()
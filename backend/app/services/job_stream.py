@@ -0,0 +1,119 @@
+﻿"""單一作業的 SSE 串流狀態：游標去重、分頁補齊與訂閱事件中心。"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator
+from uuid import UUID
+
+from app.models.tables import JobEvent
+from app.services.event_buffer import EventReplay
+from app.services.event_hub import (
+    EventFetcher,
+    HubEvent,
+    JobEventHub,
+    JobEventSubscription,
+    is_terminal_status,
+)
+
+
+class JobStream:
+    """記錄單一作業已送出的游標，供單一作業串流與多工串流共用。"""
+
+    def __init__(
+        self,
+        hub: JobEventHub,
+        job_id: UUID,
+        *,
+        fetch: EventFetcher,
+        created_after: datetime | None = None,
+        last_event_id: UUID | None = None,
+        queue: asyncio.Queue[HubEvent] | None = None,
+        replay: EventReplay | None = None,
+    ) -> None:
+        self.job_id = job_id
+        self.created_after = replay.cursor.created_at if replay else created_after
+        self.last_event_id = replay.cursor.id if replay else last_event_id
+        self.subscription: JobEventSubscription | None = None
+        self.ended = False
+        self.end_status: str | None = None
+        self._hub = hub
+        self._fetch = fetch
+        self._queue = queue
+        self._replay = replay
+
+    def accept(self, event: JobEvent) -> bool:
+        """事件位於游標之後則推進游標並回傳 True；已送出的事件回傳 False。"""
+
+        if self.created_after is not None:
+            if self.last_event_id is None:
+                if event.created_at <= self.created_after:
+                    return False
+            elif (event.created_at, event.id) <= (self.created_after, self.last_event_id):
+                return False
+        self.created_after = event.created_at
+        self.last_event_id = event.id
+        return True
+
+    async def catch_up(self) -> AsyncIterator[JobEvent]:
+        """分頁補齊游標後的事件，記憶體只保留一頁。
+
+        補齊後訂閱事件中心，再查一次補上訂閱前的空窗；作業已結束時不訂閱並設定 ended。
+        帶有 replay 時先送出緩衝中的事件；緩衝已含結束狀態或作業已有輪詢器時不再查詢資料庫。
+        """
+
+        if self._replay is not None:
+            replay, self._replay = self._replay, None
+            for event in replay.events:
+                if self.accept(event):
+                    yield event
+            if replay.ended:
+                self.ended = True
+                self.end_status = replay.status
+                return
+            if self._hub.covers(self.job_id, self.created_after, self.last_event_id):
+                self.subscription = self._subscribe(replay.status)
+                return
+
+        while True:
+            page = await self._fetch(self.created_after, self.last_event_id)
+            for event in page.events:
+                if self.accept(event):
+                    yield event
+            if page.has_more:
+                continue
+            if is_terminal_status(page.status):
+                self.ended = True
+                self.end_status = page.status
+                return
+            if self.subscription is not None:
+                return
+            self.subscription = self._subscribe(page.status)
+
+    def _subscribe(self, status: str | None) -> JobEventSubscription:
+        return self._hub.subscribe(
+            self.job_id,
+            fetch=self._fetch,
+            created_after=self.created_after,
+            last_event_id=self.last_event_id,
+            status=status,
+            queue=self._queue,
+        )
+
+    @property
+    def overflowed(self) -> bool:
+        """訂閱佇列曾經滿載而被事件中心移除。"""
+
+        return self.subscription is not None and self.subscription.overflowed
+
+    @property
+    def shared_polls(self) -> int:
+        """訂閱期間共用輪詢器的查詢次數；未訂閱時為 0。"""
+
+        return self.subscription.shared_polls if self.subscription is not None else 0
+
+    def close(self) -> None:
+        """取消訂閱；重複呼叫不會有副作用。"""
+
+        if self.subscription is not None:
+            self.subscription.close()
@@ -0,0 +1,191 @@
+﻿"""SSE 訊框編碼：以預先建立的 TypeAdapter 直接將事件轉成位元組，並快取已編碼訊框。"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Mapping, Optional
+from uuid import UUID
+
+from pydantic import TypeAdapter
+from typing_extensions import TypedDict
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.models.tables import JobEvent
+from app.services.event_bus import TransientJobEvent
+
+# HEARTBEAT_FRAME 為 SSE 註解訊框，僅用於維持連線
+HEARTBEAT_FRAME = b":keep-alive\n\n"
+
+
+class _EventData(TypedDict):
+    """SSE data 欄位內容，欄位與 JobEventResource 的輸出一致。"""
+
+    stage: str
+    message: Optional[str]
+    payload: Optional[Dict[str, Any]]
+    createdAt: datetime
+
+
+class _EndData(TypedDict):
+    """end 事件的 data 欄位內容。"""
+
+    status: Optional[str]
+    queriesSaved: int
+
+
+class _TaggedEventData(TypedDict):
+    """多工串流的 data 欄位，額外帶有作業 ID。"""
+
+    jobId: UUID
+    stage: str
+    message: Optional[str]
+    payload: Optional[Dict[str, Any]]
+    createdAt: datetime
+
+
+class _TaggedEndData(TypedDict):
+    """多工串流中單一作業結束時的 data 欄位。"""
+
+    jobId: UUID
+    status: Optional[str]
+
+
+# TypeAdapter 於匯入時建立一次，dump_json 直接由 pydantic-core 輸出 JSON 位元組，不需先建立模型
+_EVENT_DATA_ADAPTER = TypeAdapter(_EventData)
+_END_DATA_ADAPTER = TypeAdapter(_EndData)
+_TAGGED_EVENT_DATA_ADAPTER = TypeAdapter(_TaggedEventData)
+_TAGGED_END_DATA_ADAPTER = TypeAdapter(_TaggedEndData)
+
+# 複合 Last-Event-ID 中作業之間與作業、事件之間的分隔符號
+_COMPOSITE_ENTRY_SEPARATOR = ";"
+_COMPOSITE_PAIR_SEPARATOR = ":"
+
+
+def encode_event_frame(event: JobEvent | TransientJobEvent) -> bytes:
+    """將事件編碼為 SSE 訊框；即時進度事件不帶 id，避免成為續傳點。"""
+
+    data = _EVENT_DATA_ADAPTER.dump_json(
+        {
+            "stage": event.stage,
+            "message": event.message,
+            "payload": event.payload,
+            "createdAt": event.created_at,
+        }
+    )
+    head = f"event:{event.stage}\ndata:".encode("utf-8")
+    if isinstance(event, JobEvent):
+        head = f"id:{event.id}\n".encode("utf-8") + head
+    return head + data + b"\n\n"
+
+
+def encode_end_frame(status: str | None, queries_saved: int) -> bytes:
+    """作業結束時送出的 end 訊框，通知客戶端不必重連。"""
+
+    data = _END_DATA_ADAPTER.dump_json({"status": status, "queriesSaved": queries_saved})
+    return b"event:end\ndata:" + data + b"\n\n"
+
+
+def encode_tagged_event_frame(event: JobEvent | TransientJobEvent, frame_id: str | None) -> bytes:
+    """將事件編碼為多工串流訊框，data 帶有 jobId；frame_id 為 None 時不輸出 id。"""
+
+    data = _TAGGED_EVENT_DATA_ADAPTER.dump_json(
+        {
+            "jobId": event.job_id,
+            "stage": event.stage,
+            "message": event.message,
+            "payload": event.payload,
+            "createdAt": event.created_at,
+        }
+    )
+    head = f"event:{event.stage}\ndata:".encode("utf-8")
+    if frame_id is not None:
+        head = f"id:{frame_id}\n".encode("utf-8") + head
+    return head + data + b"\n\n"
+
+
+def encode_tagged_end_frame(job_id: UUID, status: str | None) -> bytes:
+    """多工串流中單一作業結束時的 end 訊框。"""
+
+    data = _TAGGED_END_DATA_ADAPTER.dump_json({"jobId": job_id, "status": status})
+    return b"event:end\ndata:" + data + b"\n\n"
+
+
+def encode_composite_event_id(cursors: Mapping[UUID, UUID]) -> str:
+    """將各作業最後送出的事件 ID 組成複合 Last-Event-ID：`jobId:eventId;jobId:eventId`。"""
+
+    return _COMPOSITE_ENTRY_SEPARATOR.join(
+        f"{job_id}{_COMPOSITE_PAIR_SEPARATOR}{event_id}" for job_id, event_id in cursors.items()
+    )
+
+
+def decode_composite_event_id(value: str) -> Dict[UUID, UUID]:
+    """解析複合 Last-Event-ID；格式錯誤時拋出 ValueError。"""
+
+    cursors: Dict[UUID, UUID] = {}
+    for entry in value.split(_COMPOSITE_ENTRY_SEPARATOR):
+        if not entry.strip():
+            continue
+        job_id, separator, event_id = entry.partition(_COMPOSITE_PAIR_SEPARATOR)
+        if not separator:
+            raise ValueError("Invalid composite event id")
+        cursors[UUID(job_id.strip())] = UUID(event_id.strip())
+    return cursors
+
+
+class SSEFrameCache:
+    """以事件 ID 為鍵的有界 LRU，同一事件對所有連線與續傳只編碼一次。
+
+    job_events 寫入後不會再修改，因此訊框可安全重用；即時進度事件沒有 id，不進快取。
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max(0, max_entries)
+        self._frames: OrderedDict[UUID, bytes] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, event: JobEvent | TransientJobEvent) -> bytes:
+        """取得事件訊框，快取命中時直接回傳已編碼的位元組。"""
+
+        if not isinstance(event, JobEvent) or self._max_entries == 0:
+            return encode_event_frame(event)
+
+        frame = self._frames.get(event.id)
+        if frame is not None:
+            self._frames.move_to_end(event.id)
+            self.hits += 1
+            return frame
+
+        self.misses += 1
+        frame = encode_event_frame(event)
+        self._frames[event.id] = frame
+        if len(self._frames) > self._max_entries:
+            self._frames.popitem(last=False)
+        return frame
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def clear(self) -> None:
+        """清空快取與統計。"""
+
+        self._frames.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict[str, int]:
+        """回傳快取大小與命中統計。"""
+
+        return {"entries": len(self._frames), "hits": self.hits, "misses": self.misses}
+
+
+# sse_frame_cache 為行程內共用的訊框快取
+sse_frame_cache = SSEFrameCache(settings.sse_frame_cache_size)
+metrics.register_collector("sse_frame_cache", sse_frame_cache.stats)
+
+
+def get_sse_frame_cache() -> SSEFrameCache:
+    """提供 FastAPI 依賴注入的 SSEFrameCache。"""
+
+    return sse_frame_cache
@@ -98,6 +98,30 @@ class StorageService:
             storage_object_path=object_path,
         )
 
+    def upload_object(self, object_path: str, data: bytes, *, content_type: str) -> None:
+        """上傳物件，已存在時覆寫。"""
+
+        storage = self._client.storage.from_(self._bucket)
+        try:
+            storage.upload(object_path, data, file_options={"content-type": content_type, "upsert": "true"})
+        except Exception as exc:  # noqa: B902 - 轉換外部例外為 HTTP 錯誤
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail={"error": {"code": "STORAGE_SERVICE_ERROR", "message": "無法上傳物件"}},
+            ) from exc
+
+    def download_object(self, object_path: str) -> bytes:
+        """下載物件內容。"""
+
+        storage = self._client.storage.from_(self._bucket)
+        try:
+            return storage.download(object_path)
+        except Exception as exc:  # noqa: B902 - 轉換外部例外為 HTTP 錯誤
+            raise HTTPException(
+                status_code=status.HTTP_502_BAD_GATEWAY,
+                detail={"error": {"code": "STORAGE_SERVICE_ERROR", "message": "無法下載物件"}},
+            ) from exc
+
     def _sanitize_file_name(self, file_name: str) -> str:
         """移除危險字元並保留檔名。"""
 
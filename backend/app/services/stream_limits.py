@@ -0,0 +1,136 @@
+﻿"""串流連線的准入控制與背壓：限制同時連線數，並中斷消化過慢的客戶端。"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict
+from uuid import UUID
+
+from loguru import logger
+from starlette.responses import StreamingResponse
+from starlette.types import Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import MetricsRegistry, metrics
+
+
+class StreamLimitExceededError(Exception):
+    """同時串流連線數已達上限，scope 為 user 或 process。"""
+
+    def __init__(self, *, scope: str, limit: int) -> None:
+        super().__init__("Stream limit reached")
+        self.scope = scope
+        self.limit = limit
+
+
+class StreamSlot:
+    """單一串流連線佔用的名額；release 可重複呼叫。"""
+
+    def __init__(self, limiter: "StreamLimiter", user_id: UUID) -> None:
+        self.user_id = user_id
+        self.dropped = False
+        self._limiter = limiter
+        self._released = False
+
+    def drop(self, reason: str) -> None:
+        """記錄因消費過慢而中斷的連線，同一連線只計一次。"""
+
+        if self.dropped:
+            return
+        self.dropped = True
+        self._limiter._record_drop(self.user_id, reason)
+
+    def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        self._limiter._release(self.user_id)
+
+
+class StreamLimiter:
+    """每個 API 行程內的串流名額，SSE、多工串流與 WebSocket 共用。"""
+
+    def __init__(self, *, max_per_user: int, max_total: int, registry: MetricsRegistry = metrics) -> None:
+        self._max_per_user = max_per_user
+        self._max_total = max_total
+        self._per_user: Dict[UUID, int] = {}
+        self._total = 0
+        self._active = registry.gauge("job_streams_active", "目前的作業串流連線數")
+        self._rejected = registry.counter("job_streams_rejected_total", "因名額已滿被拒絕的連線數")
+        self._dropped = registry.counter("job_streams_dropped_total", "因消費過慢被中斷的連線數")
+
+    def acquire(self, user_id: UUID) -> StreamSlot:
+        """取得串流名額；超過行程或使用者上限時拋出 StreamLimitExceededError。"""
+
+        if self._total >= self._max_total:
+            self._rejected.inc()
+            raise StreamLimitExceededError(scope="process", limit=self._max_total)
+        if self._per_user.get(user_id, 0) >= self._max_per_user:
+            self._rejected.inc()
+            raise StreamLimitExceededError(scope="user", limit=self._max_per_user)
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self._total += 1
+        self._active.inc()
+        return StreamSlot(self, user_id)
+
+    def _release(self, user_id: UUID) -> None:
+        remaining = self._per_user.get(user_id, 0) - 1
+        if remaining > 0:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+        self._total -= 1
+        self._active.dec()
+
+    def _record_drop(self, user_id: UUID, reason: str) -> None:
+        self._dropped.inc()
+        logger.warning("Dropped slow stream consumer user={} reason={}", user_id, reason)
+
+    def stats(self) -> dict[str, int]:
+        """回傳目前連線數與使用中的使用者數。"""
+
+        return {"active": self._total, "users": len(self._per_user)}
+
+
+class GuardedStreamingResponse(StreamingResponse):
+    """送出逾時即中斷連線的串流回應，結束時一律歸還串流名額。
+
+    ASGI 伺服器的傳送緩衝滿載時 send 會等待客戶端讀取，逾時代表客戶端消化過慢；
+    此時不再累積資料，直接結束回應，客戶端可以 Last-Event-ID 重連續傳。
+    """
+
+    def __init__(self, content: Any, *, slot: StreamSlot, send_timeout: float, **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self._slot = slot
+        self._send_timeout = send_timeout
+
+    async def stream_response(self, send: Send) -> None:
+        async def guarded_send(message: Message) -> None:
+            await asyncio.wait_for(send(message), timeout=self._send_timeout)
+
+        try:
+            await super().stream_response(guarded_send)
+        except asyncio.TimeoutError:
+            self._slot.drop("send_timeout")
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._slot.release()
+
+
+# stream_limiter 為行程內共用的串流名額
+stream_limiter = StreamLimiter(
+    max_per_user=settings.stream_max_per_user,
+    max_total=settings.stream_max_total,
+)
+metrics.register_collector("job_streams", stream_limiter.stats)
+
+
+def get_stream_limiter() -> StreamLimiter:
+    """提供 FastAPI 依賴注入的 StreamLimiter。"""
+
+    return stream_limiter
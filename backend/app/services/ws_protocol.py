@@ -0,0 +1,123 @@
+﻿"""作業事件 WebSocket 的 msgpack 訊框格式。
+
+伺服器訊框皆為 msgpack map，鍵名縮短以節省頻寬，UUID 以 16 bytes 二進位、時間以毫秒時間戳表示：
+
+- ``{"t": "e", "j": jobId, "i": eventId | nil, "s": stage, "m": message, "p": payload, "c": createdAtMs}`` 作業事件
+- ``{"t": "end", "j": jobId, "st": status}`` 作業結束
+- ``{"t": "sub", "j": jobId}`` 訂閱成功；``{"t": "err", "j": jobId | nil, "code": code}`` 錯誤
+- ``{"t": "pong"}`` 回應 ping
+
+客戶端訊框：``{"op": "sub", "jobs": [jobId], "after": {jobId: eventId}}``、``{"op": "unsub", "jobs": [jobId]}``、``{"op": "ping"}``；
+jobId 與 eventId 可為 16 bytes 或 UUID 字串。
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+from uuid import UUID
+
+import msgpack
+
+from app.models.tables import JobEvent
+from app.services.event_bus import TransientJobEvent
+
+OP_SUBSCRIBE = "sub"
+OP_UNSUBSCRIBE = "unsub"
+OP_PING = "ping"
+
+# 單一訊息可訂閱的作業數上限，避免一次觸發大量補齊查詢
+MAX_JOBS_PER_MESSAGE = 50
+# 單一連線同時訂閱的作業數上限
+MAX_SUBSCRIPTIONS = 50
+
+
+class ProtocolError(ValueError):
+    """客戶端訊框格式錯誤。"""
+
+
+@dataclass
+class ClientCommand:
+    """解析後的客戶端指令。"""
+
+    op: str
+    job_ids: List[UUID] = field(default_factory=list)
+    after: Dict[UUID, UUID] = field(default_factory=dict)
+
+
+def _to_uuid(value: Any) -> UUID:
+    if isinstance(value, (bytes, bytearray)) and len(value) == 16:
+        return UUID(bytes=bytes(value))
+    if isinstance(value, str):
+        return UUID(value)
+    raise ProtocolError("Invalid id")
+
+
+def decode_command(raw: bytes) -> ClientCommand:
+    """解析客戶端 msgpack 訊框；格式錯誤時拋出 ProtocolError。"""
+
+    try:
+        message = msgpack.unpackb(raw, raw=False)
+    except (msgpack.ExtraData, msgpack.FormatError, msgpack.StackError, ValueError) as exc:
+        raise ProtocolError("Invalid msgpack payload") from exc
+    if not isinstance(message, dict):
+        raise ProtocolError("Message must be a map")
+
+    op = message.get("op")
+    if op == OP_PING:
+        return ClientCommand(op=op)
+    if op not in (OP_SUBSCRIBE, OP_UNSUBSCRIBE):
+        raise ProtocolError("Unknown op")
+
+    raw_jobs = message.get("jobs") or []
+    raw_after = message.get("after") or {}
+    if not isinstance(raw_jobs, list) or not isinstance(raw_after, dict):
+        raise ProtocolError("Invalid jobs or after")
+    if len(raw_jobs) > MAX_JOBS_PER_MESSAGE:
+        raise ProtocolError("Too many jobs")
+    try:
+        job_ids = [_to_uuid(item) for item in raw_jobs]
+        after = {_to_uuid(key): _to_uuid(value) for key, value in raw_after.items()}
+    except ValueError as exc:
+        raise ProtocolError("Invalid id") from exc
+    return ClientCommand(op=op, job_ids=job_ids, after=after)
+
+
+def _pack(message: Dict[str, Any]) -> bytes:
+    return msgpack.packb(message, use_bin_type=True)
+
+
+def encode_event(event: JobEvent | TransientJobEvent) -> bytes:
+    """將事件編碼為 msgpack 訊框；即時進度事件的 i 為 nil，不可作為續傳點。"""
+
+    return _pack(
+        {
+            "t": "e",
+            "j": event.job_id.bytes,
+            "i": event.id.bytes if isinstance(event, JobEvent) else None,
+            "s": event.stage,
+            "m": event.message,
+            "p": event.payload,
+            "c": int(event.created_at.timestamp() * 1000),
+        }
+    )
+
+
+def encode_end(job_id: UUID, status: str | None) -> bytes:
+    """作業結束訊框。"""
+
+    return _pack({"t": "end", "j": job_id.bytes, "st": status})
+
+
+def encode_subscribed(job_id: UUID) -> bytes:
+    """訂閱成功訊框，之後會送出補齊事件。"""
+
+    return _pack({"t": "sub", "j": job_id.bytes})
+
+
+def encode_error(code: str, job_id: UUID | None = None) -> bytes:
+    """錯誤訊框。"""
+
+    return _pack({"t": "err", "j": job_id.bytes if job_id else None, "code": code})
+
+
+PONG_FRAME = _pack({"t": "pong"})
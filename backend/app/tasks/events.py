@@ -0,0 +1,160 @@
+﻿"""Worker 端作業事件發布：進度合併後走 Redis 匯流排，里程碑經 JobEventWriter 批次寫入 job_events。"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, List
+from uuid import UUID
+
+from redis import Redis
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.services.event_bus import PROGRESS_STAGE, TransientJobEvent, publish_transient_event
+from app.services.event_coalescer import ProgressCoalescer, progress_phase
+from app.services.event_writer import JobEventWriter
+
+
+def _persist_with_repository(rows: List[Dict[str, Any]]) -> None:
+    """以獨立 Session 批次寫入事件，大批次改用 COPY。"""
+
+    from app.core.database import engine
+    from app.repositories.jobs import JobRepository
+
+    with Session(engine) as session:
+        JobRepository(session).bulk_insert_events(rows, copy_threshold=settings.event_copy_threshold)
+
+
+def _update_status_with_repository(
+    job_id: UUID, status: str, progress: float | None, error_message: str | None
+) -> None:
+    """以獨立 Session 更新作業狀態。"""
+
+    from app.core.database import engine
+    from app.repositories.jobs import JobRepository
+
+    with Session(engine) as session:
+        JobRepository(session).update_job_status(
+            job_id=job_id, status=status, progress=progress, error_message=error_message
+        )
+
+
+StatusWriter = Callable[[UUID, str, float | None, str | None], None]
+
+
+class JobEventPublisher:
+    """Worker 行程共用的事件發布器。"""
+
+    def __init__(
+        self,
+        *,
+        redis_factory: Callable[[], Redis],
+        writer: JobEventWriter,
+        progress_window: float = 0.0,
+        status_writer: StatusWriter = _update_status_with_repository,
+    ) -> None:
+        self._redis_factory = redis_factory
+        self._redis: Redis | None = None
+        self._writer = writer
+        self._status_writer = status_writer
+        self._lock = threading.Lock()
+        self._progress: ProgressCoalescer[TransientJobEvent] = ProgressCoalescer(progress_window)
+
+    def _client(self) -> Redis:
+        if self._redis is None:
+            self._redis = self._redis_factory()
+        return self._redis
+
+    def publish_progress(
+        self,
+        job_id: UUID | str,
+        *,
+        progress: float,
+        message: str | None = None,
+        **payload: Any,
+    ) -> None:
+        """發布即時進度，不寫入資料庫；同一處理階段每個時間窗最多發布一筆，其餘合併為最新一筆。"""
+
+        event = TransientJobEvent(
+            job_id=UUID(str(job_id)),
+            stage=PROGRESS_STAGE,
+            message=message,
+            payload={"progress": progress, **payload},
+        )
+        with self._lock:
+            ready = self._progress.offer(event.job_id, event, progress_phase(event.stage, event.payload))
+        self._publish(ready)
+
+    def _publish(self, events: List[TransientJobEvent]) -> None:
+        for event in events:
+            publish_transient_event(self._client(), event)
+
+    def record_milestone(
+        self,
+        job_id: UUID | str,
+        *,
+        stage: str,
+        message: str | None = None,
+        payload: Dict[str, Any] | None = None,
+    ) -> None:
+        """暫存里程碑事件，由 JobEventWriter 依筆數或時間門檻寫入資料庫；created_at 於寫入時由資料庫決定。"""
+
+        job_uuid = UUID(str(job_id))
+        row = {
+            "job_id": job_uuid,
+            "stage": stage,
+            "message": message,
+            "payload": payload or {},
+        }
+        with self._lock:
+            # 里程碑即階段轉換，先送出合併中的進度，下一筆進度會立即發布
+            ready = self._progress.mark_transition(job_uuid)
+        self._publish(ready)
+        self._writer.add(row)
+
+    def flush(self) -> int:
+        """送出合併中的進度並寫入所有暫存事件，回傳寫入筆數；失敗時保留資料待下次重試。"""
+
+        with self._lock:
+            ready = self._progress.drain()
+        self._publish(ready)
+        return self._writer.flush()
+
+    def update_status(
+        self,
+        job_id: UUID | str,
+        *,
+        status: str,
+        progress: float | None = None,
+        error_message: str | None = None,
+    ) -> None:
+        """先寫入暫存的里程碑再更新作業狀態。
+
+        串流看到 completed、failed 即送出 end，因此終止狀態必須在所有里程碑寫入後才可見；
+        flush 失敗時例外上拋，不寫入狀態。
+        """
+
+        self.flush()
+        self._status_writer(UUID(str(job_id)), status, progress, error_message)
+
+    @property
+    def pending(self) -> int:
+        """尚未寫入的事件數量。"""
+
+        return self._writer.pending
+
+
+# job_event_writer 為 worker 行程共用的事件寫入器
+job_event_writer = JobEventWriter(
+    persist=_persist_with_repository,
+    batch_size=settings.event_milestone_batch_size,
+    max_delay=settings.event_flush_interval,
+)
+metrics.register_collector("job_event_writer", job_event_writer.stats)
+
+# job_event_publisher 供任務模組共用，於任務結束時統一 flush
+job_event_publisher = JobEventPublisher(
+    redis_factory=lambda: Redis.from_url(settings.redis_url),
+    writer=job_event_writer,
+    progress_window=settings.event_progress_window,
+)
@@ -7,6 +7,6 @@ from app.tasks.logging import emit_log
 def ensure_audio(job_id: str, source_uri: str | None, storage_path: str | None) -> dict[str, str | None]:
     """準備音訊檔（下載或確認上傳完成）。"""
 
-    emit_log("audio_ingest", f"準備音訊資源 job={job_id}")
+    emit_log("audio_ingest", f"準備音訊資源 job={job_id}", job_id=job_id)
     # TODO: 實作下載/檔案檢查邏輯
     return {"local_path": "path/to/audio.wav", "storage_path": storage_path}
@@ -5,8 +5,19 @@ from typing import Any
 
 from loguru import logger
 
+from app.tasks.events import job_event_publisher
 
-def emit_log(stage: str, message: str, **payload: Any) -> None:
-    """輸出任務相關日誌，便於追蹤。"""
+
+def emit_log(stage: str, message: str, *, job_id: str | None = None, **payload: Any) -> None:
+    """輸出任務相關日誌；帶入 job_id 時一併記錄為作業里程碑事件。"""
 
     logger.bind(stage=stage).info(message, **payload)
+    if job_id is not None:
+        job_event_publisher.record_milestone(job_id, stage=stage, message=message, payload=payload)
+
+
+def emit_progress(job_id: str, stage: str, progress: float, message: str | None = None) -> None:
+    """推播高頻進度，只經 Redis 匯流排送達 SSE，不寫入 job_events。"""
+
+    logger.bind(stage=stage).debug("progress {:.1f}% job={}", progress, job_id)
+    job_event_publisher.publish_progress(job_id, progress=progress, message=message, stage=stage)
@@ -0,0 +1,89 @@
+﻿"""定期維護任務邏輯。"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+from loguru import logger
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models.tables import JobEventArchive
+from app.repositories.event_partitions import add_months, month_start, partition_name
+from app.repositories.jobs import JobRepository
+from app.services.event_archive import JobEventArchiveStore
+
+
+def reconcile_job_counters() -> int:
+    """依實際作業數校正使用者作業計數，修正 trigger 以外途徑造成的偏差，回傳校正的使用者數。"""
+
+    from app.core.database import engine
+
+    with Session(engine) as session:
+        corrected = JobRepository(session).reconcile_job_counters()
+    if corrected:
+        logger.warning("Reconciled active job counters for {} users", corrected)
+    return corrected
+
+
+def ensure_job_event_partitions() -> int:
+    """預先建立本月起的事件月分區，避免寫入落在不存在的分區，回傳涵蓋的月份數。"""
+
+    from app.core.database import engine
+
+    with Session(engine) as session:
+        months = JobRepository(session).ensure_event_partitions(
+            start=month_start(datetime.now(timezone.utc)),
+            months=settings.job_event_partitions_ahead + 1,
+        )
+    return len(months)
+
+
+def archive_job_event_partitions() -> int:
+    """將超過保留期限的事件月分區匯出至 Storage 後刪除，回傳封存的分區數。"""
+
+    from app.core.database import engine
+    from app.services.event_archive import job_event_archive_store
+
+    with Session(engine) as session:
+        return archive_expired_partitions(
+            JobRepository(session), job_event_archive_store, now=datetime.now(timezone.utc)
+        )
+
+
+def archive_expired_partitions(repository: JobRepository, store: JobEventArchiveStore, *, now: datetime) -> int:
+    """封存早於保留期限的分區，回傳封存的分區數。
+
+    每個分區在單一交易內處理：先鎖定分區禁止寫入，逐一作業上傳壓縮檔，
+    再寫入 JobEventArchive 並卸載、刪除分區。分區內仍有未結束作業時略過，
+    待作業結束後的下一次排程再處理；中途失敗則整個交易 rollback，重跑時覆寫已上傳的檔案。
+    """
+
+    cutoff = add_months(month_start(now), -settings.job_event_retention_months)
+    archived = 0
+    for month in repository.list_event_partitions():
+        if month >= cutoff:
+            break
+        repository.lock_event_partition(month)
+        if repository.has_unfinished_jobs_in_partition(month):
+            repository.release_event_partition(month)
+            logger.info("Skipped archiving {}: partition has unfinished jobs", partition_name(month))
+            continue
+
+        archives = []
+        for job_id, user_id in repository.list_partition_jobs(month):
+            events = repository.list_partition_events(month, job_id=job_id)
+            object_path = store.write(user_id=user_id, job_id=job_id, month=month, events=events)
+            archives.append(
+                JobEventArchive(
+                    job_id=job_id,
+                    period_start=month,
+                    period_end=add_months(month, 1),
+                    storage_object_path=object_path,
+                    event_count=len(events),
+                    last_created_at=events[-1].created_at,
+                )
+            )
+        repository.archive_event_partition(month, archives)
+        archived += 1
+        logger.info("Archived {} for {} jobs", partition_name(month), len(archives))
+    return archived
@@ -25,3 +25,10 @@ def process_transcription_job(app: Celery, job_id: str, payload: dict[str, Any])
         "app.tasks.publish.publish_assets",
         args=(job_id, []),
     )
+
+
+def process_transcription_jobs(app: Celery, jobs: list[list[Any]]) -> None:
+    """展開批次建立的作業，逐筆啟動轉譜流程。"""
+
+    for job_id, payload in jobs:
+        process_transcription_job(app, job_id, payload)
@@ -3,19 +3,21 @@ from __future__ import annotations
 
 from typing import List
 
-from app.tasks.logging import emit_log
+from app.tasks.logging import emit_log, emit_progress
 
 
 def transcribe_tracks(job_id: str, instrument_modes: List[str], audio_path: str) -> list[dict[str, str]]:
     """依樂器清單執行轉譜，回傳各樂器的輸出。"""
 
-    emit_log("transcribe", f"開始轉譜 job={job_id}", instruments=instrument_modes)
+    emit_log("transcribe", f"開始轉譜 job={job_id}", job_id=job_id, instruments=instrument_modes)
     # TODO: 整合基本轉譜與 MIDI/MusicXML 生成
     outputs: list[dict[str, str]] = []
-    for instrument in instrument_modes:
+    total = len(instrument_modes)
+    for index, instrument in enumerate(instrument_modes, start=1):
         outputs.append({
             "instrument": instrument,
             "midi_path": f"/tmp/{job_id}_{instrument}.midi",
             "musicxml_path": f"/tmp/{job_id}_{instrument}.musicxml",
         })
+        emit_progress(job_id, "transcribe", index / total * 100, f"完成 {instrument} 轉譜")
     return outputs
@@ -4,9 +4,20 @@ from __future__ import annotations
 from typing import Any
 
 from celery import Celery
+from celery.signals import task_postrun, worker_shutdown
 from loguru import logger
 
-from app.tasks import ingest, orchestrator, process, publish
+from app.tasks import ingest, maintenance, orchestrator, process, publish
+from app.tasks.events import job_event_publisher
+
+
+def flush_job_events(**_: Any) -> None:
+    """任務結束或 worker 關閉時寫入暫存的里程碑事件。"""
+
+    try:
+        job_event_publisher.flush()
+    except Exception:  # noqa: BLE001 - 已於 publisher 記錄，避免影響任務結果
+        pass
 
 
 def register_tasks(celery: Celery) -> None:
@@ -15,6 +26,9 @@ def register_tasks(celery: Celery) -> None:
     celery.task(name="app.tasks.ingest.ensure_audio")(ingest.ensure_audio)
     celery.task(name="app.tasks.process.transcribe_tracks")(process.transcribe_tracks)
     celery.task(name="app.tasks.publish.publish_assets")(publish.publish_assets)
+    celery.task(name="app.tasks.maintenance.reconcile_job_counters")(maintenance.reconcile_job_counters)
+    celery.task(name="app.tasks.maintenance.ensure_job_event_partitions")(maintenance.ensure_job_event_partitions)
+    celery.task(name="app.tasks.maintenance.archive_job_event_partitions")(maintenance.archive_job_event_partitions)
 
     @celery.task(
         name="app.tasks.orchestrator.process_transcription_job",
@@ -25,4 +39,12 @@ def register_tasks(celery: Celery) -> None:
     def process_transcription_job_task(self, job_id: str, payload: dict[str, Any]) -> None:
         orchestrator.process_transcription_job(self.app, job_id, payload)
 
+    # 批次重試會重送已啟動的作業，因此不自動重試
+    @celery.task(name="app.tasks.orchestrator.process_transcription_jobs", bind=True)
+    def process_transcription_jobs_task(self, jobs: list[list[Any]]) -> None:
+        orchestrator.process_transcription_jobs(self.app, jobs)
+
+    task_postrun.connect(flush_job_events, weak=False)
+    worker_shutdown.connect(flush_job_events, weak=False)
+
     logger.debug("Registered Celery tasks: {}", list(celery.tasks.keys()))
@@ -0,0 +1,80 @@
+﻿"""比較同步與非同步資料庫路徑在事件迴圈內的並行吞吐量。
+
+用法（需可連線的 SUPABASE_URL）：
+
+    poetry run python -m benchmarks.bench_async_db --requests 200 --concurrency 20 --sleep 0.02
+
+每個模擬請求執行一次 ``SELECT pg_sleep(:sleep)``，代表一般慢查詢：
+- sync：沿用舊版寫法，在 ``async def`` 內直接呼叫同步 Session，查詢期間整個事件迴圈被阻塞。
+- async：使用 AsyncSession，等待資料庫時事件迴圈可處理其他請求。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlmodel import Session
+
+from app.core.database import async_engine, async_session_factory, engine
+
+QUERY = text("SELECT pg_sleep(:sleep)")
+
+
+async def sync_request(sleep: float) -> None:
+    """舊版端點：async 函式內執行同步查詢。"""
+
+    with Session(engine) as session:
+        session.exec(QUERY, params={"sleep": sleep})  # type: ignore[call-overload]
+
+
+async def async_request(sleep: float) -> None:
+    """新版端點：以 AsyncSession 等待查詢。"""
+
+    async with async_session_factory() as session:
+        await session.exec(QUERY, params={"sleep": sleep})  # type: ignore[call-overload]
+
+
+async def run(
+    handler: Callable[[float], Awaitable[None]],
+    *,
+    requests: int,
+    concurrency: int,
+    sleep: float,
+) -> float:
+    """以固定並行數送出請求並回傳每秒完成數。"""
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            await handler(sleep)
+
+    # 先暖機以建立連線池，避免首次連線時間影響結果
+    await asyncio.gather(*(handler(0) for _ in range(min(concurrency, 5))))
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="總請求數")
+    parser.add_argument("--concurrency", type=int, default=20, help="同時進行的請求數")
+    parser.add_argument("--sleep", type=float, default=0.02, help="每次查詢的模擬延遲秒數")
+    args = parser.parse_args()
+
+    sync_rps = await run(sync_request, requests=args.requests, concurrency=args.concurrency, sleep=args.sleep)
+    async_rps = await run(async_request, requests=args.requests, concurrency=args.concurrency, sleep=args.sleep)
+    await async_engine.dispose()
+    engine.dispose()
+
+    print(f"requests={args.requests} concurrency={args.concurrency} sleep={args.sleep}s")
+    print(f"sync session on event loop : {sync_rps:8.1f} req/s")
+    print(f"async session              : {async_rps:8.1f} req/s ({async_rps / sync_rps:.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
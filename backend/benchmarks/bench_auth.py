@@ -0,0 +1,123 @@
+﻿"""比較驗證依賴在有無已驗證 token 快取時的吞吐量。
+
+用法（不需連線資料庫，JWKS 以行程內替身提供）：
+
+    poetry run python -m benchmarks.bench_auth --requests 20000 --concurrency 100 --users 500
+
+模擬 --users 位使用者各持一個 token 反覆呼叫 ``require_current_user_id``：
+- cold：停用快取，每個請求都解析標頭並做一次 RS256 簽章驗證，驗證期間事件迴圈被佔用。
+- cached：啟用快取，每個 token 只驗證一次，之後以 SHA-256 查表取得使用者 ID。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, List
+from uuid import uuid4
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import Request
+from jose import jwt
+from jose.utils import base64url_encode
+
+os.environ.setdefault("SUPABASE_JWKS_URL", "https://bench.supabase.co/auth/v1/certs")
+
+from app.core import security  # noqa: E402
+
+AUDIENCE = "authenticated"
+ISSUER = "https://bench.supabase.co/auth/v1"
+
+
+class StaticJWKSProvider:
+    """固定回傳同一把公鑰，排除網路延遲只量測驗證本身。"""
+
+    def __init__(self, jwk: dict[str, Any]) -> None:
+        self._jwk = jwk
+
+    async def get_signing_key(self, kid: str) -> dict[str, Any]:
+        return self._jwk
+
+
+def build_key_material() -> tuple[str, dict[str, Any]]:
+    """產生 RSA 私鑰與對應 JWK。"""
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode()
+    numbers = private_key.public_key().public_numbers()
+    jwk = {
+        "kty": "RSA",
+        "kid": "bench-key",
+        "alg": "RS256",
+        "use": "sig",
+        "n": base64url_encode(numbers.n.to_bytes((numbers.n.bit_length() + 7) // 8, "big")).decode(),
+        "e": base64url_encode(numbers.e.to_bytes((numbers.e.bit_length() + 7) // 8, "big")).decode(),
+    }
+    return private_pem, jwk
+
+
+def build_requests(private_pem: str, users: int) -> List[Request]:
+    """每位使用者一個帶 Authorization 標頭的請求。"""
+
+    expires = datetime.now(timezone.utc) + timedelta(hours=1)
+    requests = []
+    for _ in range(users):
+        token = jwt.encode(
+            {"sub": str(uuid4()), "aud": AUDIENCE, "iss": ISSUER, "exp": expires},
+            private_pem,
+            algorithm="RS256",
+            headers={"kid": "bench-key"},
+        )
+        headers = [(b"authorization", f"Bearer {token}".encode())]
+        requests.append(Request({"type": "http", "method": "GET", "path": "/", "headers": headers}))
+    return requests
+
+
+async def run(requests: List[Request], *, total: int, concurrency: int) -> float:
+    """以固定並行數呼叫驗證依賴並回傳每秒完成數。"""
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index: int) -> None:
+        async with semaphore:
+            await security.require_current_user_id(requests[index % len(requests)])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(total)))
+    return total / (time.perf_counter() - started)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000, help="總請求數")
+    parser.add_argument("--concurrency", type=int, default=100, help="同時進行的請求數")
+    parser.add_argument("--users", type=int, default=500, help="不同 token 的數量")
+    args = parser.parse_args()
+
+    private_pem, jwk = build_key_material()
+    requests = build_requests(private_pem, args.users)
+    security._jwks_provider = StaticJWKSProvider(jwk)  # type: ignore[assignment]
+    security.settings.supabase_jwt_audience = AUDIENCE
+    security.settings.supabase_jwt_issuer = ISSUER
+
+    security._token_cache = security.VerifiedTokenCache(0)
+    cold_rps = await run(requests, total=args.requests, concurrency=args.concurrency)
+    security._token_cache = security.VerifiedTokenCache(args.users)
+    cached_rps = await run(requests, total=args.requests, concurrency=args.concurrency)
+    stats = security._token_cache.stats()
+
+    print(f"requests={args.requests} concurrency={args.concurrency} users={args.users}")
+    print(f"cold (verify every request) : {cold_rps:10.1f} req/s")
+    print(f"cached                      : {cached_rps:10.1f} req/s ({cached_rps / cold_rps:.1f}x)")
+    print(f"cache hits={stats['hits']} misses={stats['misses']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+﻿"""比較作業列表 offset 與 keyset 分頁，以及三種總筆數模式的查詢延遲。
+
+用法（需可連線的 SUPABASE_URL，且 --user-id 為 auth.users 內已存在的使用者）：
+
+    poetry run python -m benchmarks.bench_job_list --user-id <uuid> --rows 1000000 --depth 5000
+
+先以 ``generate_series`` 為該使用者寫入測試作業（model_profile 為 bench），結束後刪除，
+加上 ``--keep`` 可保留資料供重複執行。比較項目：
+- offset：以 ``OFFSET depth * limit`` 取得深層頁面，資料庫需掃過前面所有資料列。
+- keyset：以同一頁的 (created_at, id) 游標取得下一頁，只讀取該頁資料列。
+- total：exact、estimate、none 三種模式各自的單次查詢延遲。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable
+from uuid import UUID
+
+from sqlalchemy import text
+
+from app.core.database import async_engine, async_session_factory
+from app.core.pagination import KeysetCursor
+from app.repositories.jobs import TOTAL_ESTIMATE, TOTAL_EXACT, TOTAL_NONE, AsyncJobRepository
+
+SEED = text(
+    """
+    INSERT INTO transcription_jobs (
+        id, user_id, source_type, source_uri, instrument_modes, model_profile,
+        status, progress, created_at, updated_at
+    )
+    SELECT gen_random_uuid(), :user_id, 'youtube', 'https://youtu.be/bench', '["guitar"]'::jsonb, 'bench',
+           'completed', 100, now() - make_interval(secs => n), now() - make_interval(secs => n)
+    FROM generate_series(1, :rows) AS n
+    """
+)
+CLEANUP = text("DELETE FROM transcription_jobs WHERE user_id = :user_id AND model_profile = 'bench'")
+
+
+async def timed(query: Callable[[], Awaitable[object]], *, repeat: int) -> float:
+    """重複執行查詢並回傳延遲中位數（毫秒）。"""
+
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await query()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", type=UUID, required=True, help="寫入測試作業的使用者 ID")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="寫入的作業筆數")
+    parser.add_argument("--limit", type=int, default=20, help="每頁筆數")
+    parser.add_argument("--depth", type=int, default=5000, help="offset 模式的頁數深度")
+    parser.add_argument("--repeat", type=int, default=5, help="每項查詢的重複次數")
+    parser.add_argument("--keep", action="store_true", help="結束後保留測試資料")
+    args = parser.parse_args()
+
+    async with async_session_factory() as session:
+        await session.execute(SEED, {"user_id": args.user_id, "rows": args.rows})
+        await session.execute(text("ANALYZE transcription_jobs"))
+        await session.commit()
+
+    try:
+        async with async_session_factory() as session:
+            repository = AsyncJobRepository(session)
+            offset = args.depth * args.limit
+
+            # 取得 offset 頁面的最後一筆作為 keyset 游標，兩者讀取的是同一個下一頁
+            page, _ = await repository.list_jobs_page(
+                user_id=args.user_id, status=None, limit=args.limit, offset=offset, total=TOTAL_NONE
+            )
+            cursor = KeysetCursor(page[-1].created_at, page[-1].id)
+
+            offset_ms = await timed(
+                lambda: repository.list_jobs_page(
+                    user_id=args.user_id, status=None, limit=args.limit, offset=offset + args.limit, total=TOTAL_NONE
+                ),
+                repeat=args.repeat,
+            )
+            keyset_ms = await timed(
+                lambda: repository.list_jobs_page(
+                    user_id=args.user_id, status=None, limit=args.limit, before=cursor, total=TOTAL_NONE
+                ),
+                repeat=args.repeat,
+            )
+            totals = {
+                mode: await timed(
+                    lambda mode=mode: repository.list_jobs_page(
+                        user_id=args.user_id, status=None, limit=args.limit, total=mode
+                    ),
+                    repeat=args.repeat,
+                )
+                for mode in (TOTAL_EXACT, TOTAL_ESTIMATE, TOTAL_NONE)
+            }
+    finally:
+        if not args.keep:
+            async with async_session_factory() as session:
+                await session.execute(CLEANUP, {"user_id": args.user_id})
+                await session.commit()
+        await async_engine.dispose()
+
+    print(f"rows={args.rows} limit={args.limit} depth={args.depth} pages")
+    print(f"offset page  : {offset_ms:8.2f} ms")
+    print(f"keyset page  : {keyset_ms:8.2f} ms ({offset_ms / keyset_ms:.1f}x)")
+    for mode, elapsed in totals.items():
+        print(f"total={mode:<8}: {elapsed:8.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
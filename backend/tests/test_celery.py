@@ -17,6 +17,12 @@ def test_create_celery_app() -> None:
         "app.tasks.process.transcribe_tracks",
         "app.tasks.publish.publish_assets",
         "app.tasks.orchestrator.process_transcription_job",
+        "app.tasks.orchestrator.process_transcription_jobs",
+        "app.tasks.maintenance.reconcile_job_counters",
+        "app.tasks.maintenance.ensure_job_event_partitions",
+        "app.tasks.maintenance.archive_job_event_partitions",
     }
 
     assert expected_tasks.issubset(task_names)
+    scheduled = {entry["task"] for entry in celery.conf.beat_schedule.values()}
+    assert scheduled.issubset(task_names)
@@ -0,0 +1,81 @@
+﻿"""資料庫連線池設定與遙測測試。"""
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import Settings
+from app.core.db_pool import PoolTelemetry, engine_options, install_idle_ping, instrumented_pool_class
+from app.core.metrics import MetricsRegistry
+
+
+def _engine(telemetry: PoolTelemetry, **kwargs):
+    return create_engine(
+        "sqlite://",
+        poolclass=instrumented_pool_class(QueuePool, telemetry),
+        pool_size=1,
+        max_overflow=1,
+        pool_timeout=0.05,
+        **kwargs,
+    )
+
+
+def test_telemetry_records_usage_overflow_and_timeouts() -> None:
+    """超出 pool_size 時累計溢出，連線用盡時累計逾時，stats 反映使用中連線數。"""
+
+    registry = MetricsRegistry()
+    telemetry = PoolTelemetry("db_pool", registry=registry)
+    engine = _engine(telemetry)
+
+    first, second = engine.connect(), engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = telemetry.stats()
+    first.close()
+    second.close()
+
+    assert (stats["size"], stats["in_use"], stats["overflow"]) == (1, 2, 1)
+    assert stats["checkouts"] == 2
+    assert stats["wait_ms_max"] >= 40
+    counters = registry.snapshot()["counters"]
+    assert counters["db_pool_overflow_total"] == 1
+    assert counters["db_pool_timeouts_total"] == 1
+    assert telemetry.stats()["in_use"] == 0
+
+
+def test_idle_ping_replaces_dead_connections(monkeypatch: pytest.MonkeyPatch) -> None:
+    """閒置過久的連線取出前先 ping，失敗時由連線池換成新連線。"""
+
+    engine = _engine(PoolTelemetry("db_pool", registry=MetricsRegistry()))
+    install_idle_ping(engine, idle_seconds=0)
+    with engine.connect() as connection:
+        first = connection.connection.dbapi_connection
+
+    pings: list[object] = []
+
+    def failing_ping(dbapi_connection: object) -> bool:
+        pings.append(dbapi_connection)
+        raise RuntimeError("server closed the connection")
+
+    monkeypatch.setattr(engine.dialect, "do_ping", failing_ping)
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+        assert connection.connection.dbapi_connection is not first
+    assert pings == [first]
+
+
+def test_engine_options_follow_settings() -> None:
+    """交易模式連線池關閉 prepared statement，pre-ping 依策略設定。"""
+
+    telemetry = PoolTelemetry("db_pool", registry=MetricsRegistry())
+    config = Settings(db_pool_size=8, db_transaction_pooler=True, db_pool_pre_ping="always")
+    options = engine_options(config, telemetry=telemetry)
+
+    assert options["pool_size"] == 8
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"prepare_threshold": None}
+
+    default = engine_options(Settings(), telemetry=telemetry, asynchronous=True)
+    assert default["pool_pre_ping"] is False
+    assert "connect_args" not in default
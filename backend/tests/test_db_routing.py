@@ -0,0 +1,116 @@
+﻿"""讀取副本分流測試。"""
+from __future__ import annotations
+
+from typing import List
+from uuid import uuid4
+
+import pytest
+
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.db_routing import ReplicaRouter
+from app.core.metrics import MetricsRegistry
+from app.schemas.job import JobCreateRequest
+from app.services.job_service import AsyncJobService
+from tests.test_jobs import TEST_USER_ID, AsyncInMemoryJobRepository
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _router(lags: List[float | Exception], clock: FakeClock) -> ReplicaRouter:
+    async def probe() -> float:
+        lag = lags.pop(0)
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+    return ReplicaRouter(
+        probe=probe,
+        pin_seconds=5.0,
+        max_lag=1.0,
+        check_interval=10.0,
+        clock=clock,
+        registry=MetricsRegistry(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_router_pins_recent_writers_to_primary() -> None:
+    """寫入後的使用者在時間窗內讀主庫，其他使用者與時間窗結束後改讀副本。"""
+
+    clock = FakeClock()
+    router = _router([0.1], clock)
+    writer, reader = uuid4(), uuid4()
+
+    router.record_write(writer)
+    assert await router.use_replica(writer) is False
+    assert await router.use_replica(reader) is True
+
+    clock.now += 5.0
+    assert await router.use_replica(writer) is True
+    assert router.stats()["pinned_users"] == 0
+    assert (router.stats()["pinned_reads"], router.stats()["replica_reads"]) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_router_falls_back_when_replica_lags_or_fails() -> None:
+    """副本延遲超過上限或量測失敗時退回主庫，量測結果快取到下一次檢查。"""
+
+    clock = FakeClock()
+    router = _router([5.0, RuntimeError("replica down"), 0.2], clock)
+    user_id = uuid4()
+
+    assert await router.use_replica(user_id) is False
+    assert router.stats()["lag_ms"] == 5000
+
+    clock.now += 10.0
+    assert await router.use_replica(user_id) is False
+    assert router.stats()["lag_ms"] == -1
+
+    clock.now += 10.0
+    assert await router.use_replica(user_id) is True
+    assert await router.use_replica(user_id) is True
+    assert router.stats()["fallbacks"] == 2
+
+
+@pytest.mark.asyncio
+async def test_service_routes_reads_after_write_to_primary(monkeypatch: pytest.MonkeyPatch) -> None:
+    """建立作業後立即查詢會讀主庫，看得到剛寫入的作業；時間窗外的讀取改走副本。"""
+
+    monkeypatch.setattr(settings, "job_submission_active_limit", 3, raising=False)
+    monkeypatch.setattr(celery_app, "send_task", lambda *args, **kwargs: None)
+    clock = FakeClock()
+    primary, replica = AsyncInMemoryJobRepository(), AsyncInMemoryJobRepository()
+    service = AsyncJobService(primary, replica=replica, router=_router([0.0], clock))
+
+    payload = JobCreateRequest(source_type="youtube", youtube_url="https://youtu.be/replica", instrument_modes=["bass"])
+    job = await service.create_job(payload=payload, user_id=TEST_USER_ID)
+
+    assert await service.get_job(user_id=TEST_USER_ID, job_id=job.id) is job
+    clock.now += 5.0
+    assert await service.get_job(user_id=TEST_USER_ID, job_id=job.id) is None
+
+
+@pytest.mark.asyncio
+async def test_consistent_reads_keep_one_source(monkeypatch: pytest.MonkeyPatch) -> None:
+    """同一請求選定讀取來源後，即使寫入後的主庫時間窗結束，後續查詢仍讀同一來源。"""
+
+    monkeypatch.setattr(settings, "job_submission_active_limit", 3, raising=False)
+    monkeypatch.setattr(celery_app, "send_task", lambda *args, **kwargs: None)
+    clock = FakeClock()
+    primary, replica = AsyncInMemoryJobRepository(), AsyncInMemoryJobRepository()
+    service = AsyncJobService(primary, replica=replica, router=_router([0.0], clock))
+
+    payload = JobCreateRequest(source_type="youtube", youtube_url="https://youtu.be/replica", instrument_modes=["bass"])
+    job = await service.create_job(payload=payload, user_id=TEST_USER_ID)
+    reads = await service.consistent_reads(user_id=TEST_USER_ID)
+
+    clock.now += 5.0
+    assert await reads.get_job(user_id=TEST_USER_ID, job_id=job.id) is job
+    assert await service.get_job(user_id=TEST_USER_ID, job_id=job.id) is None
@@ -0,0 +1,301 @@
+﻿"""事件月分區與封存檔測試。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Sequence, Set, Tuple
+from uuid import UUID, uuid4
+
+import pytest
+
+from app.core.config import settings
+from app.core.pagination import KeysetCursor
+from app.models.tables import JobEvent, JobEventArchive
+from app.repositories.event_partitions import (
+    add_months,
+    create_partition_statement,
+    month_start,
+    parse_partition_name,
+    partition_name,
+)
+from app.services.event_archive import archive_object_path, decode_archive, encode_archive, events_after
+from app.services.job_service import AsyncJobService
+from app.tasks.maintenance import archive_expired_partitions
+
+USER_ID = UUID("00000000-0000-0000-0000-000000000123")
+
+
+def _event(job_id: UUID, created_at: datetime, stage: str = "progress") -> JobEvent:
+    event = JobEvent(job_id=job_id, stage=stage, message=None, payload={"percent": 10})
+    event.id = uuid4()
+    event.created_at = created_at
+    return event
+
+
+class FakeArchiveStore:
+    """以記憶體保存封存檔並記錄讀取的路徑；fail 為 True 時上傳失敗。"""
+
+    def __init__(self) -> None:
+        self.objects: Dict[str, bytes] = {}
+        self.reads: List[str] = []
+        self.fail = False
+
+    def write(self, *, user_id: UUID, job_id: UUID, month: datetime, events: Sequence[JobEvent]) -> str:
+        if self.fail:
+            raise RuntimeError("storage unavailable")
+        object_path = archive_object_path(user_id=user_id, job_id=job_id, month=month)
+        self.objects[object_path] = encode_archive(events)
+        return object_path
+
+    def read(self, object_path: str) -> List[JobEvent]:
+        self.reads.append(object_path)
+        return decode_archive(self.objects[object_path])
+
+
+class FakeRepository:
+    """只實作事件分頁所需方法的非同步儲存庫。"""
+
+    def __init__(self, job_id: UUID, live: List[JobEvent], archives: List[JobEventArchive]) -> None:
+        self.job_id = job_id
+        self.live = live
+        self.archives = archives
+        self.archive_queries = 0
+
+    async def list_event_archives(
+        self, *, job_id: UUID, user_id: UUID, created_after: datetime | None = None
+    ) -> List[JobEventArchive]:
+        self.archive_queries += 1
+        if job_id != self.job_id:
+            return []
+        return [item for item in self.archives if created_after is None or item.last_created_at >= created_after]
+
+    async def poll_events_after(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        created_after: datetime | None,
+        last_event_id: UUID | None,
+        limit: int | None = None,
+    ) -> Tuple[str | None, List[JobEvent]]:
+        if job_id != self.job_id:
+            return None, []
+        after = None if created_after is None else KeysetCursor(created_after, last_event_id)
+        events = events_after(self.live, after)
+        return "completed", events if limit is None else events[:limit]
+
+    async def poll_events_page(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        created_after: datetime | None,
+        last_event_id: UUID | None,
+        limit: int | None = None,
+    ) -> Tuple[str | None, bool, List[JobEvent]]:
+        job_status, events = await self.poll_events_after(
+            job_id=job_id, user_id=user_id, created_after=created_after, last_event_id=last_event_id, limit=limit
+        )
+        archived = job_id == self.job_id and any(
+            created_after is None or item.last_created_at >= created_after for item in self.archives
+        )
+        return job_status, archived, events
+
+
+def _archived_job() -> Tuple[UUID, List[JobEvent], FakeRepository, FakeArchiveStore]:
+    """建立兩個月已封存、本月仍在資料表中的作業事件。"""
+
+    job_id = uuid4()
+    start = datetime(2025, 6, 30, 23, 59, tzinfo=timezone.utc)
+    events = [_event(job_id, start + timedelta(minutes=index)) for index in range(9)]
+    store = FakeArchiveStore()
+    archives = []
+    for month, chunk in ((month_start(events[0].created_at), events[:1]), (month_start(events[1].created_at), events[1:5])):
+        path = archive_object_path(user_id=USER_ID, job_id=job_id, month=month)
+        store.objects[path] = encode_archive(chunk)
+        archives.append(
+            JobEventArchive(
+                job_id=job_id,
+                period_start=month,
+                period_end=add_months(month, 1),
+                storage_object_path=path,
+                event_count=len(chunk),
+                last_created_at=chunk[-1].created_at,
+            )
+        )
+    return job_id, events, FakeRepository(job_id, events[5:], archives), store
+
+
+def test_partition_names_and_bounds() -> None:
+    """分區以 UTC 月初命名，跨年時月份正確進位。"""
+
+    month = month_start(datetime(2025, 12, 31, 20, tzinfo=timezone(timedelta(hours=-8))))
+
+    assert month == datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert add_months(month, -1) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert partition_name(month) == "job_events_p202601"
+    assert parse_partition_name("job_events_p202601") == month
+    assert parse_partition_name("job_events_default") is None
+    assert "FROM ('2026-01-01T00:00:00+00:00') TO ('2026-02-01T00:00:00+00:00')" in str(create_partition_statement(month))
+
+
+def test_archive_round_trip_keeps_order_and_fields() -> None:
+    """封存檔壓縮後還原的事件與原始事件相同。"""
+
+    job_id = uuid4()
+    now = datetime(2025, 7, 1, tzinfo=timezone.utc)
+    events = [_event(job_id, now + timedelta(seconds=index)) for index in range(3)]
+
+    restored = decode_archive(encode_archive(events))
+
+    assert [(event.id, event.created_at, event.payload) for event in restored] == [
+        (event.id, event.created_at, event.payload) for event in events
+    ]
+    assert archive_object_path(user_id=USER_ID, job_id=job_id, month=now) == f"{USER_ID}/events/{job_id}/202507.jsonl.gz"
+
+
+@pytest.mark.asyncio
+async def test_events_page_continues_from_archive_into_table() -> None:
+    """分頁先讀封存檔，不足一頁時接續資料表，游標可跨越兩者。"""
+
+    job_id, events, repository, store = _archived_job()
+    service = AsyncJobService(repository, archive=store)  # type: ignore[arg-type]
+
+    first = await service.list_job_events(user_id=USER_ID, job_id=job_id, limit=3)
+    assert first is not None
+    page, has_more = first
+    assert page == events[:3] and has_more is True
+
+    cursor = KeysetCursor(page[-1].created_at, page[-1].id)
+    second = await service.list_job_events(user_id=USER_ID, job_id=job_id, limit=4, after=cursor)
+    assert second is not None
+    assert second[0] == events[3:7] and second[1] is True
+
+    cursor = KeysetCursor(events[6].created_at, events[6].id)
+    reads_before = len(store.reads)
+    third = await service.list_job_events(user_id=USER_ID, job_id=job_id, limit=4, after=cursor)
+    assert third == (events[7:], False)
+    # 游標已越過封存檔，不再下載
+    assert len(store.reads) == reads_before
+
+
+@pytest.mark.asyncio
+async def test_events_page_missing_job_returns_none() -> None:
+    """作業不存在且沒有封存檔時回傳 None。"""
+
+    _, _, repository, store = _archived_job()
+    service = AsyncJobService(repository, archive=store)  # type: ignore[arg-type]
+
+    assert await service.list_job_events(user_id=USER_ID, job_id=uuid4(), limit=3) is None
+
+
+@pytest.mark.asyncio
+async def test_events_page_skips_archive_lookup_without_archives() -> None:
+    """沒有封存檔或游標已越過封存檔時，只查詢一次資料表，不查詢封存清單。"""
+
+    job_id, events, repository, store = _archived_job()
+    service = AsyncJobService(repository, archive=store)  # type: ignore[arg-type]
+
+    cursor = KeysetCursor(events[6].created_at, events[6].id)
+    assert await service.list_job_events(user_id=USER_ID, job_id=job_id, limit=4, after=cursor) == (events[7:], False)
+    assert repository.archive_queries == 0
+
+    repository.archives = []
+    assert await service.list_job_events(user_id=USER_ID, job_id=job_id, limit=10) == (events[5:], False)
+    assert repository.archive_queries == 0
+
+
+class FakePartitionRepository:
+    """以記憶體表示事件月分區的同步儲存庫，記錄鎖定、放棄與封存的分區。"""
+
+    def __init__(self, partitions: Dict[datetime, Dict[UUID, List[JobEvent]]], unfinished: Set[datetime]) -> None:
+        self.partitions = partitions
+        self.unfinished = unfinished
+        self.locked: List[datetime] = []
+        self.released: List[datetime] = []
+        self.archived: Dict[datetime, List[JobEventArchive]] = {}
+
+    def list_event_partitions(self) -> List[datetime]:
+        return sorted(self.partitions)
+
+    def lock_event_partition(self, month: datetime) -> None:
+        self.locked.append(month)
+
+    def release_event_partition(self, month: datetime) -> None:
+        self.released.append(month)
+
+    def has_unfinished_jobs_in_partition(self, month: datetime) -> bool:
+        return month in self.unfinished
+
+    def list_partition_jobs(self, month: datetime) -> List[Tuple[UUID, UUID]]:
+        return [(job_id, USER_ID) for job_id in sorted(self.partitions[month])]
+
+    def list_partition_events(self, month: datetime, *, job_id: UUID) -> List[JobEvent]:
+        return self.partitions[month][job_id]
+
+    def archive_event_partition(self, month: datetime, archives: Sequence[JobEventArchive]) -> None:
+        self.archived[month] = list(archives)
+        del self.partitions[month]
+
+
+NOW = datetime(2025, 10, 15, tzinfo=timezone.utc)
+MAY, JUNE, JULY = (datetime(2025, month, 1, tzinfo=timezone.utc) for month in (5, 6, 7))
+
+
+def _partition(month: datetime, *counts: int) -> Dict[UUID, List[JobEvent]]:
+    """建立分區內各作業的事件，每個作業的事件數依 counts 指定。"""
+
+    return {
+        job_id: [_event(job_id, month + timedelta(hours=index)) for index in range(count)]
+        for job_id, count in ((uuid4(), count) for count in counts)
+    }
+
+
+def test_archive_skips_partition_with_unfinished_jobs(monkeypatch: pytest.MonkeyPatch) -> None:
+    """分區仍有未結束作業時放棄並解除鎖定，保留期限內的分區不處理。"""
+
+    monkeypatch.setattr(settings, "job_event_retention_months", 3)
+    repository = FakePartitionRepository({MAY: _partition(MAY, 2), JUNE: _partition(JUNE, 1), JULY: _partition(JULY, 1)}, {MAY})
+    store = FakeArchiveStore()
+
+    assert archive_expired_partitions(repository, store, now=NOW) == 1  # type: ignore[arg-type]
+
+    assert repository.locked == [MAY, JUNE]
+    assert repository.released == [MAY]
+    assert list(repository.archived) == [JUNE]
+    assert sorted(repository.partitions) == [MAY, JULY]
+    assert len(store.objects) == 1
+
+
+def test_archive_upload_failure_keeps_partition(monkeypatch: pytest.MonkeyPatch) -> None:
+    """上傳失敗時不寫入 JobEventArchive，分區保留待下次重跑。"""
+
+    monkeypatch.setattr(settings, "job_event_retention_months", 3)
+    repository = FakePartitionRepository({JUNE: _partition(JUNE, 2, 3)}, set())
+    store = FakeArchiveStore()
+    store.fail = True
+
+    with pytest.raises(RuntimeError):
+        archive_expired_partitions(repository, store, now=NOW)  # type: ignore[arg-type]
+
+    assert repository.archived == {}
+    assert list(repository.partitions) == [JUNE]
+
+
+def test_archive_rows_record_count_and_last_created_at(monkeypatch: pytest.MonkeyPatch) -> None:
+    """每個作業寫入一筆封存紀錄，記錄事件數、最後事件時間與分區範圍，封存檔可還原事件。"""
+
+    monkeypatch.setattr(settings, "job_event_retention_months", 3)
+    jobs = _partition(JUNE, 2, 3)
+    repository = FakePartitionRepository({JUNE: dict(jobs)}, set())
+    store = FakeArchiveStore()
+
+    assert archive_expired_partitions(repository, store, now=NOW) == 1  # type: ignore[arg-type]
+
+    rows = {row.job_id: row for row in repository.archived[JUNE]}
+    assert set(rows) == set(jobs)
+    for job_id, events in jobs.items():
+        row = rows[job_id]
+        assert (row.event_count, row.last_created_at) == (len(events), events[-1].created_at)
+        assert (row.period_start, row.period_end) == (JUNE, JULY)
+        assert row.storage_object_path == archive_object_path(user_id=USER_ID, job_id=job_id, month=JUNE)
+        assert [event.id for event in decode_archive(store.objects[row.storage_object_path])] == [event.id for event in events]
@@ -0,0 +1,92 @@
+﻿"""作業事件環形緩衝測試。"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import List
+from uuid import UUID, uuid4
+
+from app.core.pagination import KeysetCursor
+from app.models.tables import JobEvent
+from app.services.event_buffer import JobEventBuffer
+
+USER_ID = uuid4()
+
+
+def _build_events(job_id: UUID, count: int) -> List[JobEvent]:
+    base = datetime(2024, 5, 1, 12, 0, 0, tzinfo=timezone.utc)
+    events = []
+    for index in range(count):
+        event = JobEvent(job_id=job_id, stage=f"stage_{index}", message="", payload={"progress": index})
+        event.id = uuid4()
+        event.created_at = base + timedelta(seconds=index)
+        events.append(event)
+    return events
+
+
+def _cursor(event: JobEvent) -> KeysetCursor:
+    return KeysetCursor(event.created_at, event.id)
+
+
+def test_buffer_replays_gap_after_anchor() -> None:
+    """連續寫入的查詢結果可由任一錨點補齊，作業結束狀態一併保留。"""
+
+    buffer = JobEventBuffer(capacity=10, idle_seconds=60.0, max_bytes=1 << 20)
+    job_id = uuid4()
+    events = _build_events(job_id, 4)
+    buffer.record(job_id, user_id=USER_ID, after=None, events=events[:2], status="processing", has_more=False)
+    buffer.record(job_id, user_id=USER_ID, after=_cursor(events[1]), events=events[2:], status="completed", has_more=False)
+
+    replay = buffer.replay_after(job_id, events[0].id, user_id=USER_ID)
+    assert replay is not None
+    assert replay.cursor == _cursor(events[0])
+    assert replay.events == events[1:]
+    assert (replay.status, replay.ended) == ("completed", True)
+
+    assert buffer.replay_after(job_id, events[0].id, user_id=uuid4()) is None
+    assert buffer.stats()["hits"] == 1 and buffer.stats()["misses"] == 1
+
+
+def test_buffer_keeps_latest_events_within_capacity() -> None:
+    """超過容量時捨棄最舊事件；被捨棄事件的下一筆仍可由其游標續傳。"""
+
+    buffer = JobEventBuffer(capacity=3, idle_seconds=60.0, max_bytes=1 << 20)
+    job_id = uuid4()
+    events = _build_events(job_id, 5)
+    buffer.record(job_id, user_id=USER_ID, after=None, events=events, status="processing", has_more=False)
+
+    assert buffer.replay_after(job_id, events[0].id, user_id=USER_ID) is None
+    replay = buffer.replay_after(job_id, events[1].id, user_id=USER_ID)
+    assert replay is not None and replay.events == events[2:] and not replay.ended
+    assert buffer.stats()["events"] == 3
+
+
+def test_buffer_restarts_on_gap() -> None:
+    """查詢游標晚於緩衝尾端時捨棄舊內容，避免補齊時漏掉中間事件。"""
+
+    buffer = JobEventBuffer(capacity=10, idle_seconds=60.0, max_bytes=1 << 20)
+    job_id = uuid4()
+    events = _build_events(job_id, 5)
+    buffer.record(job_id, user_id=USER_ID, after=None, events=events[:2], status="processing", has_more=False)
+    buffer.record(job_id, user_id=USER_ID, after=_cursor(events[3]), events=events[4:], status="processing", has_more=False)
+
+    assert buffer.replay_after(job_id, events[0].id, user_id=USER_ID) is None
+    replay = buffer.replay_after(job_id, events[3].id, user_id=USER_ID)
+    assert replay is not None and replay.events == events[4:]
+
+
+def test_buffer_evicts_by_memory_budget_and_idle_time() -> None:
+    """總量超出預算時移除最久未使用的作業；閒置逾時的作業也會被移除。"""
+
+    job_a, job_b = uuid4(), uuid4()
+    events_a, events_b = _build_events(job_a, 2), _build_events(job_b, 2)
+
+    budget = JobEventBuffer(capacity=10, idle_seconds=60.0, max_bytes=1500)
+    budget.record(job_a, user_id=USER_ID, after=None, events=events_a, status="processing", has_more=False)
+    budget.record(job_b, user_id=USER_ID, after=None, events=events_b, status="processing", has_more=False)
+    assert budget.replay_after(job_a, events_a[0].id, user_id=USER_ID) is None
+    assert budget.replay_after(job_b, events_b[0].id, user_id=USER_ID) is not None
+
+    idle = JobEventBuffer(capacity=10, idle_seconds=0.0, max_bytes=1 << 20)
+    idle.record(job_a, user_id=USER_ID, after=None, events=events_a, status="processing", has_more=False)
+    idle.record(job_b, user_id=USER_ID, after=None, events=events_b, status="processing", has_more=False)
+    assert idle.stats()["jobs"] <= 1
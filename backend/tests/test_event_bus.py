@@ -0,0 +1,180 @@
+﻿"""Redis 事件匯流排與 worker 事件發布測試。"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List
+from uuid import UUID, uuid4
+
+import pytest
+
+from app.services.event_bus import RedisEventRelay, TransientJobEvent, job_channel
+from app.services.event_hub import EventPoll, JobEventHub
+from app.tasks import events as events_module
+from app.tasks import logging as logging_module
+from app.tasks.process import transcribe_tracks
+from app.core.metrics import MetricsRegistry
+from app.services.event_writer import JobEventWriter
+from app.tasks.events import PROGRESS_STAGE, JobEventPublisher
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+def _writer(persist: Any, *, batch_size: int = 10) -> JobEventWriter:
+    return JobEventWriter(persist=persist, batch_size=batch_size, max_delay=0, registry=MetricsRegistry())
+
+
+async def _noop_fetch(created_after: datetime | None, last_event_id: UUID | None) -> EventPoll:
+    return EventPoll(status="processing", events=[])
+
+
+def test_transient_event_roundtrip() -> None:
+    """匯流排訊息可正確序列化與還原。"""
+
+    event = TransientJobEvent(job_id=uuid4(), stage=PROGRESS_STAGE, message="50%", payload={"progress": 50.0})
+    restored = TransientJobEvent.from_json(event.to_json())
+    assert restored == event
+    assert TransientJobEvent.from_json("{}") is None
+    assert job_channel(event.job_id) == f"job-events:{event.job_id}"
+
+
+def test_publisher_batches_milestones() -> None:
+    """里程碑事件達到批次大小才寫入，flush 會寫入剩餘事件。"""
+
+    batches: List[List[Dict[str, Any]]] = []
+    server = fakeredis.FakeServer()
+    publisher = JobEventPublisher(
+        redis_factory=lambda: fakeredis.FakeRedis(server=server),
+        writer=_writer(batches.append, batch_size=2),
+    )
+    job_id = uuid4()
+
+    publisher.record_milestone(job_id, stage="audio_ingest")
+    assert batches == []
+    publisher.record_milestone(job_id, stage="transcribe")
+    assert [row["stage"] for row in batches[0]] == ["audio_ingest", "transcribe"]
+    # 暫存時不記錄時間，created_at 於寫入時由資料庫決定
+    assert all("created_at" not in row for row in batches[0])
+
+    publisher.record_milestone(job_id, stage="publish")
+    assert publisher.flush() == 1
+    assert publisher.pending == 0
+    assert len(batches) == 2
+
+
+def test_publisher_flushes_milestones_before_status() -> None:
+    """更新作業狀態前先寫入暫存的里程碑，寫入失敗時不更新狀態。"""
+
+    calls: List[str] = []
+    statuses: List[Any] = []
+
+    def persist(rows: List[Dict[str, Any]]) -> None:
+        calls.append("events")
+
+    def write_status(job_id: UUID, status: str, progress: float | None, error_message: str | None) -> None:
+        calls.append("status")
+        statuses.append((job_id, status, progress))
+
+    publisher = JobEventPublisher(
+        redis_factory=fakeredis.FakeRedis, writer=_writer(persist), status_writer=write_status
+    )
+    job_id = uuid4()
+    publisher.record_milestone(job_id, stage="publish")
+    publisher.update_status(job_id, status="completed", progress=100.0)
+
+    assert calls == ["events", "status"]
+    assert statuses == [(job_id, "completed", 100.0)]
+
+    def failing(rows: List[Dict[str, Any]]) -> None:
+        raise RuntimeError("db down")
+
+    publisher = JobEventPublisher(
+        redis_factory=fakeredis.FakeRedis, writer=_writer(failing), status_writer=write_status
+    )
+    publisher.record_milestone(job_id, stage="publish")
+    with pytest.raises(RuntimeError):
+        publisher.update_status(job_id, status="failed")
+    assert len(statuses) == 1
+
+
+def test_publisher_keeps_rows_when_persist_fails() -> None:
+    """寫入失敗時保留事件，等待下次 flush。"""
+
+    def failing(rows: List[Dict[str, Any]]) -> None:
+        raise RuntimeError("db down")
+
+    publisher = JobEventPublisher(redis_factory=fakeredis.FakeRedis, writer=_writer(failing))
+    publisher.record_milestone(uuid4(), stage="audio_ingest")
+    with pytest.raises(RuntimeError):
+        publisher.flush()
+    assert publisher.pending == 1
+
+
+def test_publisher_coalesces_progress(monkeypatch: pytest.MonkeyPatch) -> None:
+    """同一階段的高頻進度在時間窗內只發布一筆，里程碑與 flush 會送出合併中的最新進度。"""
+
+    published: List[TransientJobEvent] = []
+    monkeypatch.setattr(events_module, "publish_transient_event", lambda client, event: published.append(event))
+    publisher = JobEventPublisher(
+        redis_factory=fakeredis.FakeRedis,
+        writer=_writer(lambda rows: None),
+        progress_window=60.0,
+    )
+    job_id = uuid4()
+
+    for progress in (10.0, 20.0, 30.0):
+        publisher.publish_progress(job_id, progress=progress, stage="transcribe")
+    publisher.record_milestone(job_id, stage="publish")
+    publisher.publish_progress(job_id, progress=5.0, stage="publish")
+    publisher.publish_progress(job_id, progress=80.0, stage="publish")
+    publisher.flush()
+
+    assert [event.payload["progress"] for event in published] == [10.0, 30.0, 5.0, 80.0]
+
+
+def test_transcribe_tracks_publishes_progress(monkeypatch: pytest.MonkeyPatch) -> None:
+    """轉譜階段每完成一種樂器即發布一筆進度，最後一筆為 100%。"""
+
+    published: List[TransientJobEvent] = []
+    monkeypatch.setattr(events_module, "publish_transient_event", lambda client, event: published.append(event))
+    publisher = JobEventPublisher(
+        redis_factory=fakeredis.FakeRedis,
+        writer=_writer(lambda rows: None),
+        progress_window=60.0,
+    )
+    monkeypatch.setattr(logging_module, "job_event_publisher", publisher)
+    job_id = uuid4()
+
+    outputs = transcribe_tracks(str(job_id), ["guitar", "bass"], "/tmp/audio.wav")
+    publisher.flush()
+
+    assert [output["instrument"] for output in outputs] == ["guitar", "bass"]
+    assert [event.payload["progress"] for event in published] == [50.0, 100.0]
+    assert all(event.payload["stage"] == "transcribe" for event in published)
+
+
+@pytest.mark.asyncio
+async def test_relay_forwards_progress_to_subscribers() -> None:
+    """worker 發布的進度經 Redis 轉送給 SSE 訂閱者，且不觸發資料庫查詢。"""
+
+    server = fakeredis.FakeServer()
+    hub = JobEventHub(poll_interval=30.0, idle_seconds=0.05)
+    relay = RedisEventRelay(fakeredis.aioredis.FakeRedis(server=server))
+    await relay.start(hub)
+    publisher = JobEventPublisher(
+        redis_factory=lambda: fakeredis.FakeRedis(server=server),
+        writer=_writer(lambda rows: None),
+    )
+    job_id = uuid4()
+
+    with hub.subscribe(job_id, fetch=_noop_fetch, created_after=None, last_event_id=None) as subscription:
+        received: List[Any] = []
+        for _ in range(20):
+            publisher.publish_progress(job_id, progress=12.5, message="transcribing")
+            received = await subscription.next_batch(timeout=0.1)
+            if received:
+                break
+
+    assert received and isinstance(received[0], TransientJobEvent)
+    assert received[0].payload == {"progress": 12.5}
+    await hub.shutdown()
+    await relay.stop()
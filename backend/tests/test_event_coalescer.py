@@ -0,0 +1,60 @@
+﻿"""進度事件合併測試。"""
+from __future__ import annotations
+
+from uuid import uuid4
+
+from app.services.event_coalescer import ProgressCoalescer, progress_phase
+
+
+class FakeClock:
+    """可手動推進的時鐘。"""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_coalescer_limits_progress_per_window() -> None:
+    """時間窗內只放行第一筆進度，其餘保留最新一筆於時間窗結束後送出。"""
+
+    clock = FakeClock()
+    coalescer: ProgressCoalescer[str] = ProgressCoalescer(1.0, clock=clock)
+    job_id = uuid4()
+
+    assert coalescer.offer(job_id, "p10", "transcribe") == ["p10"]
+    clock.now = 0.2
+    assert coalescer.offer(job_id, "p20", "transcribe") == []
+    clock.now = 0.4
+    assert coalescer.offer(job_id, "p30", "transcribe") == []
+    assert coalescer.pending_delay(job_id) == 0.6
+    assert coalescer.take_due(job_id) == []
+
+    clock.now = 1.0
+    assert coalescer.take_due(job_id) == ["p30"]
+    assert coalescer.pending_delay(job_id) is None
+
+    clock.now = 2.5
+    assert coalescer.offer(job_id, "p40", "transcribe") == ["p40"]
+
+
+def test_coalescer_passes_transitions_immediately() -> None:
+    """非進度事件與處理階段改變立即放行，並先送出合併中的進度。"""
+
+    clock = FakeClock()
+    coalescer: ProgressCoalescer[str] = ProgressCoalescer(1.0, clock=clock)
+    job_id = uuid4()
+
+    coalescer.offer(job_id, "ingest-10", "audio_ingest")
+    coalescer.offer(job_id, "ingest-90", "audio_ingest")
+    assert coalescer.offer(job_id, "transcribe-0", "transcribe") == ["ingest-90", "transcribe-0"]
+    coalescer.offer(job_id, "transcribe-50", "transcribe")
+    assert coalescer.offer(job_id, "milestone", None) == ["transcribe-50", "milestone"]
+    assert coalescer.offer(job_id, "transcribe-60", "transcribe") == ["transcribe-60"]
+
+
+def test_progress_phase_reads_payload_stage() -> None:
+    assert progress_phase("progress", {"stage": "transcribe", "progress": 10}) == "transcribe"
+    assert progress_phase("progress", None) == ""
+    assert progress_phase("transcribe", {"stage": "transcribe"}) is None
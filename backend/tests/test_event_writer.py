@@ -0,0 +1,116 @@
+﻿"""JobEventWriter 批次寫入測試。"""
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List
+from uuid import uuid4
+
+import pytest
+
+from app.core.metrics import MetricsRegistry
+from app.repositories.jobs import _event_values, _stamp_insert_time
+from app.services.event_writer import JobEventWriter
+
+
+class ManualTimer:
+    """由測試手動觸發的計時器替身。"""
+
+    def __init__(self, interval: float, callback: Callable[[], None]) -> None:
+        self.interval = interval
+        self.callback = callback
+        self.started = False
+        self.cancelled = False
+
+    def start(self) -> None:
+        self.started = True
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+def _row(stage: str) -> Dict[str, Any]:
+    return {"job_id": uuid4(), "stage": stage, "message": None, "payload": {}}
+
+
+def test_writer_flushes_on_batch_size_and_reports_stats() -> None:
+    """達到批次大小時以單一批次寫入，並記錄批次大小與寫入次數。"""
+
+    batches: List[List[Dict[str, Any]]] = []
+    registry = MetricsRegistry()
+    writer = JobEventWriter(persist=batches.append, batch_size=3, max_delay=0, registry=registry)
+
+    for stage in ("a", "b", "c", "d"):
+        writer.add(_row(stage))
+
+    assert [[row["stage"] for row in batch] for batch in batches] == [["a", "b", "c"]]
+    assert writer.pending == 1
+    assert writer.flush() == 1
+    stats = writer.stats()
+    assert (stats["pending"], stats["last_batch"], stats["max_batch"]) == (0, 1, 3)
+    counters = registry.snapshot()["counters"]
+    assert counters["job_event_flushes_total"] == 2
+    assert counters["job_event_rows_written_total"] == 4
+
+
+def test_writer_flushes_after_max_delay() -> None:
+    """第一筆暫存後啟動計時器，到期時寫入；flush 後計時器取消。"""
+
+    timers: List[ManualTimer] = []
+    batches: List[List[Dict[str, Any]]] = []
+
+    def timer_factory(interval: float, callback: Callable[[], None]) -> ManualTimer:
+        timers.append(ManualTimer(interval, callback))
+        return timers[-1]
+
+    writer = JobEventWriter(
+        persist=batches.append,
+        batch_size=10,
+        max_delay=0.5,
+        registry=MetricsRegistry(),
+        timer_factory=timer_factory,  # type: ignore[arg-type]
+    )
+    writer.add(_row("a"))
+    writer.add(_row("b"))
+    assert len(timers) == 1 and timers[0].started and timers[0].interval == 0.5
+
+    timers[0].callback()
+    assert [len(batch) for batch in batches] == [2]
+    assert timers[0].cancelled
+
+    writer.add(_row("c"))
+    assert len(timers) == 2
+
+
+def test_writer_keeps_rows_when_persist_fails() -> None:
+    """寫入失敗時保留事件並累計失敗次數，計時器觸發的失敗不會拋出。"""
+
+    calls: List[int] = []
+
+    def failing(rows: List[Dict[str, Any]]) -> None:
+        calls.append(len(rows))
+        raise RuntimeError("db down")
+
+    registry = MetricsRegistry()
+    writer = JobEventWriter(persist=failing, batch_size=10, max_delay=0, registry=registry)
+    writer.add(_row("a"))
+    with pytest.raises(RuntimeError):
+        writer.flush()
+    writer._flush_on_timer()
+
+    assert writer.pending == 1
+    assert calls == [1, 1]
+    assert registry.snapshot()["counters"]["job_event_flush_failures_total"] == 2
+
+
+def test_flushed_rows_take_insert_time_in_buffer_order() -> None:
+    """寫入時以資料庫時間覆寫暫存時的 created_at，並依暫存順序遞增。"""
+
+    buffered_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = _event_values([{**_row(stage), "created_at": buffered_at} for stage in ("a", "b", "c")])
+    inserted_at = datetime(2025, 1, 1, 0, 0, 5, tzinfo=timezone.utc)
+
+    _stamp_insert_time(rows, inserted_at)
+
+    stamps = [row["created_at"] for row in rows]
+    assert stamps[0] == inserted_at
+    assert stamps == sorted(stamps) and len(set(stamps)) == 3
@@ -16,3 +16,17 @@ def test_read_health() -> None:
     assert response.status_code == 200
     assert body["status"] == "ok"
     assert body["service"]
+
+
+def test_read_metrics() -> None:
+    """指標端點輸出串流連線指標與各元件統計。"""
+
+    client = TestClient(create_app())
+
+    response = client.get("/v1/system/metrics")
+    body = response.json()
+
+    assert response.status_code == 200
+    assert "job_streams_active" in body["gauges"]
+    assert "job_streams_dropped_total" in body["counters"]
+    assert {"event_hub", "event_buffer", "sse_frame_cache", "job_streams"} <= set(body["components"])
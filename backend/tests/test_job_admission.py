@@ -0,0 +1,86 @@
+﻿"""作業名額計數的整合測試：並行送出不超過上限，狀態轉換與校正維持計數正確。
+
+需要已套用 Alembic 遷移的 Postgres，以 TEST_DATABASE_URL 指定連線字串；未設定時略過。
+每個測試建立獨立的使用者，結束時刪除使用者並串聯刪除其作業與計數。
+"""
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import Engine, text
+from sqlmodel import Session, create_engine
+
+from app.models.tables import JobStatus, SourceType, TranscriptionJob
+from app.repositories.jobs import JobRepository
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL 未設定")
+
+
+@pytest.fixture(scope="module")
+def engine() -> Iterator[Engine]:
+    engine = create_engine(DATABASE_URL or "", pool_size=10)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def user_id(engine: Engine) -> Iterator[UUID]:
+    user_id = uuid4()
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO auth.users (id) VALUES (:id)"), {"id": user_id})
+    yield user_id
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM auth.users WHERE id = :id"), {"id": user_id})
+
+
+def _new_job(user_id: UUID) -> TranscriptionJob:
+    return TranscriptionJob(user_id=user_id, source_type=SourceType.YOUTUBE, source_uri="https://youtu.be/demo")
+
+
+def _counter(engine: Engine, user_id: UUID) -> int:
+    with engine.connect() as connection:
+        return connection.execute(
+            text("SELECT active_jobs FROM user_job_counters WHERE user_id = :id"), {"id": user_id}
+        ).scalar_one()
+
+
+def test_parallel_submissions_respect_limit(engine: Engine, user_id: UUID) -> None:
+    """同一使用者並行送出時，建立的作業數恰好等於上限。"""
+
+    def submit(_: int) -> bool:
+        with Session(engine) as session:
+            job, _active = JobRepository(session).create_job_within_limit(_new_job(user_id), limit=3)
+            return job is not None
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        results = list(pool.map(submit, range(10)))
+
+    assert results.count(True) == 3
+    assert _counter(engine, user_id) == 3
+
+
+def test_status_transition_releases_slot_and_reconcile_fixes_drift(engine: Engine, user_id: UUID) -> None:
+    """作業離開高負載狀態時 trigger 歸還名額；計數偏差由校正修正。"""
+
+    with Session(engine) as session:
+        repository = JobRepository(session)
+        job, active = repository.create_job_within_limit(_new_job(user_id), limit=1)
+        assert job is not None and active == 1
+        assert repository.create_job_within_limit(_new_job(user_id), limit=1) == (None, 1)
+
+        job.status = JobStatus.COMPLETED
+        session.add(job)
+        session.commit()
+    assert _counter(engine, user_id) == 0
+
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE user_job_counters SET active_jobs = 5 WHERE user_id = :id"), {"id": user_id})
+    with Session(engine) as session:
+        assert JobRepository(session).reconcile_job_counters() >= 1
+    assert _counter(engine, user_id) == 0
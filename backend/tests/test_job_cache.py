@@ -0,0 +1,74 @@
+﻿"""已結束作業回應快取測試。"""
+from __future__ import annotations
+
+from uuid import uuid4
+
+from app.services.job_cache import FinishedJobCache
+
+
+def _cache(max_bytes: int = 10_000, max_entry_bytes: int = 5_000) -> FinishedJobCache:
+    cache = FinishedJobCache(max_bytes=max_bytes, max_entry_bytes=max_entry_bytes)
+    cache.set_invalidation_available(True)
+    return cache
+
+
+def test_cache_hits_only_for_same_user_and_variant() -> None:
+    """鍵包含使用者與查詢參數，其他使用者或其他頁不會命中。"""
+
+    cache = _cache()
+    user_id, job_id = uuid4(), uuid4()
+    cache.put(user_id, job_id, "assets", body=b'{"data":[]}', etag='"a"', token=cache.token())
+
+    cached = cache.get(user_id, job_id, "assets")
+    assert cached is not None and cached.body == b'{"data":[]}' and cached.etag == '"a"'
+    assert cache.get(uuid4(), job_id, "assets") is None
+    assert cache.get(user_id, job_id, ("events", 100, None)) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+
+def test_cache_evicts_least_recently_used_job_by_bytes() -> None:
+    """總量超過上限時移除最久未使用的作業，過大的本文不寫入。"""
+
+    cache = _cache(max_bytes=2_000, max_entry_bytes=1_000)
+    user_id = uuid4()
+    first, second, third = uuid4(), uuid4(), uuid4()
+    for job_id in (first, second):
+        cache.put(user_id, job_id, "assets", body=b"x" * 600, etag='"e"', token=cache.token())
+    assert cache.get(user_id, first, "assets") is not None
+
+    cache.put(user_id, third, "assets", body=b"x" * 600, etag='"e"', token=cache.token())
+    assert cache.get(user_id, second, "assets") is None
+    assert cache.get(user_id, first, "assets") is not None
+    assert cache.stats()["evictions"] == 1
+
+    cache.put(user_id, uuid4(), "assets", body=b"x" * 1_000, etag='"e"', token=cache.token())
+    assert cache.stats()["jobs"] == 2
+
+
+def test_invalidate_drops_job_and_rejects_stale_put() -> None:
+    """重新處理時清除作業快取；失效前取得的 token 不能再寫入舊內容。"""
+
+    cache = _cache()
+    user_id, job_id = uuid4(), uuid4()
+    cache.put(user_id, job_id, "assets", body=b"{}", etag='"a"', token=cache.token())
+
+    token = cache.token()
+    cache.invalidate(job_id)
+    assert cache.get(user_id, job_id, "assets") is None
+
+    cache.put(user_id, job_id, "assets", body=b"{}", etag='"a"', token=token)
+    assert cache.get(user_id, job_id, "assets") is None
+    assert cache.stats()["bytes"] == 0
+
+
+def test_cache_disabled_without_invalidation_source() -> None:
+    """無法收到失效通知時快取停用並清空。"""
+
+    cache = _cache()
+    user_id, job_id = uuid4(), uuid4()
+    cache.put(user_id, job_id, "assets", body=b"{}", etag='"a"', token=cache.token())
+
+    cache.set_invalidation_available(False)
+    assert cache.get(user_id, job_id, "assets") is None
+    cache.put(user_id, job_id, "assets", body=b"{}", etag='"a"', token=cache.token())
+    assert cache.stats()["jobs"] == 0
@@ -0,0 +1,92 @@
+﻿"""作業事件 WebSocket 與 msgpack 訊框測試。"""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Dict, List
+from uuid import UUID, uuid4
+
+import msgpack
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints.jobs import get_job_service_opener
+from app.core.security import require_websocket_user_id
+from app.main import app
+from app.services.event_hub import JobEventHub, get_event_hub
+from app.services.ws_protocol import ProtocolError, decode_command
+from tests.test_jobs import TEST_USER_ID, FakeJobService, _utc_now, build_event_model, build_job_model, open_fake_service
+
+
+def _unpack(raw: bytes) -> Dict[str, Any]:
+    return msgpack.unpackb(raw, raw=False)
+
+
+@pytest.fixture()
+def ws_client():
+    """建立帶有替身依賴的 TestClient，並提供設定作業資料的函式。"""
+
+    state: Dict[str, Any] = {"service": FakeJobService([])}
+    hub = JobEventHub(poll_interval=30.0, idle_seconds=0.05)
+    app.dependency_overrides[get_job_service_opener] = lambda: open_fake_service(state["service"])
+    app.dependency_overrides[require_websocket_user_id] = lambda: TEST_USER_ID
+    app.dependency_overrides[get_event_hub] = lambda: hub
+    try:
+        yield TestClient(app), state
+    finally:
+        app.dependency_overrides.pop(get_job_service_opener, None)
+        app.dependency_overrides.pop(require_websocket_user_id, None)
+        app.dependency_overrides.pop(get_event_hub, None)
+
+
+def test_websocket_subscribe_replays_and_ends(ws_client) -> None:
+    """訂閱已完成的作業時依序送出 sub、補齊事件（可由 after 續傳）與 end。"""
+
+    client, state = ws_client
+    job = build_job_model("completed")
+    base = _utc_now()
+    seen = build_event_model(job_id=job.id, stage="submitted", message="", payload=None, created_at=base)
+    missed = build_event_model(job_id=job.id, stage="completed", message="done", payload={"assets": 2}, created_at=base + timedelta(seconds=1))
+    state["service"] = FakeJobService([job], events={job.id: [seen, missed]})
+
+    with client.websocket_connect("/v1/jobs/ws") as websocket:
+        websocket.send_bytes(msgpack.packb({"op": "sub", "jobs": [job.id.bytes], "after": {str(job.id): str(seen.id)}}))
+        frames: List[Dict[str, Any]] = [_unpack(websocket.receive_bytes()) for _ in range(3)]
+
+    assert [frame["t"] for frame in frames] == ["sub", "e", "end"]
+    event = frames[1]
+    assert UUID(bytes=event["j"]) == job.id
+    assert UUID(bytes=event["i"]) == missed.id
+    assert (event["s"], event["m"], event["p"]) == ("completed", "done", {"assets": 2})
+    assert event["c"] == int(missed.created_at.timestamp() * 1000)
+    assert frames[2]["st"] == "completed"
+
+
+def test_websocket_reports_errors_and_pong(ws_client) -> None:
+    """未知作業、格式錯誤與 ping 皆以訊框回應，連線不中斷。"""
+
+    client, _ = ws_client
+    unknown = uuid4()
+
+    with client.websocket_connect("/v1/jobs/ws") as websocket:
+        websocket.send_bytes(msgpack.packb({"op": "sub", "jobs": [str(unknown)]}))
+        not_found = _unpack(websocket.receive_bytes())
+        websocket.send_bytes(b"\xc1")
+        invalid = _unpack(websocket.receive_bytes())
+        websocket.send_bytes(msgpack.packb({"op": "ping"}))
+        pong = _unpack(websocket.receive_bytes())
+
+    assert not_found == {"t": "err", "j": unknown.bytes, "code": "JOB_NOT_FOUND"}
+    assert invalid["code"] == "INVALID_MESSAGE"
+    assert pong == {"t": "pong"}
+
+
+def test_decode_command_validates_payload() -> None:
+    """指令需為 map 且 id 為 16 bytes 或 UUID 字串。"""
+
+    job_id = uuid4()
+    command = decode_command(msgpack.packb({"op": "unsub", "jobs": [job_id.bytes]}))
+    assert command.op == "unsub" and command.job_ids == [job_id]
+
+    for payload in ({"op": "drop"}, {"op": "sub", "jobs": ["nope"]}, [1, 2]):
+        with pytest.raises(ProtocolError):
+            decode_command(msgpack.packb(payload))
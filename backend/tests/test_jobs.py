@@ -1,6 +1,8 @@
-"""?? /v1/jobs ?? API?"""
+﻿"""?? /v1/jobs ?? API?"""
 from __future__ import annotations
 
+import asyncio
+import contextlib
 import json
 
 from datetime import datetime, timedelta, timezone
@@ -10,14 +12,31 @@ from uuid import UUID, uuid4
 from fastapi.testclient import TestClient
 import pytest
 
-from app.api.v1.endpoints.jobs import get_job_service
+from app.api.v1.endpoints import jobs as jobs_endpoint
+from app.api.v1.endpoints.jobs import _job_event_fetcher, get_job_service, get_job_service_opener, stream_active_jobs
 from app.core.celery_app import celery_app
+from app.core.conditional import format_http_date
 from app.core.config import settings
+from app.core.metrics import MetricsRegistry
+from app.core.pagination import KeysetCursor, decode_cursor, encode_cursor
 from app.core.security import require_current_user_id
 from app.main import app
-from app.models.tables import JobEvent, JobStatus, ScoreAsset, ScoreFormat, TranscriptionJob
+from app.models.tables import (
+    LIMITED_JOB_STATUSES,
+    TERMINAL_JOB_STATUSES,
+    JobEvent,
+    JobStatus,
+    ScoreAsset,
+    ScoreFormat,
+    TranscriptionJob,
+)
+from app.repositories.jobs import JobVersion, _split_detail_row
 from app.schemas.job import JobCreateRequest
-from app.services.job_service import JobService, JobSubmissionLockedError
+from app.services.event_buffer import JobEventBuffer, get_event_buffer
+from app.services.event_hub import JobEventHub
+from app.services.job_cache import FinishedJobCache, get_finished_job_cache
+from app.services.job_service import AsyncJobService, JobSubmissionLockedError
+from app.services.stream_limits import StreamLimiter, get_stream_limiter
 
 TEST_USER_ID = UUID("00000000-0000-0000-0000-000000000123")
 
@@ -41,16 +60,31 @@ class FakeJobService:
         self._assets: Dict[UUID, List[ScoreAsset]] = assets or {}
         self._events: Dict[UUID, List[JobEvent]] = events or {}
 
-    def list_job_events(self, *, user_id: UUID, job_id: UUID) -> List[JobEvent] | None:
-        """????????????"""
+    async def list_job_events(
+        self,
+        *,
+        user_id: UUID,
+        job_id: UUID,
+        limit: int | None = None,
+        after: KeysetCursor | None = None,
+    ) -> Tuple[List[JobEvent], bool] | None:
+        """依游標分頁列出事件，並回傳是否還有下一頁。"""
 
         job = self._jobs.get(job_id)
         if job is None or job.user_id != user_id:
             return None
-        events = self._events.get(job_id, [])
-        return sorted(events, key=lambda item: item.created_at)
+        events = await self.list_job_events_after(
+            user_id=user_id,
+            job_id=job_id,
+            created_after=after.created_at if after else None,
+            last_event_id=after.id if after else None,
+            limit=None if limit is None else limit + 1,
+        )
+        if limit is not None and len(events) > limit:
+            return events[:limit], True
+        return events, False
 
-    def get_job_event(self, *, user_id: UUID, job_id: UUID, event_id: UUID) -> JobEvent | None:
+    async def get_job_event(self, *, user_id: UUID, job_id: UUID, event_id: UUID) -> JobEvent | None:
         """? ID ?????????"""
 
         job = self._jobs.get(job_id)
@@ -61,13 +95,14 @@ class FakeJobService:
                 return event
         return None
 
-    def list_job_events_after(
+    async def list_job_events_after(
         self,
         *,
         user_id: UUID,
         job_id: UUID,
         created_after: datetime | None,
         last_event_id: UUID | None,
+        limit: int | None = None,
     ) -> List[JobEvent]:
         """???????????????"""
 
@@ -75,17 +110,38 @@ class FakeJobService:
         if job is None or job.user_id != user_id:
             return []
         events = sorted(self._events.get(job_id, []), key=lambda item: (item.created_at, item.id))
-        if created_after is None:
-            return events
         filtered: List[JobEvent] = []
         for event in events:
-            if event.created_at > created_after:
+            if created_after is None or event.created_at > created_after:
                 filtered.append(event)
             elif last_event_id is not None and event.created_at == created_after and event.id > last_event_id:
                 filtered.append(event)
-        return filtered
+        return filtered if limit is None else filtered[:limit]
+
+    async def poll_job_events(
+        self,
+        *,
+        user_id: UUID,
+        job_id: UUID,
+        created_after: datetime | None,
+        last_event_id: UUID | None,
+        limit: int | None = None,
+    ) -> Tuple[str | None, List[JobEvent]]:
+        """單次取得作業狀態與游標後的事件。"""
 
-    def create_job(self, *, payload: JobCreateRequest, user_id: UUID) -> TranscriptionJob:
+        job = await self.get_job(user_id=user_id, job_id=job_id)
+        if job is None:
+            return None, []
+        events = await self.list_job_events_after(
+            user_id=user_id,
+            job_id=job_id,
+            created_after=created_after,
+            last_event_id=last_event_id,
+            limit=limit,
+        )
+        return getattr(job.status, "value", job.status), events
+
+    async def create_job(self, *, payload: JobCreateRequest, user_id: UUID) -> TranscriptionJob:
         """????????????"""
 
         job = TranscriptionJob(
@@ -104,23 +160,48 @@ class FakeJobService:
         self._jobs[job.id] = job
         return job
 
-    def list_jobs(
+    async def create_jobs(self, *, payloads: List[JobCreateRequest], user_id: UUID) -> Tuple[List[TranscriptionJob], int]:
+        """依 job_submission_active_limit 依序建立可容納的作業。"""
+
+        active = sum(1 for job in self._jobs.values() if job.user_id == user_id and job.status in LIMITED_JOB_STATUSES)
+        granted = max(0, min(len(payloads), settings.job_submission_active_limit - active))
+        created = [await self.create_job(payload=payload, user_id=user_id) for payload in payloads[:granted]]
+        return created, active + granted
+
+    async def list_jobs(
         self,
         *,
         user_id: UUID,
         status: str | None = None,
         limit: int = 20,
         offset: int = 0,
-    ) -> Tuple[List[TranscriptionJob], int]:
-        """?????????????"""
+        after: KeysetCursor | None = None,
+        total: str = "exact",
+    ) -> Tuple[List[TranscriptionJob], int | None, bool]:
+        """依建立時間遞減分頁，帶 after 時以 keyset 取得下一頁。"""
 
         filtered = [job for job in self._jobs.values() if job.user_id == user_id]
         if status:
             filtered = [job for job in filtered if job.status == status]
-        sliced = filtered[offset : offset + limit]
-        return sliced, len(filtered)
+        filtered.sort(key=lambda job: (job.created_at, job.id), reverse=True)
+        if after is not None:
+            remaining = [job for job in filtered if KeysetCursor(job.created_at, job.id) < after]
+        else:
+            remaining = filtered[offset:]
+        sliced = remaining[:limit]
+        count = None if total == "none" else len(filtered)
+        return sliced, count, len(remaining) > limit
+
+    async def list_active_job_ids(self, *, user_id: UUID) -> List[UUID]:
+        """列出使用者未結束的作業 ID。"""
+
+        return [
+            job.id
+            for job in self._jobs.values()
+            if job.user_id == user_id and getattr(job.status, "value", job.status) not in TERMINAL_JOB_STATUSES
+        ]
 
-    def get_job(self, *, user_id: UUID, job_id: UUID) -> TranscriptionJob | None:
+    async def get_job(self, *, user_id: UUID, job_id: UUID) -> TranscriptionJob | None:
         """??????,?????????"""
 
         job = self._jobs.get(job_id)
@@ -128,15 +209,62 @@ class FakeJobService:
             return None
         return job
 
-    def list_job_assets(self, *, user_id: UUID, job_id: UUID) -> List[ScoreAsset] | None:
+    async def list_job_assets(self, *, user_id: UUID, job_id: UUID) -> List[ScoreAsset] | None:
         """????????,????????? None?"""
 
-        job = self.get_job(user_id=user_id, job_id=job_id)
+        job = await self.get_job(user_id=user_id, job_id=job_id)
         if job is None:
             return None
         assets = self._assets.get(job_id, [])
         return sorted(assets, key=lambda item: item.created_at)
 
+    async def get_job_detail(
+        self,
+        *,
+        user_id: UUID,
+        job_id: UUID,
+        include_assets: bool = False,
+        include_events: bool = False,
+        events_limit: int | None = None,
+    ) -> Tuple[TranscriptionJob, List[ScoreAsset] | None, Tuple[List[JobEvent], bool] | None] | None:
+        """組合作業與要求的內嵌資源。"""
+
+        job = await self.get_job(user_id=user_id, job_id=job_id)
+        if job is None:
+            return None
+        assets = await self.list_job_assets(user_id=user_id, job_id=job_id) if include_assets else None
+        events = await self.list_job_events(user_id=user_id, job_id=job_id, limit=events_limit) if include_events else None
+        return job, assets, events
+
+    from_primary = True
+
+    async def consistent_reads(self, *, user_id: UUID, primary: bool = False) -> "FakeJobService":
+        """記憶體替身只有一個資料來源。"""
+
+        return self
+
+    async def get_job_version(self, *, user_id: UUID, job_id: UUID) -> JobVersion | None:
+        """由記憶體資料組合作業版本。"""
+
+        job = await self.get_job(user_id=user_id, job_id=job_id)
+        if job is None:
+            return None
+        events = sorted(self._events.get(job_id, []), key=lambda item: (item.created_at, item.id))
+        assets = self._assets.get(job_id, [])
+        return JobVersion(
+            job.updated_at,
+            events[-1].created_at if events else None,
+            events[-1].id if events else None,
+            len(assets),
+            max((asset.created_at for asset in assets), default=None),
+            getattr(job.status, "value", job.status),
+        )
+
+    async def get_jobs_last_modified(self, *, user_id: UUID) -> datetime | None:
+        """使用者作業中最晚的 updated_at。"""
+
+        return max((job.updated_at for job in self._jobs.values() if job.user_id == user_id), default=None)
+
 
 class InMemoryJobRepository:
     """??????????,??????????"""
@@ -148,6 +276,23 @@ class InMemoryJobRepository:
     def count_jobs_by_statuses(self, *, user_id: UUID, statuses: List[str]) -> int:
         return sum(1 for job in self.jobs.values() if job.user_id == user_id and job.status in statuses)
 
+    def create_job_within_limit(self, job: TranscriptionJob, *, limit: int) -> Tuple[TranscriptionJob | None, int]:
+        active = self.count_jobs_by_statuses(user_id=job.user_id, statuses=sorted(LIMITED_JOB_STATUSES))
+        if active >= limit:
+            return None, active
+        return self.create_job(job), active + 1
+
+    def create_jobs_within_limit(
+        self, jobs: List[TranscriptionJob], *, events: List[Dict[str, Any]], limit: int
+    ) -> Tuple[List[TranscriptionJob], int]:
+        active = self.count_jobs_by_statuses(user_id=jobs[0].user_id, statuses=sorted(LIMITED_JOB_STATUSES))
+        admitted = [self.create_job(job) for job in jobs[: max(0, limit - active)]]
+        admitted_ids = {job.id for job in admitted}
+        for row in events:
+            if row["job_id"] in admitted_ids:
+                self.create_event(**row)
+        return admitted, active + len(admitted)
+
     def create_job(self, job: TranscriptionJob) -> TranscriptionJob:
         if job.id is None:
             job.id = uuid4()
@@ -191,6 +336,51 @@ class InMemoryJobRepository:
         return sorted(self.events.get(job_id, []), key=lambda item: item.created_at)
 
 
+
+class AsyncInMemoryJobRepository:
+    """以 InMemoryJobRepository 為底的非同步儲存庫，並記錄連線歸還次數。"""
+
+    def __init__(self) -> None:
+        self.inner = InMemoryJobRepository()
+        self.releases = 0
+
+    async def create_job_within_limit(self, job: TranscriptionJob, *, limit: int) -> Tuple[TranscriptionJob | None, int]:
+        return self.inner.create_job_within_limit(job, limit=limit)
+
+    async def create_jobs_within_limit(
+        self, jobs: List[TranscriptionJob], *, events: List[Dict[str, Any]], limit: int
+    ) -> Tuple[List[TranscriptionJob], int]:
+        return self.inner.create_jobs_within_limit(jobs, events=events, limit=limit)
+
+    async def create_job(self, job: TranscriptionJob) -> TranscriptionJob:
+        return self.inner.create_job(job)
+
+    async def create_event(self, **kwargs: Any) -> JobEvent:
+        return self.inner.create_event(**kwargs)
+
+    async def get_job(self, *, job_id: UUID, user_id: UUID) -> TranscriptionJob | None:
+        return self.inner.get_job(job_id=job_id, user_id=user_id)
+
+    async def poll_events_after(
+        self,
+        *,
+        job_id: UUID,
+        user_id: UUID,
+        created_after: datetime | None,
+        last_event_id: UUID | None,
+        limit: int | None = None,
+    ) -> Tuple[str | None, List[JobEvent]]:
+        job = self.inner.get_job(job_id=job_id, user_id=user_id)
+        if job is None:
+            return None, []
+        events = self.inner.list_events(job_id=job_id, user_id=user_id)
+        if created_after is not None:
+            events = [event for event in events if event.created_at > created_after]
+        return getattr(job.status, "value", job.status), events
+
+    async def release(self) -> None:
+        self.releases += 1
+
 def build_job_model(status: str) -> TranscriptionJob:
     """?????????????"""
 
@@ -255,7 +445,7 @@ def build_event_model(
     return event
 
 
-def override_job_service() -> JobService:
+def override_job_service() -> AsyncJobService:
     """????? FakeJobService?"""
 
     jobs = [
@@ -265,6 +455,16 @@ def override_job_service() -> JobService:
     return FakeJobService(jobs)  # type: ignore[return-value]
 
 
+def open_fake_service(service: "FakeJobService") -> Any:
+    """建立每次都提供同一個替身服務的 open_job_service 替身。"""
+
+    @contextlib.asynccontextmanager
+    async def open_service() -> Any:
+        yield service
+
+    return open_service
+
+
 def override_current_user() -> UUID:
     """????????? ID?"""
 
@@ -307,6 +507,38 @@ def test_list_jobs_filter_by_status() -> None:
         app.dependency_overrides.pop(require_current_user_id, None)
 
 
+def test_list_jobs_paginates_with_cursor() -> None:
+    """作業列表以 nextCursor 依建立時間遞減翻頁，並可選擇不計算總筆數。"""
+
+    base = _utc_now()
+    jobs = [build_job_model("completed") for _ in range(3)]
+    for index, job in enumerate(jobs):
+        job.created_at = base + timedelta(seconds=index)
+    service = FakeJobService(jobs)
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        first = client.get("/v1/jobs", params={"limit": 2}).json()
+        assert [item["id"] for item in first["data"]] == [str(jobs[2].id), str(jobs[1].id)]
+        assert first["total"] == 3 and first["totalEstimated"] is False
+        assert decode_cursor(first["nextCursor"]) == (jobs[1].created_at, jobs[1].id)
+
+        second = client.get("/v1/jobs", params={"limit": 2, "after": first["nextCursor"], "total": "none"}).json()
+        assert [item["id"] for item in second["data"]] == [str(jobs[0].id)]
+        assert second["total"] is None
+        assert second["nextCursor"] is None
+
+        invalid = client.get("/v1/jobs", params={"after": "not-a-cursor"})
+        assert invalid.status_code == 400
+        assert invalid.json()["error"]["code"] == "INVALID_CURSOR"
+        assert client.get("/v1/jobs", params={"total": "guess"}).status_code == 422
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
 def test_create_job_success() -> None:
     """?????????? pending ???"""
 
@@ -335,6 +567,35 @@ def test_create_job_success() -> None:
         app.dependency_overrides.pop(require_current_user_id, None)
 
 
+def test_create_jobs_batch_reports_each_item(monkeypatch: pytest.MonkeyPatch) -> None:
+    """批次建立逐筆回報 created、invalid 與超出名額的 rejected，超過筆數上限回傳 400。"""
+
+    monkeypatch.setattr(settings, "job_submission_active_limit", 1, raising=False)
+    service = FakeJobService([])
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        item = {"sourceType": "youtube", "youtubeUrl": "https://youtu.be/demo123", "instrumentModes": ["guitar"]}
+        response = client.post("/v1/jobs:batch", json={"jobs": [item, {"sourceType": "local"}, item]})
+        assert response.status_code == 200
+        results = response.json()["data"]
+        assert [result["status"] for result in results] == ["created", "invalid", "rejected"]
+        assert [result["index"] for result in results] == [0, 1, 2]
+        assert results[0]["job"]["sourceUri"] == "https://youtu.be/demo123"
+        assert results[1]["error"]["code"] == "INVALID_JOB"
+        assert results[2]["error"]["code"] == "JOB_SUBMISSION_LOCKED"
+
+        monkeypatch.setattr(settings, "job_batch_max_items", 2, raising=False)
+        too_large = client.post("/v1/jobs:batch", json={"jobs": [item] * 3})
+        assert too_large.status_code == 400
+        assert too_large.json()["error"]["code"] == "BATCH_TOO_LARGE"
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
 def test_retrieve_job_success() -> None:
     """????????????????"""
 
@@ -355,6 +616,218 @@ def test_retrieve_job_success() -> None:
         app.dependency_overrides.pop(require_current_user_id, None)
 
 
+def test_retrieve_job_returns_304_until_job_changes() -> None:
+    """帶回上次的 ETag 時回傳 304；作業更新或要求的內嵌資源不同時重新回傳內容。"""
+
+    job = build_job_model("processing")
+    service = FakeJobService([job])
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        first = client.get(f"/v1/jobs/{job.id}")
+        etag = first.headers["ETag"]
+        assert first.status_code == 200 and first.headers["Cache-Control"] == "private, no-cache"
+
+        cached = client.get(f"/v1/jobs/{job.id}", headers={"If-None-Match": etag})
+        assert cached.status_code == 304 and cached.content == b""
+        assert cached.headers["ETag"] == etag
+
+        assert client.get(f"/v1/jobs/{job.id}?include=events", headers={"If-None-Match": etag}).status_code == 200
+
+        job.updated_at = job.updated_at + timedelta(seconds=1)
+        changed = client.get(f"/v1/jobs/{job.id}", headers={"If-None-Match": etag})
+        assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
+def test_list_job_events_returns_304_until_new_event() -> None:
+    """沒有新事件時事件頁回傳 304，新增事件後回傳新內容。"""
+
+    job = build_job_model("processing")
+    base = _utc_now()
+    events = [build_event_model(job_id=job.id, stage="submitted", message="queued", payload=None, created_at=base)]
+    service = FakeJobService([job], events={job.id: events})
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        etag = client.get(f"/v1/jobs/{job.id}/events").headers["ETag"]
+        assert client.get(f"/v1/jobs/{job.id}/events", headers={"If-None-Match": f'W/{etag}'}).status_code == 304
+
+        events.append(
+            build_event_model(
+                job_id=job.id, stage="processing", message="start", payload=None, created_at=base + timedelta(seconds=1)
+            )
+        )
+        refreshed = client.get(f"/v1/jobs/{job.id}/events", headers={"If-None-Match": etag})
+        assert refreshed.status_code == 200
+        assert [item["stage"] for item in refreshed.json()["data"]] == ["submitted", "processing"]
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
+def test_finished_job_events_served_from_cache() -> None:
+    """已結束作業的事件頁放入快取後不再呼叫服務，失效後重新查詢。"""
+
+    job = build_job_model("completed")
+    event = build_event_model(job_id=job.id, stage="completed", message="done", payload=None, created_at=_utc_now())
+    service = FakeJobService([job], events={job.id: [event]})
+    cache = FinishedJobCache(max_bytes=1024 * 1024, max_entry_bytes=64 * 1024)
+    cache.set_invalidation_available(True)
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_finished_job_cache] = lambda: cache
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        first = client.get(f"/v1/jobs/{job.id}/events")
+        assert first.status_code == 200
+        assert first.json()["data"][0]["createdAt"]
+
+        # 移除服務端資料，命中快取時不會察覺
+        service._jobs.clear()
+        cached = client.get(f"/v1/jobs/{job.id}/events")
+        assert cached.status_code == 200 and cached.content == first.content
+        assert cached.headers["ETag"] == first.headers["ETag"]
+        assert client.get(f"/v1/jobs/{job.id}/events", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+        cache.invalidate(job.id)
+        assert client.get(f"/v1/jobs/{job.id}/events").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_finished_job_cache, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
+class ReplicaFakeJobService(FakeJobService):
+    """一般讀取走延遲副本、指定主庫時才讀主庫資料的替身。"""
+
+    def __init__(self, primary: FakeJobService, replica: FakeJobService) -> None:
+        super().__init__([])
+        self.primary = primary
+        self.replica = replica
+        replica.from_primary = False
+
+    async def consistent_reads(self, *, user_id: UUID, primary: bool = False) -> FakeJobService:
+        return self.primary if primary else self.replica
+
+
+def test_finished_job_cache_is_filled_from_primary() -> None:
+    """副本顯示作業已結束時改由主庫讀取，延遲副本的舊內容不會放入快取。"""
+
+    job = build_job_model("completed")
+    base = _utc_now()
+    submitted = build_event_model(job_id=job.id, stage="submitted", message="", payload=None, created_at=base)
+    completed = build_event_model(job_id=job.id, stage="completed", message="done", payload=None, created_at=base + timedelta(seconds=1))
+    service = ReplicaFakeJobService(
+        FakeJobService([job], events={job.id: [submitted, completed]}),
+        FakeJobService([job], events={job.id: [submitted]}),
+    )
+    cache = FinishedJobCache(max_bytes=1024 * 1024, max_entry_bytes=64 * 1024)
+    cache.set_invalidation_available(True)
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_finished_job_cache] = lambda: cache
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        response = client.get(f"/v1/jobs/{job.id}/events")
+        assert [item["stage"] for item in response.json()["data"]] == ["submitted", "completed"]
+        cached = cache.get(TEST_USER_ID, job.id, ("events", None, None))
+        assert cached is not None and cached.body == response.content
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_finished_job_cache, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
+def test_list_jobs_honours_if_modified_since() -> None:
+    """列表以最晚的 updated_at 作為 Last-Modified，未變動時回傳 304。"""
+
+    job = build_job_model("processing")
+    job.updated_at = _utc_now() - timedelta(seconds=5)
+    service = FakeJobService([job])
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        first = client.get("/v1/jobs")
+        last_modified = first.headers["Last-Modified"]
+        assert client.get("/v1/jobs", headers={"If-Modified-Since": last_modified}).status_code == 304
+        assert client.get("/v1/jobs", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+        job.updated_at = job.updated_at + timedelta(seconds=2)
+        assert client.get("/v1/jobs", headers={"If-Modified-Since": last_modified}).status_code == 200
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
+def test_list_jobs_same_second_update_is_not_cached() -> None:
+    """修改時間所在的秒尚未結束時不送出 Last-Modified，同一秒內的 If-Modified-Since 也不回傳 304。"""
+
+    job = build_job_model("processing")
+    job.updated_at = _utc_now()
+    service = FakeJobService([job])
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        first = client.get("/v1/jobs")
+        assert "Last-Modified" not in first.headers
+        assert "ETag" in first.headers
+
+        # 客戶端在同一秒內取得的日期與稍後同秒的修改捨去毫秒後相同
+        same_second = format_http_date(job.updated_at)
+        assert client.get("/v1/jobs", headers={"If-Modified-Since": same_second}).status_code == 200
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
+def test_retrieve_job_with_include() -> None:
+    """include=assets,events 時內嵌資產與事件；未要求的欄位不出現在回應中。"""
+
+    job = build_job_model("completed")
+    base = _utc_now()
+    asset = build_asset_model(
+        job_id=job.id, instrument="guitar", score_format=ScoreFormat.MIDI, created_at=base, storage_path="scores/a.mid"
+    )
+    event = build_event_model(job_id=job.id, stage="completed", message="done", payload=None, created_at=base)
+    service = FakeJobService([job], assets={job.id: [asset]}, events={job.id: [event]})
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        plain = client.get(f"/v1/jobs/{job.id}").json()
+        assert "assets" not in plain and "events" not in plain
+        assert "sourceUri" in plain
+
+        detail = client.get(f"/v1/jobs/{job.id}", params={"include": "assets,events"}).json()
+        assert [item["id"] for item in detail["assets"]] == [str(asset.id)]
+        assert [item["stage"] for item in detail["events"]] == ["completed"]
+        assert detail["eventsNextCursor"] is None
+
+        only_assets = client.get(f"/v1/jobs/{job.id}", params={"include": "assets"}).json()
+        assert "assets" in only_assets and "events" not in only_assets
+
+        invalid = client.get(f"/v1/jobs/{job.id}", params={"include": "assets,owner"})
+        assert invalid.status_code == 400
+        assert invalid.json()["error"]["code"] == "INVALID_INCLUDE"
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
 def test_retrieve_job_not_found() -> None:
     """?????????????? 404?"""
 
@@ -533,49 +1006,104 @@ def test_list_job_events_not_found() -> None:
         app.dependency_overrides.pop(require_current_user_id, None)
 
 
-def test_service_create_job_enqueues_task(monkeypatch: pytest.MonkeyPatch) -> None:
-    """????????????? Celery ???"""
 
-    repository = InMemoryJobRepository()
-    service = JobService(repository)
-    monkeypatch.setattr(settings, "job_submission_active_limit", 3, raising=False)
-    sent_tasks: list[tuple[Any, Any, Any]] = []
-    monkeypatch.setattr(
-        celery_app,
-        "send_task",
-        lambda name, args=(), kwargs=None: sent_tasks.append((name, args, kwargs)),
-    )
+def test_list_job_events_paginates_with_cursor() -> None:
+    """事件列表依 limit 分頁，並以 nextCursor 取得下一頁。"""
 
-    payload = JobCreateRequest(
-        source_type="local",
-        storage_object_path="user/audio/demo.wav",
-        youtube_url=None,
-        instrument_modes=["guitar"],
-        model_profile="balanced",
-        tempo_hint=None,
-        time_signature=None,
-    )
+    job = build_job_model("processing")
+    base = _utc_now()
+    events = [
+        build_event_model(job_id=job.id, stage=f"stage_{index}", message="", payload=None, created_at=base + timedelta(seconds=index))
+        for index in range(3)
+    ]
+    service = FakeJobService([job], events={job.id: events})
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        first = client.get(f"/v1/jobs/{job.id}/events", params={"limit": 2}).json()
+        assert [item["stage"] for item in first["data"]] == ["stage_0", "stage_1"]
+        assert decode_cursor(first["nextCursor"]) == (events[1].created_at, events[1].id)
+
+        second = client.get(f"/v1/jobs/{job.id}/events", params={"limit": 2, "after": first["nextCursor"]}).json()
+        assert [item["stage"] for item in second["data"]] == ["stage_2"]
+        assert second["nextCursor"] is None
+
+        # 未帶 limit 時與舊版相同回傳完整時間軸
+        full = client.get(f"/v1/jobs/{job.id}/events").json()
+        assert [item["stage"] for item in full["data"]] == ["stage_0", "stage_1", "stage_2"]
+        assert full["nextCursor"] is None
+
+        invalid = client.get(f"/v1/jobs/{job.id}/events", params={"after": "not-a-cursor"})
+        assert invalid.status_code == 400
+        assert invalid.json()["error"]["code"] == "INVALID_CURSOR"
+
+        # 不帶時區的偽造游標無法與資料庫時間比較，同樣回傳 400
+        naive = encode_cursor(datetime(2025, 1, 1), events[0].id)
+        forged = client.get(f"/v1/jobs/{job.id}/events", params={"after": naive})
+        assert forged.status_code == 400
+        assert forged.json()["error"]["code"] == "INVALID_CURSOR"
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
 
-    job = service.create_job(payload=payload, user_id=TEST_USER_ID)
 
-    assert job.status == JobStatus.PENDING
-    events = repository.list_events(job_id=job.id, user_id=TEST_USER_ID)
-    assert len(events) == 1
-    assert events[0].stage == "submitted"
-    assert sent_tasks and sent_tasks[0][0] == "app.tasks.orchestrator.process_transcription_job"
+def test_decode_cursor_rejects_naive_datetime() -> None:
+    """游標時間必須帶時區，否則拋出 ValueError。"""
 
+    item_id = uuid4()
+    aware = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(aware, item_id)) == (aware, item_id)
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(datetime(2025, 1, 1), item_id))
+
+
+def test_split_detail_row_restores_models() -> None:
+    """JSON 聚合欄位還原為模型，未要求的子資源維持 None。"""
+
+    job = build_job_model("completed")
+    asset_row = {
+        "id": str(uuid4()),
+        "job_id": str(job.id),
+        "instrument": "piano",
+        "format": "pdf",
+        "storage_object_path": "scores/a.pdf",
+        "duration_seconds": None,
+        "page_count": 3,
+        "created_at": "2024-05-01T12:00:00.123456+00:00",
+    }
+    detail = _split_detail_row((job, [asset_row], None, None))
+    assert detail is not None
+    _, assets, events, archived = detail
+    assert events is None and archived is False
+    assert assets is not None and assets[0].format == ScoreFormat.PDF
+    assert assets[0].created_at == datetime(2024, 5, 1, 12, 0, 0, 123456, tzinfo=timezone.utc)
+    assert _split_detail_row(None) is None
 
-def test_service_create_job_respects_active_limit(monkeypatch: pytest.MonkeyPatch) -> None:
-    """???????? JobSubmissionLockedError?"""
 
-    repository = InMemoryJobRepository()
-    service = JobService(repository)
+def test_cursor_roundtrip() -> None:
+    """游標編碼後可還原，格式錯誤時拋出 ValueError。"""
+
+    created_at = _utc_now()
+    event_id = uuid4()
+    assert decode_cursor(encode_cursor(created_at, event_id)) == KeysetCursor(created_at, event_id)
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(created_at, event_id)[:-4] + "!!!!")
+
+
+@pytest.mark.asyncio
+async def test_service_create_job_respects_active_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    """使用中作業達上限時拋出 JobSubmissionLockedError，不建立作業。"""
+
+    repository = AsyncInMemoryJobRepository()
+    service = AsyncJobService(repository)  # type: ignore[arg-type]
     monkeypatch.setattr(settings, "job_submission_active_limit", 1, raising=False)
     monkeypatch.setattr(celery_app, "send_task", lambda *args, **kwargs: None)
 
     existing = build_job_model("processing")
     existing.status = JobStatus.PROCESSING.value
-    repository.jobs[existing.id] = existing
+    repository.inner.jobs[existing.id] = existing
 
     payload = JobCreateRequest(
         source_type="youtube",
@@ -588,10 +1116,91 @@ def test_service_create_job_respects_active_limit(monkeypatch: pytest.MonkeyPatc
     )
 
     with pytest.raises(JobSubmissionLockedError) as exc:
-        service.create_job(payload=payload, user_id=TEST_USER_ID)
+        await service.create_job(payload=payload, user_id=TEST_USER_ID)
     assert exc.value.limit == 1
+    assert exc.value.active == 1
+    assert list(repository.inner.jobs) == [existing.id]
+
+
+@pytest.mark.asyncio
+async def test_service_create_jobs_dispatches_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """批次建立只寫入名額內的作業與 submitted 事件，並以單一訊息派送。"""
+
+    repository = AsyncInMemoryJobRepository()
+    service = AsyncJobService(repository)  # type: ignore[arg-type]
+    monkeypatch.setattr(settings, "job_submission_active_limit", 2, raising=False)
+    sent_tasks: list[tuple[Any, Any]] = []
+    monkeypatch.setattr(celery_app, "send_task", lambda name, args=(), kwargs=None: sent_tasks.append((name, args)))
+
+    payloads = [
+        JobCreateRequest(source_type="youtube", youtube_url=f"https://youtu.be/batch{index}", instrument_modes=["guitar"])
+        for index in range(3)
+    ]
+    created, active = await service.create_jobs(payloads=payloads, user_id=TEST_USER_ID)
+
+    assert [job.source_uri for job in created] == ["https://youtu.be/batch0", "https://youtu.be/batch1"]
+    assert active == 2
+    assert all(len(repository.inner.events[job.id]) == 1 for job in created)
+    assert len(sent_tasks) == 1
+    name, args = sent_tasks[0]
+    assert name == "app.tasks.orchestrator.process_transcription_jobs"
+    assert [job_id for job_id, _ in args[0]] == [str(job.id) for job in created]
 
 
+
+@pytest.mark.asyncio
+async def test_async_service_create_job_enqueues_task(monkeypatch: pytest.MonkeyPatch) -> None:
+    """非同步服務建立作業後寫入 submitted 事件並派送任務。"""
+
+    repository = AsyncInMemoryJobRepository()
+    service = AsyncJobService(repository)  # type: ignore[arg-type]
+    monkeypatch.setattr(settings, "job_submission_active_limit", 3, raising=False)
+    sent_tasks: list[str] = []
+    monkeypatch.setattr(celery_app, "send_task", lambda name, args=(), kwargs=None: sent_tasks.append(name))
+
+    payload = JobCreateRequest(
+        source_type="youtube",
+        storage_object_path=None,
+        youtube_url="https://youtu.be/demo",
+        instrument_modes=["guitar"],
+        model_profile=None,
+        tempo_hint=None,
+        time_signature=None,
+    )
+
+    job = await service.create_job(payload=payload, user_id=TEST_USER_ID)
+
+    assert job.source_uri == "https://youtu.be/demo"
+    assert [event.stage for event in repository.inner.list_events(job_id=job.id, user_id=TEST_USER_ID)] == ["submitted"]
+    assert sent_tasks == ["app.tasks.orchestrator.process_transcription_job"]
+
+
+@pytest.mark.asyncio
+async def test_async_service_poll_releases_connection() -> None:
+    """SSE 輪詢每次查詢後都歸還連線，長連線不會佔住連線池。"""
+
+    repository = AsyncInMemoryJobRepository()
+    service = AsyncJobService(repository)  # type: ignore[arg-type]
+    job = build_job_model("processing")
+    repository.inner.jobs[job.id] = job
+
+    job_status, events = await service.poll_job_events(
+        user_id=TEST_USER_ID,
+        job_id=job.id,
+        created_after=None,
+        last_event_id=None,
+    )
+    missing = await service.poll_job_events(
+        user_id=TEST_USER_ID,
+        job_id=uuid4(),
+        created_after=None,
+        last_event_id=None,
+    )
+
+    assert job_status == "processing" and events == []
+    assert missing == (None, [])
+    assert repository.releases == 2
+
 def test_stream_job_events_initial_payload() -> None:
     """?????????????????"""
 
@@ -612,6 +1221,7 @@ def test_stream_job_events_initial_payload() -> None:
     )
     service = FakeJobService([job], events={job.id: [later, earlier]})
     app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_job_service_opener] = lambda: open_fake_service(service)
     app.dependency_overrides[require_current_user_id] = override_current_user
     client = TestClient(app)
 
@@ -634,6 +1244,7 @@ def test_stream_job_events_initial_payload() -> None:
         assert data_entries and data_entries[0]["stage"] == "audio_ingest"
     finally:
         app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_job_service_opener, None)
         app.dependency_overrides.pop(require_current_user_id, None)
 
 
@@ -657,6 +1268,7 @@ def test_stream_job_events_with_last_event_header() -> None:
     )
     service = FakeJobService([job], events={job.id: [first, second]})
     app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_job_service_opener] = lambda: open_fake_service(service)
     app.dependency_overrides[require_current_user_id] = override_current_user
     client = TestClient(app)
 
@@ -676,6 +1288,7 @@ def test_stream_job_events_with_last_event_header() -> None:
         assert "audio_ingest" not in payload
     finally:
         app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_job_service_opener, None)
         app.dependency_overrides.pop(require_current_user_id, None)
 
 
@@ -685,6 +1298,7 @@ def test_stream_job_events_invalid_header() -> None:
     job = build_job_model("processing")
     service = FakeJobService([job])
     app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_job_service_opener] = lambda: open_fake_service(service)
     app.dependency_overrides[require_current_user_id] = override_current_user
     client = TestClient(app)
 
@@ -696,6 +1310,7 @@ def test_stream_job_events_invalid_header() -> None:
         assert body["error"]["message"] == "Last-Event-ID 必須為 UUID"
     finally:
         app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_job_service_opener, None)
         app.dependency_overrides.pop(require_current_user_id, None)
 
 
@@ -706,6 +1321,7 @@ def test_stream_job_events_job_not_found() -> None:
     job.user_id = UUID("00000000-0000-0000-0000-000000000999")
     service = FakeJobService([job])
     app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_job_service_opener] = lambda: open_fake_service(service)
     app.dependency_overrides[require_current_user_id] = override_current_user
     client = TestClient(app)
 
@@ -717,7 +1333,269 @@ def test_stream_job_events_job_not_found() -> None:
         assert body["error"]["message"] == "Job not found"
     finally:
         app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_job_service_opener, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
+def test_stream_job_events_ends_for_terminal_job() -> None:
+    """已完成的作業補齊事件後送出 end 事件並結束串流。"""
+
+    job = build_job_model("completed")
+    event = build_event_model(
+        job_id=job.id,
+        stage="completed",
+        message="done",
+        created_at=_utc_now(),
+        payload={},
+    )
+    service = FakeJobService([job], events={job.id: [event]})
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_job_service_opener] = lambda: open_fake_service(service)
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        response = client.get(f"/v1/jobs/{job.id}/stream")
+        assert response.status_code == 200
+        blocks = [block for block in response.text.strip().split("\n\n") if block]
+        assert blocks[0].startswith(f"id:{event.id}")
+        assert blocks[-1].startswith("event:end")
+        end_payload = json.loads(blocks[-1].splitlines()[1].removeprefix("data:"))
+        assert end_payload["status"] == "completed"
+        assert end_payload["queriesSaved"] >= 0
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_job_service_opener, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
+def test_stream_job_events_pages_catch_up(monkeypatch: pytest.MonkeyPatch) -> None:
+    """補齊歷史事件時依頁大小分批查詢，事件依序且不重複。"""
+
+    monkeypatch.setattr(settings, "event_page_size", 2)
+    job = build_job_model("completed")
+    base = _utc_now()
+    events = [
+        build_event_model(job_id=job.id, stage=f"stage_{index}", message="", payload=None, created_at=base + timedelta(seconds=index))
+        for index in range(5)
+    ]
+    service = FakeJobService([job], events={job.id: events})
+    limits: List[int | None] = []
+    original_poll = service.poll_job_events
+
+    async def recording_poll(**kwargs: Any) -> Tuple[str | None, List[JobEvent]]:
+        limits.append(kwargs.get("limit"))
+        return await original_poll(**kwargs)
+
+    service.poll_job_events = recording_poll  # type: ignore[method-assign]
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_job_service_opener] = lambda: open_fake_service(service)
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    client = TestClient(app)
+
+    try:
+        response = client.get(f"/v1/jobs/{job.id}/stream")
+        blocks = [block for block in response.text.strip().split("\n\n") if block]
+        assert [block.splitlines()[0] for block in blocks[:-1]] == [f"id:{event.id}" for event in events]
+        assert blocks[-1].startswith("event:end")
+        assert limits == [3, 3, 3]
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_job_service_opener, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+
+
+def test_stream_job_events_resumes_from_buffer() -> None:
+    """重連時錨點仍在事件緩衝內，直接由記憶體補齊，不再查詢事件。"""
+
+    job = build_job_model("completed")
+    base = _utc_now()
+    events = [
+        build_event_model(job_id=job.id, stage=f"stage_{index}", message="", payload=None, created_at=base + timedelta(seconds=index))
+        for index in range(3)
+    ]
+    service = FakeJobService([job], events={job.id: events})
+    buffer = JobEventBuffer(capacity=10, idle_seconds=60.0, max_bytes=1 << 20)
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_job_service_opener] = lambda: open_fake_service(service)
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    app.dependency_overrides[get_event_buffer] = lambda: buffer
+    client = TestClient(app)
+
+    try:
+        client.get(f"/v1/jobs/{job.id}/stream")
+        calls: List[str] = []
+
+        async def fail_get_event(**kwargs: Any) -> JobEvent | None:
+            calls.append("get_job_event")
+            return None
+
+        async def fail_poll(**kwargs: Any) -> Tuple[str | None, List[JobEvent]]:
+            calls.append("poll_job_events")
+            return "completed", []
+
+        service.get_job_event = fail_get_event  # type: ignore[method-assign]
+        service.poll_job_events = fail_poll  # type: ignore[method-assign]
+        response = client.get(f"/v1/jobs/{job.id}/stream", headers={"Last-Event-ID": str(events[0].id)})
+        blocks = [block for block in response.text.strip().split("\n\n") if block]
+        assert [block.splitlines()[0] for block in blocks[:-1]] == [f"id:{event.id}" for event in events[1:]]
+        assert blocks[-1].startswith("event:end")
+        assert calls == []
+        assert buffer.stats()["hits"] == 1
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_job_service_opener, None)
+        app.dependency_overrides.pop(require_current_user_id, None)
+        app.dependency_overrides.pop(get_event_buffer, None)
+
+
+def test_stream_job_events_rejects_over_limit() -> None:
+    """串流名額已滿時回傳 503 與 Retry-After。"""
+
+    job = build_job_model("processing")
+    service = FakeJobService([job])
+    limiter = StreamLimiter(max_per_user=1, max_total=10, registry=MetricsRegistry())
+    held = limiter.acquire(TEST_USER_ID)
+    app.dependency_overrides[get_job_service] = lambda: service  # type: ignore[return-value]
+    app.dependency_overrides[get_job_service_opener] = lambda: open_fake_service(service)
+    app.dependency_overrides[require_current_user_id] = override_current_user
+    app.dependency_overrides[get_stream_limiter] = lambda: limiter
+    client = TestClient(app)
+
+    try:
+        response = client.get(f"/v1/jobs/{job.id}/stream")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(settings.stream_retry_after_seconds)
+        assert response.json()["error"]["code"] == "STREAM_LIMIT_REACHED"
+    finally:
+        held.release()
+        app.dependency_overrides.pop(get_job_service, None)
+        app.dependency_overrides.pop(get_job_service_opener, None)
         app.dependency_overrides.pop(require_current_user_id, None)
+        app.dependency_overrides.pop(get_stream_limiter, None)
+
+
+class DisconnectingRequest:
+    """在指定次數的連線檢查後回報斷線的 Request 替身。"""
+
+    def __init__(self, checks_before_disconnect: int) -> None:
+        self.remaining = checks_before_disconnect
+
+    async def is_disconnected(self) -> bool:
+        self.remaining -= 1
+        return self.remaining < 0
+
+
+def _parse_frames(chunks: List[bytes]) -> List[Dict[str, str]]:
+    frames = []
+    for chunk in chunks:
+        for block in chunk.decode("utf-8").split("\n\n"):
+            if block and not block.startswith(":"):
+                frames.append(dict(line.split(":", 1) for line in block.splitlines()))
+    return frames
 
 
+@pytest.mark.asyncio
+async def test_multiplexed_stream_tags_frames_and_picks_up_new_jobs(monkeypatch: pytest.MonkeyPatch) -> None:
+    """多工串流以 jobId 標示事件，連線期間新建立的作業也會加入。"""
 
+    monkeypatch.setattr(jobs_endpoint, "DISCONNECT_CHECK_INTERVAL", 0.01)
+    hub = JobEventHub(poll_interval=30.0, idle_seconds=0.05)
+    first_job = build_job_model("processing")
+    done_job = build_job_model("completed")
+    first_event = build_event_model(job_id=first_job.id, stage="submitted", message="", payload=None, created_at=_utc_now())
+    service = FakeJobService([first_job, done_job], events={first_job.id: [first_event]})
+
+    response = await stream_active_jobs(
+        request=DisconnectingRequest(3),  # type: ignore[arg-type]
+        service=service,  # type: ignore[arg-type]
+        open_service=open_fake_service(service),  # type: ignore[arg-type]
+        user_id=TEST_USER_ID,
+        hub=hub,
+        buffer=JobEventBuffer(capacity=10, idle_seconds=60.0, max_bytes=1 << 20),
+        limiter=StreamLimiter(max_per_user=5, max_total=10, registry=MetricsRegistry()),
+        last_event_id=None,
+    )
+    chunks: List[bytes] = []
+    async for chunk in response.body_iterator:
+        chunks.append(chunk)
+        if len(chunks) == 1:
+            second_job = build_job_model("pending")
+            second_event = build_event_model(job_id=second_job.id, stage="submitted", message="", payload=None, created_at=_utc_now())
+            service._jobs[second_job.id] = second_job
+            service._events[second_job.id] = [second_event]
+            hub.notify_user(TEST_USER_ID)
+
+    frames = _parse_frames(chunks)
+    assert [json.loads(frame["data"])["jobId"] for frame in frames] == [str(first_job.id), str(second_job.id)]
+    assert frames[0]["id"] == f"{first_job.id}:{first_event.id}"
+    assert frames[1]["id"] == f"{first_job.id}:{first_event.id};{second_job.id}:{second_event.id}"
+    await hub.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_multiplexed_stream_resumes_from_composite_id(monkeypatch: pytest.MonkeyPatch) -> None:
+    """複合 Last-Event-ID 續傳時補齊斷線期間的事件，已結束的作業送出 end。"""
+
+    monkeypatch.setattr(jobs_endpoint, "DISCONNECT_CHECK_INTERVAL", 0.01)
+    hub = JobEventHub(poll_interval=30.0, idle_seconds=0.05)
+    job = build_job_model("completed")
+    base = _utc_now()
+    seen = build_event_model(job_id=job.id, stage="submitted", message="", payload=None, created_at=base)
+    missed = build_event_model(job_id=job.id, stage="completed", message="", payload=None, created_at=base + timedelta(seconds=1))
+    service = FakeJobService([job], events={job.id: [seen, missed]})
+
+    response = await stream_active_jobs(
+        request=DisconnectingRequest(2),  # type: ignore[arg-type]
+        service=service,  # type: ignore[arg-type]
+        open_service=open_fake_service(service),  # type: ignore[arg-type]
+        user_id=TEST_USER_ID,
+        hub=hub,
+        buffer=JobEventBuffer(capacity=10, idle_seconds=60.0, max_bytes=1 << 20),
+        limiter=StreamLimiter(max_per_user=5, max_total=10, registry=MetricsRegistry()),
+        last_event_id=f"{job.id}:{seen.id}",
+    )
+    frames = _parse_frames([chunk async for chunk in response.body_iterator])
+
+    assert [frame["event"] for frame in frames] == ["completed", "end"]
+    assert json.loads(frames[1]["data"]) == {"jobId": str(job.id), "status": "completed"}
+
+    invalid = await stream_active_jobs(
+        request=DisconnectingRequest(0),  # type: ignore[arg-type]
+        service=service,  # type: ignore[arg-type]
+        open_service=open_fake_service(service),  # type: ignore[arg-type]
+        user_id=TEST_USER_ID,
+        hub=hub,
+        buffer=JobEventBuffer(capacity=10, idle_seconds=60.0, max_bytes=1 << 20),
+        limiter=StreamLimiter(max_per_user=5, max_total=10, registry=MetricsRegistry()),
+        last_event_id=f"{job.id}:{uuid4()}",
+    )
+    assert invalid.status_code == 400
+    await hub.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_event_fetchers_open_own_service_per_poll() -> None:
+    """不同作業的輪詢並行查詢時，每次查詢各自開啟並關閉服務，不共用請求的 Session。"""
+
+    jobs = [build_job_model("processing") for _ in range(2)]
+    opened: List[FakeJobService] = []
+    closed: List[FakeJobService] = []
+
+    @contextlib.asynccontextmanager
+    async def open_service() -> Any:
+        service = FakeJobService(jobs)
+        opened.append(service)
+        try:
+            await asyncio.sleep(0)
+            yield service
+        finally:
+            closed.append(service)
+
+    buffer = JobEventBuffer(capacity=10, idle_seconds=60.0, max_bytes=1 << 20)
+    fetchers = [_job_event_fetcher(open_service, buffer, user_id=TEST_USER_ID, job_id=job.id) for job in jobs]
+    polls = await asyncio.gather(*(fetch(None, None) for fetch in fetchers))
+
+    assert [poll.status for poll in polls] == ["processing", "processing"]
+    assert len(opened) == 2 and opened[0] is not opened[1]
+    assert sorted(map(id, closed)) == sorted(map(id, opened))
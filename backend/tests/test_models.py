@@ -14,6 +14,7 @@ def test_tables_and_columns_defined() -> None:
         "profiles",
         "transcription_jobs",
         "job_events",
+        "job_event_archives",
         "score_assets",
         "processing_metrics",
         "presets",
@@ -33,6 +34,7 @@ def test_tables_and_columns_defined() -> None:
             "updated_at",
         },
         "job_events": {"id", "job_id", "stage", "payload", "created_at"},
+        "job_event_archives": {"job_id", "period_start", "storage_object_path", "last_created_at"},
         "score_assets": {"id", "job_id", "instrument", "format", "storage_object_path"},
         "processing_metrics": {"id", "job_id", "latency_ms", "created_at"},
         "presets": {"id", "user_id", "name", "visibility", "instrument_modes"},
@@ -47,3 +49,8 @@ def test_tables_and_columns_defined() -> None:
         constraint.name for constraint in table_map["score_assets"].constraints if constraint.name
     }
     assert "uq_score_assets_job_instrument_format" in score_assets_constraints
+
+    # job_events 依 created_at 分區，主鍵必須包含分區鍵
+    job_events = table_map["job_events"]
+    assert set(job_events.primary_key.columns.keys()) == {"id", "created_at"}
+    assert job_events.dialect_options["postgresql"]["partition_by"] == "RANGE (created_at)"
@@ -0,0 +1,166 @@
+﻿"""作業與資產查詢的執行計畫回歸測試，確認熱門查詢走到預期的索引。
+
+需要已套用 Alembic 遷移的 Postgres，以 TEST_DATABASE_URL 指定連線字串；未設定時略過。
+測試資料在單一交易內寫入並於結束時回滾。
+"""
+from __future__ import annotations
+
+import os
+from typing import Any, Iterator, List, Set
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy import Select, create_engine, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection
+
+from app.core.pagination import KeysetCursor
+from app.models.tables import JobStatus, ScoreFormat
+from app.repositories.jobs import (
+    TOTAL_EXACT,
+    TOTAL_NONE,
+    _active_job_ids_statement,
+    _count_by_statuses_statement,
+    _jobs_last_modified_statement,
+    _list_assets_statement,
+    _list_jobs_page_statement,
+)
+
+DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+USERS = 20
+JOBS_PER_USER = 1000
+
+pytestmark = pytest.mark.skipif(not DATABASE_URL, reason="TEST_DATABASE_URL 未設定")
+
+
+@pytest.fixture(scope="module")
+def seeded() -> Iterator[tuple[Connection, List[UUID]]]:
+    """寫入多位使用者的作業與資產並更新統計資料，結束時回滾。"""
+
+    engine = create_engine(DATABASE_URL or "", future=True)
+    connection = engine.connect()
+    transaction = connection.begin()
+    user_ids = [uuid4() for _ in range(USERS)]
+    try:
+        for user_id in user_ids:
+            connection.execute(text("INSERT INTO auth.users (id) VALUES (:id)"), {"id": user_id})
+        for status_value, modulo in ((JobStatus.COMPLETED.value, "<> 0"), (JobStatus.PROCESSING.value, "= 0")):
+            # 每 50 筆有 1 筆進行中，其餘皆已完成
+            connection.execute(
+                text(
+                    "INSERT INTO transcription_jobs (user_id, source_type, status, created_at, updated_at)"
+                    f" SELECT u, 'youtube', '{status_value}', now() - make_interval(secs => n), now()"
+                    " FROM unnest(CAST(:users AS uuid[])) AS u, generate_series(1, :jobs) AS n"
+                    f" WHERE n % 50 {modulo}"
+                ),
+                {"users": [str(user_id) for user_id in user_ids], "jobs": JOBS_PER_USER},
+            )
+        for score_format in ScoreFormat:
+            connection.execute(
+                text(
+                    "INSERT INTO score_assets (job_id, instrument, format, storage_object_path, created_at)"
+                    f" SELECT id, 'guitar', '{score_format.value}', 'bench/' || id, created_at FROM transcription_jobs"
+                    " WHERE user_id = ANY(CAST(:users AS uuid[]))"
+                ),
+                {"users": [str(user_id) for user_id in user_ids]},
+            )
+        connection.execute(text("ANALYZE transcription_jobs"))
+        connection.execute(text("ANALYZE score_assets"))
+        yield connection, user_ids
+    finally:
+        transaction.rollback()
+        connection.close()
+        engine.dispose()
+
+
+def _index_names(node: Any) -> Set[str]:
+    """遞迴收集執行計畫中使用到的索引名稱。"""
+
+    names: Set[str] = set()
+    if isinstance(node, dict):
+        if "Index Name" in node:
+            names.add(node["Index Name"])
+        for value in node.values():
+            names |= _index_names(value)
+    elif isinstance(node, list):
+        for item in node:
+            names |= _index_names(item)
+    return names
+
+
+def _plan_indexes(connection: Connection, statement: Select) -> Set[str]:
+    compiled = statement.compile(dialect=postgresql.psycopg.dialect(), compile_kwargs={"render_postcompile": True})
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar_one()
+    return _index_names(plan)
+
+
+def test_job_list_uses_user_created_at_index(seeded) -> None:
+    """作業列表第一頁與 keyset 下一頁都沿 (user_id, created_at DESC, id DESC) 讀取。"""
+
+    connection, user_ids = seeded
+    first_page = _list_jobs_page_statement(
+        user_id=user_ids[0], status=None, limit=21, offset=0, before=None, total=TOTAL_EXACT, estimate_cap=1000
+    )
+    assert "ix_transcription_jobs_user_id_created_at" in _plan_indexes(connection, first_page)
+
+    cursor_row = connection.execute(
+        text("SELECT created_at, id FROM transcription_jobs WHERE user_id = :user_id ORDER BY created_at DESC OFFSET 500 LIMIT 1"),
+        {"user_id": user_ids[0]},
+    ).one()
+    next_page = _list_jobs_page_statement(
+        user_id=user_ids[0],
+        status=None,
+        limit=21,
+        offset=0,
+        before=KeysetCursor(cursor_row.created_at, cursor_row.id),
+        total=TOTAL_NONE,
+        estimate_cap=1000,
+    )
+    assert "ix_transcription_jobs_user_id_created_at" in _plan_indexes(connection, next_page)
+
+
+def test_job_list_by_status_uses_user_status_index(seeded) -> None:
+    """依狀態篩選的列表使用 (user_id, status, created_at DESC, id DESC)。"""
+
+    connection, user_ids = seeded
+    statement = _list_jobs_page_statement(
+        user_id=user_ids[0],
+        status=JobStatus.COMPLETED.value,
+        limit=21,
+        offset=0,
+        before=None,
+        total=TOTAL_NONE,
+        estimate_cap=1000,
+    )
+    assert "ix_transcription_jobs_user_id_status" in _plan_indexes(connection, statement)
+
+
+def test_active_job_queries_use_partial_index(seeded) -> None:
+    """送出作業時的進行中計數與多工串流的進行中作業查詢只掃描部分索引。"""
+
+    connection, user_ids = seeded
+    count = _count_by_statuses_statement(
+        user_id=user_ids[0], statuses=[JobStatus.PENDING.value, JobStatus.PROCESSING.value]
+    )
+    assert "ix_transcription_jobs_user_id_active" in _plan_indexes(connection, count)
+    assert "ix_transcription_jobs_user_id_active" in _plan_indexes(connection, _active_job_ids_statement(user_id=user_ids[0]))
+
+
+def test_asset_list_uses_job_created_at_index(seeded) -> None:
+    """資產列表依 (job_id, created_at) 讀取，不需額外排序。"""
+
+    connection, user_ids = seeded
+    job_id = connection.execute(
+        text("SELECT id FROM transcription_jobs WHERE user_id = :user_id LIMIT 1"), {"user_id": user_ids[0]}
+    ).scalar_one()
+    statement = _list_assets_statement(job_id=job_id, user_id=user_ids[0])
+    assert "ix_score_assets_job_id_created_at" in _plan_indexes(connection, statement)
+
+
+def test_job_list_last_modified_uses_updated_at_index(seeded) -> None:
+    """條件式列表請求的最後修改時間只讀取 (user_id, updated_at DESC) 索引。"""
+
+    connection, user_ids = seeded
+    connection.execute(text("ANALYZE transcription_jobs"))
+    statement = _jobs_last_modified_statement(user_id=user_ids[0])
+    assert "ix_transcription_jobs_user_id_updated_at" in _plan_indexes(connection, statement)
@@ -1,9 +1,13 @@
-﻿import os
+﻿import asyncio
+import os
+import time
 from datetime import datetime, timedelta, timezone
 from typing import Any
+from uuid import uuid4
 
+import httpx
 import pytest
-from fastapi import HTTPException, Request
+from fastapi import HTTPException, Request, WebSocket, WebSocketException
 from jose import jwt
 from jose.utils import base64url_encode
 from cryptography.hazmat.primitives.asymmetric import rsa
@@ -62,6 +66,24 @@ class StubJWKSProvider:
         return self._jwk
 
 
+@pytest.fixture(autouse=True)
+def clear_token_cache() -> None:
+    """每個測試使用空的已驗證 token 快取，避免相同 token 互相影響。"""
+
+    security._token_cache.clear()
+
+
+def _encode_token(expires_at: datetime, subject: str = TEST_USER_ID) -> str:
+    """以測試金鑰簽發 JWT。"""
+
+    return jwt.encode(
+        {"sub": subject, "aud": "test-aud", "iss": "https://example.supabase.co/auth/v1", "exp": expires_at},
+        TEST_PRIVATE_KEY,
+        algorithm="RS256",
+        headers={"kid": TEST_JWK["kid"]},
+    )
+
+
 def _build_request(token: str | None) -> Request:
     """建立附帶 Authorization Header 的 Request。"""
 
@@ -156,3 +178,210 @@ def test_get_supabase_audience_single(monkeypatch: pytest.MonkeyPatch) -> None:
 
     monkeypatch.setattr(security.settings, "supabase_jwt_audience", "authenticated")
     assert security.get_supabase_audience() == "authenticated"
+
+
+def _build_websocket(query: bytes = b"") -> WebSocket:
+    """建立僅含查詢參數的 WebSocket。"""
+
+    scope = {"type": "websocket", "path": "/v1/jobs/ws", "headers": [], "query_string": query}
+    return WebSocket(scope, receive=None, send=None)  # type: ignore[arg-type]
+
+
+@pytest.mark.asyncio
+async def test_require_websocket_user_id_accepts_query_token(monkeypatch: pytest.MonkeyPatch) -> None:
+    """WebSocket 可由 access_token 查詢參數帶入 JWT，缺少時以 1008 拒絕。"""
+
+    provider = StubJWKSProvider(TEST_JWK)
+    monkeypatch.setattr(security, "_jwks_provider", provider, raising=False)
+    monkeypatch.setattr(security.settings, "supabase_jwt_audience", "test-aud")
+    monkeypatch.setattr(security.settings, "supabase_jwt_issuer", "https://example.supabase.co/auth/v1")
+
+    token = jwt.encode(
+        {
+            "sub": TEST_USER_ID,
+            "aud": "test-aud",
+            "iss": "https://example.supabase.co/auth/v1",
+            "exp": datetime.now(timezone.utc) + timedelta(minutes=5),
+        },
+        TEST_PRIVATE_KEY,
+        algorithm="RS256",
+        headers={"kid": TEST_JWK["kid"]},
+    )
+
+    user_id = await security.require_websocket_user_id(_build_websocket(f"access_token={token}".encode()))
+    assert str(user_id) == TEST_USER_ID
+
+    with pytest.raises(WebSocketException) as exc:
+        await security.require_websocket_user_id(_build_websocket())
+    assert exc.value.code == 1008
+
+
+@pytest.mark.asyncio
+async def test_verify_token_reuses_cached_subject(monkeypatch: pytest.MonkeyPatch) -> None:
+    """同一個 token 第二次驗證直接使用快取，不再取得簽章金鑰。"""
+
+    provider = StubJWKSProvider(TEST_JWK)
+    monkeypatch.setattr(security, "_jwks_provider", provider, raising=False)
+    monkeypatch.setattr(security.settings, "supabase_jwt_audience", "test-aud")
+    monkeypatch.setattr(security.settings, "supabase_jwt_issuer", "https://example.supabase.co/auth/v1")
+
+    token = _encode_token(datetime.now(timezone.utc) + timedelta(minutes=5))
+    first = await security.verify_token(token)
+    second = await security.verify_token(token)
+
+    assert first == second and str(second) == TEST_USER_ID
+    assert provider.calls == 1
+    assert security._token_cache.stats()["hits"] == 1
+
+    # 內容不同的 token 不會命中
+    other = _encode_token(datetime.now(timezone.utc) + timedelta(minutes=6))
+    await security.verify_token(other)
+    assert provider.calls == 2
+
+
+def test_token_cache_expires_at_exp_and_evicts_lru() -> None:
+    """快取項目到 token 的 exp 即失效，超過筆數上限時移除最久未使用的項目。"""
+
+    now = [1_000.0]
+    cache = security.VerifiedTokenCache(2, clock=lambda: now[0])
+    user_id = uuid4()
+
+    cache.put("a", user_id, 1_010.0)
+    cache.put("b", user_id, 2_000.0)
+    assert cache.get("a") == user_id
+    cache.put("c", user_id, 2_000.0)
+    assert cache.get("b") is None
+    assert cache.get("a") == user_id
+
+    now[0] = 1_010.0
+    assert cache.get("a") is None
+    cache.put("expired", user_id, 1_000.0)
+    assert cache.stats()["entries"] == 1
+
+
+def test_jwks_rotation_clears_token_cache() -> None:
+    """重新取得的 JWKS 與先前不同時呼叫 on_rotate，金鑰未變則不呼叫。"""
+
+    cache = security.VerifiedTokenCache(10)
+    cache.put("token", uuid4(), time.time() + 60)
+    provider = security.JWKSProvider("https://example.supabase.co/auth/v1/certs", on_rotate=cache.clear)
+
+    provider._record_keys({TEST_JWK["kid"]: TEST_JWK})
+    provider._record_keys({TEST_JWK["kid"]: TEST_JWK})
+    assert cache.stats()["entries"] == 1
+
+    provider._record_keys({"rotated-key": {**TEST_JWK, "kid": "rotated-key"}})
+    assert cache.stats()["entries"] == 0
+
+
+class CountingJWKS:
+    """以 httpx.MockTransport 回應 JWKS 並統計請求次數，可切換為失敗。"""
+
+    def __init__(self, keys: list[dict[str, Any]]) -> None:
+        self.keys = keys
+        self.requests = 0
+        self.fail = False
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(0.01)
+        if self.fail:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"keys": self.keys})
+
+    def provider(self, **kwargs: Any) -> security.JWKSProvider:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        return security.JWKSProvider("https://example.supabase.co/auth/v1/certs", client=client, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_jwks_concurrent_cold_requests_share_one_fetch() -> None:
+    """沒有金鑰時同時進來的請求只觸發一次下載。"""
+
+    jwks = CountingJWKS([TEST_JWK])
+    provider = jwks.provider()
+
+    keys = await asyncio.gather(*(provider.get_signing_key(TEST_JWK["kid"]) for _ in range(50)))
+
+    assert all(key == TEST_JWK for key in keys)
+    assert jwks.requests == 1
+    await provider.aclose()
+
+
+@pytest.mark.asyncio
+async def test_jwks_unknown_kid_is_rate_limited_and_negatively_cached() -> None:
+    """偽造的 kid 最多觸發一次下載，之後直接拒絕；已知金鑰不受影響。"""
+
+    jwks = CountingJWKS([TEST_JWK])
+    provider = jwks.provider(min_refresh_interval=0.0)
+    await provider.get_signing_key(TEST_JWK["kid"])
+
+    for _ in range(20):
+        with pytest.raises(HTTPException):
+            await provider.get_signing_key("forged")
+    assert jwks.requests == 2
+    assert provider.stats()["unknown_kid_rejections"] == 20
+
+    # 金鑰輪替後新 kid 出現在 JWKS，未被負向快取的 kid 可取得
+    jwks.keys = [TEST_JWK, {**TEST_JWK, "kid": "next-key"}]
+    assert (await provider.get_signing_key("next-key"))["kid"] == "next-key"
+    assert jwks.requests == 3
+    await provider.aclose()
+
+
+@pytest.mark.asyncio
+async def test_jwks_rotated_kid_within_interval_is_not_negatively_cached() -> None:
+    """間隔內出現的新 kid 先被拒絕但不放入負向快取，間隔過後更新即可取得。"""
+
+    jwks = CountingJWKS([TEST_JWK])
+    provider = jwks.provider(min_refresh_interval=0.2)
+    await provider.get_signing_key(TEST_JWK["kid"])
+
+    jwks.keys = [TEST_JWK, {**TEST_JWK, "kid": "next-key"}]
+    with pytest.raises(HTTPException):
+        await provider.get_signing_key("next-key")
+    assert jwks.requests == 1
+    assert provider.stats()["unknown_kids"] == 0
+
+    await asyncio.sleep(0.25)
+    assert (await provider.get_signing_key("next-key"))["kid"] == "next-key"
+    assert jwks.requests == 2
+    await provider.aclose()
+
+
+@pytest.mark.asyncio
+async def test_jwks_serves_stale_keys_while_refreshing() -> None:
+    """即將過期時立即回傳舊金鑰並在背景更新，更新失敗也繼續沿用。"""
+
+    jwks = CountingJWKS([TEST_JWK])
+    provider = jwks.provider(cache_seconds=300, refresh_ahead_seconds=60, min_refresh_interval=0.0)
+    await provider.get_signing_key(TEST_JWK["kid"])
+
+    jwks.fail = True
+    provider._expires_at = time.time() + 30
+    assert await provider.get_signing_key(TEST_JWK["kid"]) == TEST_JWK
+    assert provider._refresh_task is not None
+    await asyncio.gather(provider._refresh_task, return_exceptions=True)
+    assert jwks.requests == 2 and provider.stats()["failures"] == 1
+
+    jwks.fail = False
+    provider._expires_at = time.time() - 1
+    assert await provider.get_signing_key(TEST_JWK["kid"]) == TEST_JWK
+    await asyncio.gather(provider._refresh_task, return_exceptions=True)
+    assert jwks.requests == 3 and provider._expires_at > time.time() + 200
+    await provider.aclose()
+
+
+@pytest.mark.asyncio
+async def test_jwks_outage_fails_fast_without_keys() -> None:
+    """沒有金鑰且剛下載失敗時，間隔內的請求直接拒絕而不重試。"""
+
+    jwks = CountingJWKS([TEST_JWK])
+    jwks.fail = True
+    provider = jwks.provider(min_refresh_interval=60.0)
+
+    for _ in range(5):
+        with pytest.raises(HTTPException):
+            await provider.get_signing_key(TEST_JWK["kid"])
+    assert jwks.requests == 1
+    await provider.aclose()
@@ -0,0 +1,75 @@
+﻿"""SSE 訊框編碼與快取測試。"""
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from app.models.tables import JobEvent
+from app.schemas.event import JobEventResource
+from app.services.event_bus import TransientJobEvent
+from app.services.sse import SSEFrameCache, encode_end_frame, encode_event_frame
+
+
+def _build_event(stage: str = "transcribe") -> JobEvent:
+    event = JobEvent(job_id=uuid4(), stage=stage, message="轉譜中", payload={"progress": 50})
+    event.id = uuid4()
+    event.created_at = datetime(2024, 5, 1, 12, 0, 5, tzinfo=timezone.utc)
+    return event
+
+
+def _parse(frame: bytes) -> dict[str, str]:
+    text = frame.decode("utf-8")
+    assert text.endswith("\n\n")
+    return dict(line.split(":", 1) for line in text.strip().splitlines())
+
+
+def test_event_frame_matches_resource_output() -> None:
+    """訊框內容與 JobEventResource 的 JSON 輸出一致，且帶有事件 id。"""
+
+    event = _build_event()
+    fields = _parse(encode_event_frame(event))
+
+    expected = JobEventResource.model_validate(event).model_dump(by_alias=True, mode="json")
+    assert fields["id"] == str(event.id)
+    assert fields["event"] == "transcribe"
+    assert json.loads(fields["data"]) == expected
+
+
+def test_transient_frame_has_no_id() -> None:
+    """即時進度事件不帶 id，也不進入快取。"""
+
+    cache = SSEFrameCache(max_entries=4)
+    event = TransientJobEvent(job_id=uuid4(), stage="progress", payload={"progress": 12.5})
+
+    fields = _parse(cache.encode(event))
+
+    assert "id" not in fields
+    assert json.loads(fields["data"])["payload"] == {"progress": 12.5}
+    assert len(cache) == 0
+
+
+def test_cache_reuses_frames_and_evicts_oldest() -> None:
+    """同一事件只編碼一次，超過上限時淘汰最久未使用的訊框。"""
+
+    cache = SSEFrameCache(max_entries=2)
+    first, second, third = _build_event(), _build_event(), _build_event()
+
+    frame = cache.encode(first)
+    assert cache.encode(first) is frame
+    cache.encode(second)
+    cache.encode(first)
+    cache.encode(third)
+
+    assert cache.stats() == {"entries": 2, "hits": 2, "misses": 3}
+    cache.encode(second)
+    assert cache.misses == 4
+
+
+def test_end_frame_payload() -> None:
+    """end 訊框包含狀態與節省的查詢數。"""
+
+    fields = _parse(encode_end_frame("completed", 42))
+
+    assert fields["event"] == "end"
+    assert json.loads(fields["data"]) == {"status": "completed", "queriesSaved": 42}
@@ -0,0 +1,94 @@
+﻿"""串流准入控制與背壓測試。"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict
+from uuid import UUID, uuid4
+
+import pytest
+
+from app.core.metrics import MetricsRegistry
+from app.services.event_bus import TransientJobEvent
+from app.services.event_hub import EventPoll, JobEventHub
+from app.services.stream_limits import GuardedStreamingResponse, StreamLimiter, StreamLimitExceededError
+
+
+def test_limiter_enforces_user_and_process_caps() -> None:
+    """超過使用者或行程上限時拒絕，歸還名額後可再取得，並更新指標。"""
+
+    registry = MetricsRegistry()
+    limiter = StreamLimiter(max_per_user=1, max_total=2, registry=registry)
+    first_user, second_user = uuid4(), uuid4()
+
+    slot = limiter.acquire(first_user)
+    with pytest.raises(StreamLimitExceededError) as user_error:
+        limiter.acquire(first_user)
+    assert user_error.value.scope == "user"
+
+    limiter.acquire(second_user)
+    with pytest.raises(StreamLimitExceededError) as process_error:
+        limiter.acquire(uuid4())
+    assert process_error.value.scope == "process"
+
+    slot.release()
+    slot.release()
+    limiter.acquire(first_user)
+
+    snapshot = registry.snapshot()
+    assert snapshot["gauges"]["job_streams_active"] == 2
+    assert snapshot["counters"]["job_streams_rejected_total"] == 2
+
+
+@pytest.mark.asyncio
+async def test_guarded_response_drops_slow_consumer() -> None:
+    """送出逾時即結束回應、計入中斷並歸還名額。"""
+
+    registry = MetricsRegistry()
+    limiter = StreamLimiter(max_per_user=1, max_total=1, registry=registry)
+    slot = limiter.acquire(uuid4())
+    closed = asyncio.Event()
+
+    async def frames() -> AsyncIterator[bytes]:
+        try:
+            while True:
+                yield b"data:x\n\n"
+        finally:
+            closed.set()
+
+    async def stalled_send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.body":
+            await asyncio.sleep(10)
+
+    async def receive() -> Dict[str, Any]:
+        await asyncio.sleep(10)
+        return {"type": "http.disconnect"}
+
+    response = GuardedStreamingResponse(frames(), slot=slot, send_timeout=0.01, media_type="text/event-stream")
+    await asyncio.wait_for(response({"type": "http"}, receive, stalled_send), timeout=1.0)
+
+    assert closed.is_set()
+    snapshot = registry.snapshot()
+    assert snapshot["counters"]["job_streams_dropped_total"] == 1
+    assert snapshot["gauges"]["job_streams_active"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hub_stops_delivering_to_full_queue() -> None:
+    """訂閱佇列滿載時標記 overflowed 並移除訂閱，不再累積事件。"""
+
+    hub = JobEventHub(poll_interval=30.0, idle_seconds=0.05)
+    job_id = uuid4()
+
+    async def fetch(created_after: datetime | None, last_event_id: UUID | None) -> EventPoll:
+        return EventPoll("processing", [])
+
+    subscription = hub.subscribe(job_id, fetch=fetch, created_after=None, last_event_id=None, queue=asyncio.Queue(maxsize=1))
+    hub.publish_transient(TransientJobEvent(job_id=job_id, stage="progress"))
+    hub.publish_transient(TransientJobEvent(job_id=job_id, stage="progress"))
+
+    assert subscription.overflowed
+    assert subscription.queue.qsize() == 1
+    assert hub.stats()["subscribers"] == 0
+    await hub.shutdown()
+